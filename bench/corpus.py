@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+基准语料：每个来源一份 feed XML + 若干文章页，存到 --out（默认 data/bench/corpus）：
+
+    <out>/<source_id>/manifest.json   来源信息与条目列表（url / url_hash / file / content_type）
+    <out>/<source_id>/feed.xml
+    <out>/<source_id>/pages/<url_hash>.html
+
+record  联网录制：config/sources.yaml 的 feed 加上 MarketWatch / Nasdaq / 央行的 feed，每个来源取前 N 篇文章页。
+synth   离线合成：从 bronze 的正文按几种常见页面结构（<article>、Yahoo caas-body、JSON-LD、纯段落）
+        套上导航、脚本和页脚生成 HTML，并生成对应的 RSS。没有网络时用它跑基准。
+"""
+import os, sys, json, html, random, hashlib, argparse
+from pathlib import Path
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# sources.yaml 之外的录制对象
+EXTRA_FEEDS = [
+    {"id": "marketwatch_top", "name": "MarketWatch Top Stories", "url": "https://feeds.content.dowjones.io/public/rss/mw_topstories"},
+    {"id": "nasdaq_markets", "name": "Nasdaq Markets", "url": "https://www.nasdaq.com/feed/rssoutbound?category=Markets"},
+    {"id": "fed_press", "name": "Federal Reserve Press Releases", "url": "https://www.federalreserve.gov/feeds/press_all.xml"},
+    {"id": "ecb_press", "name": "ECB Press", "url": "https://www.ecb.europa.eu/rss/press.html"},
+    {"id": "boe_news", "name": "Bank of England News", "url": "https://www.bankofengland.co.uk/rss/news"},
+]
+
+def _h(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()
+
+def _save(out: Path, src: dict, feed_xml: bytes, pages: list):
+    d = out / src["id"]
+    (d / "pages").mkdir(parents=True, exist_ok=True)
+    (d / "feed.xml").write_bytes(feed_xml)
+    items = []
+    for url, body, ctype in pages:
+        h = _h(url)
+        (d / "pages" / f"{h}.html").write_bytes(body)
+        items.append({"url": url, "url_hash": h, "file": f"pages/{h}.html", "content_type": ctype})
+    (d / "manifest.json").write_text(json.dumps({"source_id": src["id"], "name": src["name"], "feed_url": src["url"],
+                                                 "items": items}, indent=1), encoding="utf-8")
+    print(f"[{src['id']}] feed {len(feed_xml)} B, pages {len(items)}")
+
+def load(corpus) -> list:
+    """读出语料目录下所有来源的 manifest（附带目录路径）。"""
+    out = []
+    for m in sorted(Path(corpus).glob("*/manifest.json")):
+        d = json.loads(m.read_text(encoding="utf-8"))
+        d["dir"] = m.parent
+        out.append(d)
+    return out
+
+# ---- record ----
+def record(out: Path, per_source: int):
+    import yaml, feedparser
+    from src.core.fetcher import get
+    cfg = yaml.safe_load(open(os.path.join(ROOT, "config/sources.yaml"), encoding="utf-8"))
+    for src in cfg["rss_sources"] + EXTRA_FEEDS:
+        try:
+            feed = get(src["url"]).content
+        except Exception as e:
+            print(f"[{src['id']}] feed error: {e}"); continue
+        pages = []
+        for e in feedparser.parse(feed).entries[:per_source]:
+            url = e.get("link")
+            if not url: continue
+            try:
+                r = get(url)
+                pages.append((url, r.content, r.headers.get("Content-Type", "text/html")))
+            except Exception as ex:
+                print(f"[{src['id']}] page error: {ex}")
+        _save(out, src, feed, pages)
+
+# ---- synth ----
+_NAV = "<header><nav>" + "".join(f'<a href="/s{i}">Section {i}</a>' for i in range(12)) + "</nav></header>"
+_FOOT = "<footer><p>© Example Media. All rights reserved.</p>" + "".join(f'<a href="/l{i}">Link {i}</a>' for i in range(20)) + "</footer>"
+_SCRIPT = "<script>" + "var cfg={a:1,b:[1,2,3]};" * 200 + "</script>"
+
+def _paras(text: str) -> str:
+    words = text.split()
+    return "".join("<p>" + html.escape(" ".join(words[i:i+60])) + "</p>" for i in range(0, len(words), 60))
+
+def synth_page(rec: dict, style: str) -> bytes:
+    title, text = html.escape(rec.get("title") or ""), rec.get("text") or ""
+    head = f"<head><meta charset='utf-8'><title>{title}</title>{_SCRIPT}</head>"
+    if style == "jsonld":  # 正文只在 JSON-LD 里，页面本身只有摘要
+        ld = json.dumps({"@context": "https://schema.org", "@type": "NewsArticle", "headline": rec.get("title"), "articleBody": text})
+        body = f"<div class='teaser'><p>{html.escape(text[:150])}</p></div><script type='application/ld+json'>{ld}</script>"
+    elif style == "caas":
+        body = f"<div class='caas-body'>{_paras(text)}</div>"
+    elif style == "article":
+        body = f"<article><h1>{title}</h1>{_paras(text)}</article>"
+    else:
+        body = f"<div class='content'><h1>{title}</h1>{_paras(text)}</div>"
+    return f"<!doctype html><html>{head}<body>{_NAV}<main>{body}</main>{_FOOT}</body></html>".encode("utf-8")
+
+def synth_feed(src: dict, recs: list) -> bytes:
+    items = []
+    for r in recs:
+        try:
+            pub = format_datetime(datetime.fromisoformat(str(r.get("published_at")).replace("Z", "+00:00")).astimezone(timezone.utc))
+        except ValueError:
+            pub = format_datetime(datetime.now(timezone.utc))
+        items.append(f"<item><title>{html.escape(r.get('title') or '')}</title><link>{html.escape(r['url'])}</link>"
+                     f"<description>{html.escape(r.get('description') or '')}</description><pubDate>{pub}</pubDate></item>")
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{html.escape(src["name"])}</title>'
+            f'<link>{html.escape(src["url"])}</link>{"".join(items)}</channel></rss>').encode("utf-8")
+
+def synth(out: Path, per_source: int, bronze: str, seed=0):
+    from src.core.storage import day_dirs, iter_day_records
+    by_src = {}
+    for d in day_dirs(bronze):
+        for r in iter_day_records(d):
+            if r.get("url") and isinstance(r.get("text"), str) and len(r["text"]) > 500:
+                by_src.setdefault(r.get("source_id") or "unknown", []).append(r)
+    rng = random.Random(seed)
+    styles = ["article", "caas", "jsonld", "plain"]
+    for sid, recs in sorted(by_src.items()):
+        recs = rng.sample(recs, min(per_source, len(recs)))
+        src = {"id": sid, "name": f"{sid} (synthetic)", "url": f"https://example.invalid/{sid}/feed.xml"}
+        pages = [(r["url"], synth_page(r, styles[i % len(styles)]), "text/html; charset=utf-8") for i, r in enumerate(recs)]
+        _save(out, src, synth_feed(src, recs), pages)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("mode", choices=["record", "synth"])
+    ap.add_argument("--out", default="data/bench/corpus"); ap.add_argument("--per-source", type=int, default=30)
+    ap.add_argument("--bronze", default="data/bronze")
+    a = ap.parse_args()
+    out = Path(a.out); out.mkdir(parents=True, exist_ok=True)
+    record(out, a.per_source) if a.mode == "record" else synth(out, a.per_source, a.bronze)
+
+if __name__ == "__main__":
+    main()
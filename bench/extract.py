@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+抽取基准：对比旧版（每个策略各自 BeautifulSoup 解析）与当前单次解析级联的单篇耗时，
+并核对两者输出（text / content_hash / extract_method）是否一致。
+
+HTML 来源：RawStore 存档（默认），或 --html-dir 下的 *.html；
+--fetch N 会先从 data/bronze 的原始记录里抽 N 个 URL 下载进 RawStore。
+"""
+import os, sys, re, json, time, random, argparse, statistics
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import trafilatura
+from bs4 import BeautifulSoup
+from readability import Document
+from src.core import extractor
+from src.core.rawstore import RawStore
+from src.core.storage import day_dirs, iter_day_records
+
+# ---- 旧版级联（重构前的实现，仅用于对照） ----
+def _legacy_json_ld(html):
+    soup = BeautifulSoup(html, "lxml")
+    for s in soup.find_all("script", attrs={"type": "application/ld+json"}):
+        try:
+            data = json.loads(s.string or "")
+            items = data if isinstance(data, list) else [data]
+            for it in items:
+                t = it.get("@type") or it.get("@context")
+                if (t and ("Article" in str(t) or "NewsArticle" in str(t))) or it.get("articleBody"):
+                    body = it.get("articleBody") or ""
+                    if body and len(body) > 80:
+                        return extractor._clean_text(body)
+        except Exception:
+            continue
+    return None
+
+def _legacy_selectors(html):
+    soup = BeautifulSoup(html, "lxml")
+    for tag, attrs in [("div", {"class": re.compile(r"(caas-body|article-body|story-content)")}),
+                       ("article", {}), ("div", {"itemprop": "articleBody"})]:
+        node = soup.find(tag, attrs=attrs)
+        if node:
+            text = node.get_text(separator=" ").strip()
+            if len(text) > 80:
+                return extractor._clean_text(text)
+    return None
+
+def legacy_extract_text(html):
+    txt = trafilatura.extract(html, include_comments=False, include_tables=False)
+    if txt and len(txt) >= 200:
+        return extractor._pack(txt, "trafilatura")
+    txt = _legacy_json_ld(html)
+    if txt: return extractor._pack(txt, "json-ld")
+    txt = _legacy_selectors(html)
+    if txt: return extractor._pack(txt, "css-selectors")
+    try:
+        doc = Document(html)
+        txt = BeautifulSoup(doc.summary(html_partial=True), "lxml").get_text(separator=" ").strip()
+        if len(txt) > 80:
+            return extractor._pack(extractor._clean_text(txt), "readability")
+    except Exception:
+        pass
+    return extractor._pack("", "none")
+
+# ---- 语料 ----
+def fetch_sample(n, bronze="data/bronze"):
+    from src.core.fetcher import fetch_many
+    store, urls = RawStore(), {}
+    for d in day_dirs(bronze):
+        for r in iter_day_records(d):
+            if r.get("url") and r.get("url_hash"): urls[r["url_hash"]] = r["url"]
+    picks = random.Random(0).sample(sorted(urls.items()), min(n, len(urls)))
+    got = 0
+    for (h, _), resp, err in fetch_many(picks, key=lambda it: it[1]):
+        if err is None:
+            store.put(h, resp.content); got += 1
+    print(f"fetched {got}/{len(picks)} pages into {store.root}")
+
+def load_corpus(html_dir=None, limit=None):
+    if html_dir:
+        paths = sorted(Path(html_dir).rglob("*.html"))[:limit]
+        return [(p.name, p.read_bytes()) for p in paths]
+    store, out = RawStore(), []
+    for p in sorted(Path(store.root).glob("*/*.html.*"))[:limit]:
+        h = p.name.split(".")[0]
+        html = store.get(h)
+        if html is not None: out.append((h, html))
+    return out
+
+def _time(fn, docs, repeat):
+    per_doc, results = [], []
+    for _, html in docs:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter(); res = fn(html); dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        per_doc.append(best); results.append(res)
+    return per_doc, results
+
+def _summary(xs):
+    xs = sorted(xs)
+    return {"mean_ms": round(statistics.mean(xs) * 1e3, 3), "p50_ms": round(xs[len(xs)//2] * 1e3, 3),
+            "p95_ms": round(xs[int(len(xs) * 0.95) - 1 if len(xs) > 1 else 0] * 1e3, 3), "total_s": round(sum(xs), 3)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--html-dir"); ap.add_argument("--limit", type=int)
+    ap.add_argument("--fetch", type=int, default=0); ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="只输出机器可读结果")
+    a = ap.parse_args()
+    if a.fetch: fetch_sample(a.fetch)
+    docs = load_corpus(a.html_dir, a.limit)
+    if not docs:
+        print("no HTML found (try --fetch N or --html-dir)"); return
+    old_t, old_r = _time(legacy_extract_text, docs, a.repeat)
+    new_t, new_r = _time(extractor.extract_text, docs, a.repeat)
+    mismatches = [docs[i][0] for i, (o, n) in enumerate(zip(old_r, new_r)) if o != n]
+    methods = {}
+    for r in new_r: methods[r["extract_method"]] = methods.get(r["extract_method"], 0) + 1
+    out = {"docs": len(docs), "legacy": _summary(old_t), "single_parse": _summary(new_t),
+           "speedup": round(sum(old_t) / max(sum(new_t), 1e-9), 2), "methods": methods,
+           "mismatches": len(mismatches), "mismatch_ids": mismatches[:20]}
+    print(json.dumps(out, indent=None if a.json else 2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+规范化吞吐基准：旧版逐条 pd.to_datetime + langid.classify 与 normalize_batch 对比，
+另外测量两种实现的冷启动导入耗时。记录取自 data/bronze（docs.jsonl 与压缩段）。
+"""
+import os, sys, json, time, argparse, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+def legacy_normalize_record(rec):
+    import langid, pandas as pd
+    if rec.get("published_at"):
+        rec["published_at"] = pd.to_datetime(rec["published_at"], utc=True, errors="coerce").isoformat()
+    blob = " ".join([rec.get("title") or "", rec.get("description") or "", rec.get("text") or ""])[:1000]
+    rec["language"] = langid.classify(blob)[0] if blob.strip() else None
+    return rec
+
+def load_records(bronze, limit, keep_language):
+    from src.core.storage import day_dirs, iter_day_records
+    out = []
+    for d in day_dirs(bronze):
+        for r in iter_day_records(d):
+            if not keep_language: r.pop("language", None)
+            out.append(r)
+            if len(out) >= limit: return out
+    return out
+
+def _import_time(stmt):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", stmt], cwd=ROOT, check=True)
+    return round(time.perf_counter() - t0, 3)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bronze", default="data/bronze"); ap.add_argument("--limit", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--keep-language", action="store_true", help="保留记录里已有的 language（模拟 GDELT）")
+    a = ap.parse_args()
+    from src.core.normalizer import normalize_batch
+    recs = load_records(a.bronze, a.limit, a.keep_language)
+    if not recs:
+        print("no records found"); return
+    legacy_normalize_record(dict(recs[0])); normalize_batch([dict(recs[0])])  # 预热：模型加载不计入吞吐
+
+    batch = [dict(r) for r in recs]
+    t0 = time.perf_counter()
+    old = [legacy_normalize_record(r) for r in batch]
+    t_old = time.perf_counter() - t0
+
+    batch = [dict(r) for r in recs]
+    t0 = time.perf_counter()
+    new = []
+    for i in range(0, len(batch), a.batch):
+        new.extend(normalize_batch(batch[i:i+a.batch]))
+    t_new = time.perf_counter() - t0
+
+    same_ts = sum(o.get("published_at") == n.get("published_at") for o, n in zip(old, new))
+    same_lang = sum(o.get("language") == n.get("language") for o, n in zip(old, new))
+    print(json.dumps({
+        "records": len(recs), "batch": a.batch,
+        "legacy_rec_per_s": round(len(recs) / t_old, 1), "batch_rec_per_s": round(len(recs) / t_new, 1),
+        "speedup": round(t_old / t_new, 2),
+        "published_at_equal": same_ts, "language_equal": same_lang,
+        "cold_import_s": {"legacy": _import_time("import langid, pandas"),
+                          "batch": _import_time("import src.core.normalizer")},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+把 bench/corpus.py 录下的语料用本地 HTTP 服务回放，可注入延迟、5xx 与 429（带 Retry-After）。
+
+每个来源绑定一个独立的回环地址（127.0.0.2、127.0.0.3 …），抓取端的按 host 限流/熔断与线上一样按来源生效。
+    GET /<source_id>/feed.xml        feed，条目链接已改写成本地地址
+    GET /<source_id>/a/<url_hash>    文章页（Content-Type 用录制时的值）
+
+单独运行时常驻，供手工测试：python bench/replay.py --latency-ms 80 --error-rate 0.02
+"""
+import os, sys, time, random, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import corpus as corpus_mod
+
+class Faults:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate429=0.0, retry_after=1, seed=0):
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.error_rate, self.rate429, self.retry_after = error_rate, rate429, retry_after
+        self._rng, self._lock = random.Random(seed), threading.Lock()
+
+    def draw(self):
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            x = self._rng.random()
+        status = 429 if x < self.rate429 else 500 if x < self.rate429 + self.error_rate else 200
+        return delay, status
+
+def _handler(routes: dict, faults: Faults, counts: dict):
+    class H(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+
+        def do_GET(self):
+            delay, status = faults.draw()
+            time.sleep(delay)
+            hit = routes.get(self.path.split("?")[0])
+            if hit is None:
+                status = 404
+            with faults._lock:
+                counts[status] = counts.get(status, 0) + 1
+            if status != 200:
+                self.send_response(status)
+                if status == 429: self.send_header("Retry-After", str(faults.retry_after))
+                self.send_header("Content-Length", "0"); self.end_headers(); return
+            body, ctype = hit
+            self.send_response(200)
+            self.send_header("Content-Type", ctype); self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+    return H
+
+class ReplayServer:
+    """
+    启动后 feeds 是 [(source_id, name, 本地 feed URL)]；counts 统计各状态码的响应次数。
+    用 with 语句或 close() 关闭。
+    """
+    def __init__(self, corpus_dir, faults: Faults | None = None):
+        self.faults, self.counts, self.feeds, self._servers = faults or Faults(), {}, [], []
+        for i, src in enumerate(corpus_mod.load(corpus_dir)):
+            host = f"127.0.0.{i + 2}"
+            routes = {}
+            srv = ThreadingHTTPServer((host, 0), _handler(routes, self.faults, self.counts))
+            srv.daemon_threads = True
+            base = f"http://{host}:{srv.server_port}"
+            sid, d = src["source_id"], src["dir"]
+            feed = (d / "feed.xml").read_bytes()
+            # 长的 URL 先替换，免得某个 URL 恰好是另一个的前缀时被截断改写
+            for it in sorted(src["items"], key=lambda it: -len(it["url"])):
+                local = f"/{sid}/a/{it['url_hash']}"
+                routes[local] = ((d / it["file"]).read_bytes(), it["content_type"])
+                # feed 里的链接可能经过 XML 转义
+                for form in {it["url"], it["url"].replace("&", "&amp;")}:
+                    feed = feed.replace(form.encode(), (base + local).encode())
+            routes[f"/{sid}/feed.xml"] = (feed, "application/rss+xml")
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+            self._servers.append(srv)
+            self.feeds.append((sid, src["name"], f"{base}/{sid}/feed.xml"))
+
+    def close(self):
+        for s in self._servers:
+            s.shutdown(); s.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default="data/bench/corpus")
+    ap.add_argument("--latency-ms", type=float, default=0); ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0); ap.add_argument("--rate429", type=float, default=0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    a = ap.parse_args()
+    with ReplayServer(a.corpus, Faults(a.latency_ms, a.jitter_ms, a.error_rate, a.rate429, a.retry_after)) as rs:
+        for sid, _, url in rs.feeds:
+            print(f"{sid}\t{url}")
+        try:
+            while True: time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""
+基准场景执行器，结果输出为 JSON（--out 另存一份），两次结果可用 --compare 对比。
+
+    adapter    RSSAdapter + run_adapter 端到端吞吐：回放服务（bench/replay.py）代替真实站点，可注入延迟 / 5xx / 429
+    extract    逐策略抽取成本：每篇文档把 parse / trafilatura / json-ld / css-selectors / readability 各自单独跑一遍
+    feed       feed 解析：feedparser 与 lxml 流式解析（全量、以及遇到水位线即停）的吞吐、峰值内存和字段一致率
+    normalize  normalize_batch 吞吐
+    dedupe     按今天的日均量放大 --scales 倍生成多天 bronze 树（段布局，含重复），跑 dedupe_repair.py，
+               再跑一次测 manifest 命中时的开销
+
+语料先用 bench/corpus.py 准备（record 联网录制，synth 离线合成）。
+例：python bench/run.py adapter extract --latency-ms 50 --workers 2 --out data/bench/results/$(date +%F).json
+"""
+import os, sys, json, time, random, tempfile, argparse, platform, statistics, subprocess
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def _stats(xs):
+    xs = sorted(xs)
+    if not xs:
+        return {}
+    return {"n": len(xs), "mean_ms": round(statistics.mean(xs) * 1e3, 3), "p50_ms": round(xs[len(xs)//2] * 1e3, 3),
+            "p95_ms": round(xs[max(0, int(len(xs) * 0.95) - 1)] * 1e3, 3), "total_s": round(sum(xs), 3)}
+
+def _pages(corpus_dir):
+    import corpus
+    out = []
+    for src in corpus.load(corpus_dir):
+        for it in src["items"]:
+            if "html" in it["content_type"]:
+                out.append((src["source_id"], it["url_hash"], (src["dir"] / it["file"]).read_bytes()))
+    return out
+
+# ---- adapter ----
+def scenario_adapter(a, tmp):
+    from replay import ReplayServer, Faults
+    from src.adapters.rss_generic import RSSAdapter
+    from src.pipeline import run_adapter
+    from src.core.storage import SegmentWriter
+    from src.core import metrics
+    faults = Faults(a.latency_ms, a.jitter_ms, a.error_rate, a.rate429, a.retry_after, seed=a.seed)
+    metrics.registry.drain()
+    per_source, docs = {}, 0
+    with ReplayServer(a.corpus, faults) as rs, SegmentWriter("bench", root=str(tmp / "bronze")) as w:
+        t0 = time.perf_counter()
+        for sid, name, url in rs.feeds:
+            base = url.rsplit("/", 2)[0]
+            adapter = RSSAdapter(url, sid, name)
+            items = adapter.iter_items
+            # 录制的 feed 里没有存页面的条目仍指向真实站点，基准里只抓回放地址
+            adapter.iter_items = lambda items=items, base=base: (it for it in items() if (it["url"] or "").startswith(base))
+            t1 = time.perf_counter()
+            try:
+                n = run_adapter(adapter, workers=a.workers, writer=w)
+            except Exception as e:
+                per_source[sid] = {"error": type(e).__name__}; continue
+            per_source[sid] = {"docs": n, "seconds": round(time.perf_counter() - t1, 3)}
+            docs += n
+        wall = time.perf_counter() - t0
+    snap = metrics.registry.drain()
+    stages = {}
+    for (name, _labels), (c, s, m) in snap["timers"]:
+        st = stages.setdefault(name, {"count": 0, "sum_s": 0.0})
+        st["count"] += c; st["sum_s"] = round(st["sum_s"] + s, 4)
+    status = {}
+    for (name, labels), n in snap["counters"]:
+        if name == "docs":
+            k = dict(labels)["status"]; status[k] = status.get(k, 0) + n
+    return {"docs": docs, "wall_s": round(wall, 3), "docs_per_s": round(docs / wall, 2) if wall else None,
+            "workers": a.workers, "latency_ms": a.latency_ms, "error_rate": a.error_rate, "rate429": a.rate429,
+            "http_responses": {str(k): v for k, v in sorted(rs.counts.items())}, "doc_status": status,
+            "stages": stages, "per_source": per_source}
+
+# ---- extract ----
+def scenario_extract(a, tmp):
+    from src.core import extractor as ex
+    pages = _pages(a.corpus)
+    strategies = {
+        "parse": lambda html, tree: ex._parse(html),
+        "trafilatura": lambda html, tree: ex._trafilatura(tree),
+        "json-ld": lambda html, tree: ex._from_json_ld(tree, html),
+        "css-selectors": lambda html, tree: ex._from_common_selectors(tree),
+        "readability": lambda html, tree: ex._from_readability(tree),
+    }
+    cost = {k: [] for k in strategies}
+    hits = {k: 0 for k in strategies}
+    cascade, methods = [], {}
+    for _ in range(a.repeat):
+        for _sid, _h, html in pages:
+            for name, fn in strategies.items():
+                tree = ex._parse(html)  # readability 会改树，每个策略各用一棵新树
+                t0 = time.perf_counter()
+                try: res = fn(html, tree)
+                except Exception: res = None
+                cost[name].append(time.perf_counter() - t0)
+                hits[name] += res is not None and res is not False
+            t0 = time.perf_counter()
+            out = ex.extract_text(html)
+            cascade.append(time.perf_counter() - t0)
+            methods[out["extract_method"]] = methods.get(out["extract_method"], 0) + 1
+    n = len(pages) * a.repeat
+    return {"docs": len(pages), "repeat": a.repeat, "cascade": _stats(cascade), "methods": methods,
+            "strategies": {k: {**_stats(v), "hit_rate": round(hits[k] / n, 3) if n else None} for k, v in cost.items()}}
+
+# ---- feed ----
+def scenario_feed(a, tmp):
+    import corpus, tracemalloc, feedparser
+    from src.core.feedparse import iter_entries
+    from src.adapters.rss_generic import RSSAdapter
+    feeds = [(src["source_id"], (src["dir"] / "feed.xml").read_bytes()) for src in corpus.load(a.corpus)
+             if (src["dir"] / "feed.xml").exists()]
+    if not feeds:
+        return {"error": "no feeds in corpus"}
+    def fp(x): return [{"link": e.get("link"), "published": RSSAdapter._parse_dt(e)} for e in feedparser.parse(x).entries]
+    def fast(x): return list(iter_entries(x))
+    def stop(x):  # 10 分钟一次的常态：前 a.new_entries 条是新的，之后遇到水位线即停
+        out = []
+        for e in iter_entries(x):
+            out.append(e)
+            if len(out) > a.new_entries: break
+        return out
+    out = {"feeds": len(feeds), "bytes": sum(len(x) for _, x in feeds), "parsers": {}, "per_source": {}}
+    for name, fn in (("feedparser", fp), ("lxml", fast), ("lxml_watermark", stop)):
+        t, n = [], 0
+        for _ in range(a.repeat):
+            for _sid, x in feeds:
+                t0 = time.perf_counter(); n += len(fn(x)); t.append(time.perf_counter() - t0)
+        tracemalloc.start()
+        for _sid, x in feeds: fn(x)
+        peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+        out["parsers"][name] = {**_stats(t), "entries_per_s": round(n / sum(t), 1), "mb_per_s": round(out["bytes"] * a.repeat / sum(t) / 1e6, 2),
+                                "peak_kb": round(peak / 1024, 1)}
+    for sid, x in feeds:
+        ref, new = fp(x), fast(x)
+        same = sum(r["link"] == e["link"] and r["published"] == e["published"] for r, e in zip(ref, new))
+        out["per_source"][sid] = {"entries": len(ref), "fast_entries": len(new), "fields_equal": same}
+    return out
+
+# ---- normalize ----
+def _bronze_records(bronze, limit):
+    from src.core.storage import day_dirs, iter_day_records
+    out = []
+    for d in reversed(day_dirs(bronze)):
+        for r in iter_day_records(d):
+            out.append(r)
+            if len(out) >= limit: return out
+    return out
+
+def scenario_normalize(a, tmp):
+    from src.core.normalizer import normalize_batch
+    recs = _bronze_records(a.bronze, a.limit)
+    for r in recs: r.pop("language", None)
+    normalize_batch([dict(recs[0])])  # 预热：模型加载不计入吞吐
+    batch = [dict(r) for r in recs]
+    t0 = time.perf_counter()
+    for i in range(0, len(batch), a.batch):
+        normalize_batch(batch[i:i+a.batch])
+    dt = time.perf_counter() - t0
+    return {"records": len(recs), "batch": a.batch, "seconds": round(dt, 3), "rec_per_s": round(len(recs) / dt, 1)}
+
+# ---- dedupe ----
+def _gen_bronze(root: Path, base: list, per_day: int, days: int, dup_rate: float, seed: int):
+    from datetime import date, timedelta
+    from src.core.storage import SegmentWriter
+    rng = random.Random(seed)
+    start = date(2030, 1, 1)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        with SegmentWriter("gen", day=day, root=str(root), max_records=5000) as w:
+            prev = []
+            for i in range(per_day):
+                if prev and rng.random() < dup_rate:
+                    r = dict(rng.choice(prev))  # 同一 URL 的重复抓取：正文或抽取方式不同
+                    r["text"] = (r.get("text") or "")[: rng.randint(0, len(r.get("text") or "") or 1)]
+                    r["extract_method"] = rng.choice(["trafilatura", "readability", "css-selectors", None])
+                else:
+                    r = dict(rng.choice(base))
+                    # 唯一性放在路径里：规范化会去掉片段，按域名规则还可能整个去掉 query
+                    u = urlsplit(r.get("url") or "")
+                    r["url"] = urlunsplit(u._replace(path=f"{u.path.rstrip('/')}/g{d}-{i}", fragment=""))
+                    r["url_hash"] = f"{d:03d}{i:08d}{(r.get('url_hash') or '')[:21]}"
+                    r.pop("canonical_url_hash", None)  # 换了 URL，沿用 base 的会把不同文章算成一条
+                    prev.append(r)
+                w.write(r)
+
+def scenario_dedupe(a, tmp):
+    from src.core.storage import day_dirs
+    days = day_dirs(a.bronze)
+    if not days:
+        return {"error": "no bronze data"}
+    base = _bronze_records(a.bronze, 5000)
+    sample = days[-min(7, len(days)):]
+    today = sum(sum(1 for _ in _iter(d)) for d in sample) / len(sample)  # 最近几天的日均量
+    out = {"baseline_per_day": round(today), "days": a.days, "dup_rate": a.dup_rate, "scales": {}}
+    for scale in a.scales:
+        root = tmp / f"dedupe_x{scale}"
+        per_day = int(today * scale)
+        t0 = time.perf_counter()
+        _gen_bronze(root, base, per_day, a.days, a.dup_rate, a.seed)
+        gen_s = time.perf_counter() - t0
+        env = {**os.environ, "BRONZE_ROOT": str(root), "DEDUPE_DAYS": "all", "NEARDUP": "1" if a.neardup else "0",
+               "STATE_DIR": str(tmp / f"state_x{scale}"), "DEDUPE_WORKERS": str(a.dedupe_workers or os.cpu_count() or 1)}
+        runs = []
+        for _ in range(2):  # 第二次：输入未变，测 manifest 跳过的开销
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "scripts/dedupe_repair.py")], env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+            runs.append(round(time.perf_counter() - t0, 3))
+        total = per_day * a.days
+        out["scales"][str(scale)] = {"records": total, "generate_s": round(gen_s, 3), "dedupe_s": runs[0],
+                                     "rec_per_s": round(total / runs[0], 1), "rerun_unchanged_s": runs[1]}
+    return out
+
+def _iter(d):
+    from src.core.storage import iter_day_records
+    return iter_day_records(d)
+
+SCENARIOS = {"adapter": scenario_adapter, "extract": scenario_extract, "feed": scenario_feed, "normalize": scenario_normalize,
+             "dedupe": scenario_dedupe}
+
+# ---- 输出与对比 ----
+def _meta(a):
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = None
+    return {"git": rev, "python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "args": {k: v for k, v in vars(a).items() if k != "compare"}}
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict): yield from _flatten(v, key)
+        elif isinstance(v, (int, float)) and not isinstance(v, bool): yield key, v
+
+def compare(old: dict, new: dict) -> dict:
+    """两次结果里同名数值的 新/旧 比值（>1 表示数值变大；耗时类越小越好，吞吐类越大越好）。"""
+    o = dict(_flatten(old.get("scenarios", {})))
+    return {k: {"old": o[k], "new": v, "ratio": round(v / o[k], 3)}
+            for k, v in _flatten(new.get("scenarios", {})) if k in o and o[k]}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("scenarios", nargs="*", help=f"默认全部：{' '.join(SCENARIOS)}")
+    ap.add_argument("--corpus", default="data/bench/corpus"); ap.add_argument("--bronze", default="data/bronze")
+    ap.add_argument("--latency-ms", type=float, default=0); ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0); ap.add_argument("--rate429", type=float, default=0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=0, help="抽取进程数（EXTRACT_WORKERS）")
+    ap.add_argument("--repeat", type=int, default=1); ap.add_argument("--limit", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--new-entries", type=int, default=3, help="feed 场景：水位线之前的新条目数")
+    ap.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[10, 100])
+    ap.add_argument("--days", type=int, default=3); ap.add_argument("--dup-rate", type=float, default=0.1)
+    ap.add_argument("--dedupe-workers", type=int, default=0); ap.add_argument("--neardup", action="store_true")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out"); ap.add_argument("--compare", help="与之前的结果 JSON 对比")
+    a = ap.parse_args()
+    a.scenarios = a.scenarios or list(SCENARIOS)
+    unknown = set(a.scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown scenario: {' '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="fintext-bench-") as tmp:
+        tmp = Path(tmp)
+        # 状态库与指标都放进临时目录，不碰生产的 data/state；必须在导入 src 模块之前设置
+        os.environ["STATE_DIR"] = str(tmp / "state")
+        os.environ.setdefault("METRICS_DIR", str(tmp / "metrics"))
+        res = {"meta": _meta(a), "scenarios": {}}
+        for name in a.scenarios:
+            print(f"[bench] {name} ...", file=sys.stderr)
+            res["scenarios"][name] = SCENARIOS[name](a, tmp)
+    if a.compare:
+        res["compare"] = compare(json.loads(Path(a.compare).read_text(encoding="utf-8")), res)
+    text = json.dumps(res, indent=2, ensure_ascii=False)
+    if a.out:
+        Path(a.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(a.out).write_text(text, encoding="utf-8")
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 #!/usr/bin/env bash
 set -e
+# 首选：run_all / harvestd 导出的最近一次成功时间（失败的运行不会推进它），而不是指标文件的修改时间
+NOW=$(date +%s)
+for PROM in /app/data/metrics/run_all.prom /app/data/metrics/harvestd.prom; do
+  LAST=$(grep '^fintext_last_success_timestamp_seconds' "$PROM" 2>/dev/null | awk '{print int($2)}' | head -n1 || true)
+  if [ -n "$LAST" ] && [ $((NOW - LAST)) -lt 1800 ]; then
+    echo "OK last success: $LAST ($(basename "$PROM"))"
+    exit 0
+  fi
+done
 LAST_FILE=$(find /app/data/bronze -type f -mmin -30 2>/dev/null | head -n1 || true)
 if [ -n "$LAST_FILE" ]; then
   echo "OK recent file: $LAST_FILE"
   exit 0
 else
-  echo "No fresh bronze files in last 30 minutes"
+  echo "No successful run and no fresh bronze files in last 30 minutes"
   exit 1
 fi
@@ -3,25 +3,25 @@ import os, sys, time
 from datetime import datetime, timedelta, timezone
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from src.adapters.api_gdelt import iter_domain_by_day
-from src.core.fetcher import get
-from src.core.extractor import extract_text
-from src.core.normalizer import normalize_record
-from src.core.storage import append_jsonl_for_day
-
-DEFAULT_DOMAINS = [
-    "cnbc.com","finance.yahoo.com","marketwatch.com","nasdaq.com","nyse.com",
-    "ecb.europa.eu","federalreserve.gov","bankofengland.co.uk","boj.or.jp",
-    "sec.gov","cftc.gov","bis.org","imf.org",
-]
-
-def parse_domains(env): return [d.strip() for d in env.split(",") if d.strip()] if env else DEFAULT_DOMAINS
+from src.core import metrics
+from src.adapters.api_gdelt import iter_domain_by_day, iter_domain_adaptive, VolumeHistory, parse_domains
+from src.pipeline import iter_processed
+from src.core.storage import SegmentWriter, committed_hashes
+from src.core.journal import WorkJournal
+from src.core.seen_index import SeenIndex
+from src.core.rawstore import RawStore
 
 def main():
     days = int(os.environ.get("GDELT_BACKFILL_DAYS", "30"))
     slices = int(os.environ.get("GDELT_SLICES_PER_DAY", "24"))
+    adaptive = os.environ.get("GDELT_ADAPTIVE", "1") == "1"  # 0 = 旧的固定切片
     domains = parse_domains(os.environ.get("GDELT_DOMAINS"))
 
+    history = VolumeHistory() if adaptive else None
+    seen = SeenIndex() if os.environ.get("SEEN_INDEX", "1") == "1" else None
+    raw = RawStore() if os.environ.get("RAW_STORE", "1") == "1" else None
+    journal = WorkJournal() if os.environ.get("JOURNAL", "1") == "1" else None
+
     today = datetime.now(timezone.utc).date()
     grand_total = 0
     for i in range(days):
@@ -29,30 +29,46 @@ def main():
         print(f"=== {day.date()} ===")
         day_total = 0
         for domain in domains:
-            batch = []
+            stats = {}
+            unit = ("gdelt", str(day.date()), domain, "")  # 自适应切片的窗口每次都可能不同，故以 domain-day 为单元
+            prefix = f"gdelt-{domain}"
+            if journal is not None:
+                if not journal.should_run(unit):
+                    print(f"[{day.date()}][{domain}] done (journal), skip")
+                    continue
+                journal.start(unit, prefix)
+            writer = SegmentWriter(prefix, day=day.date(), on_commit=seen.mark_many if seen is not None else None)
             try:
-                for rec in iter_domain_by_day(day, domain, slices_per_day=slices):
-                    try:
-                        html = get(rec["url"]).content
-                        first = html[:6000].lower()
-                        rec["paywall"] = rec.get("paywall", False) or (b"subscribe" in first or b"paywall" in first)
-                        ext = extract_text(html); rec.update(ext)
-                        rec = normalize_record(rec)
-                    except Exception:
-                        pass  # 保留元数据，方便后续重抓
-                    batch.append(rec)
-                if batch:
-                    append_jsonl_for_day(batch, day.date())
-                    print(f"[{day.date()}][{domain}] saved: {len(batch)}")
-                    day_total += len(batch)
+                items = (iter_domain_adaptive(day, domain, stats=stats, history=history) if adaptive
+                         else iter_domain_by_day(day, domain, slices_per_day=slices))
+                done = committed_hashes(day.date(), prefix)  # 上次中断前已落盘的记录
+                with writer:
+                    for rec in iter_processed((it for it in items if it["url_hash"] not in done), seen=seen, raw=raw):
+                        writer.write(rec)
+                if stats:
+                    print(f"[{day.date()}][{domain}] gdelt calls: {stats['calls']}  windows: {stats['windows']}  "
+                          f"splits: {stats['splits']}  truncated: {stats['truncated']}")
+                if journal is not None: journal.done(unit, writer.count)
+                if writer.count:
+                    print(f"[{day.date()}][{domain}] saved: {writer.count}")
                 else:
                     print(f"[{day.date()}][{domain}] no data")
             except Exception as e:
-                print(f"[{day.date()}][{domain}] error: {e}")
+                if journal is not None: journal.fail(unit, str(e))
+                print(f"[{day.date()}][{domain}] error: {e} (committed: {writer.count})")
+            day_total += writer.count
             time.sleep(0.2)
         print(f"[{day.date()}] total: {day_total}")
         grand_total += day_total
+    if raw is not None:
+        raw.evict()
+    if journal is not None:
+        print("JOURNAL:", journal.summary("gdelt"))
     print("TOTAL:", grand_total)
 
 if __name__ == "__main__":
-    main()
+    started = time.time()
+    try:
+        main()
+    finally:
+        metrics.export("backfill_gdelt", started)  # Prometheus textfile + 本轮 JSON 汇总
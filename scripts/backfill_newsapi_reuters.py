@@ -3,11 +3,13 @@ import os, sys, time
 from datetime import datetime, timedelta, timezone
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from src.core import metrics
 from src.adapters.api_newsapi import iter_reuters_by_day
-from src.core.fetcher import get
-from src.core.extractor import extract_text
-from src.core.normalizer import normalize_record
-from src.core.storage import append_jsonl_for_day
+from src.pipeline import iter_processed
+from src.core.storage import SegmentWriter, committed_hashes
+from src.core.journal import WorkJournal
+from src.core.seen_index import SeenIndex
+from src.core.rawstore import RawStore
 
 def main(days=30, max_pages=3):
 
@@ -15,41 +17,50 @@ def main(days=30, max_pages=3):
     start_day = today - timedelta(days=1)
     end_day = start_day - timedelta(days=days-1)
 
+    seen = SeenIndex() if os.environ.get("SEEN_INDEX", "1") == "1" else None
+    raw = RawStore() if os.environ.get("RAW_STORE", "1") == "1" else None
+    journal = WorkJournal() if os.environ.get("JOURNAL", "1") == "1" else None
     total = 0
     day = start_day
     while day >= end_day:
         day_dt = datetime.combine(day, datetime.min.time()).replace(tzinfo=timezone.utc)
         print(f"=== {day} ===")
-        out = []
+        unit = ("newsapi_reuters", str(day), "reuters", "")  # 分页带 sources→domains 降级，整天作为一个单元
+        if journal is not None and not journal.should_run(unit):
+            print(f"[{day}] done (journal), skip")
+            day -= timedelta(days=1)
+            continue
+        if journal is not None: journal.start(unit, "newsapi_reuters")
+        writer = SegmentWriter("newsapi_reuters", day=day, on_commit=seen.mark_many if seen is not None else None)
         try:
-            for rec in iter_reuters_by_day(day_dt, max_pages=max_pages):
-                try:
-                    html = get(rec["url"]).content
-                    first = html[:6000].lower()
-                    rec["paywall"] = (b"subscribe" in first or b"paywall" in first)
-                    ext = extract_text(html)
-                    rec.update(ext)
-                    rec = normalize_record(rec)
-                    out.append(rec)
-                except Exception:
-                    rec["http_status"] = "error"
-                    out.append(rec)
-            if out:
-                append_jsonl_for_day(out, day)
-                total += len(out)
-                print(f"[{day}] saved: {len(out)}")
-            else:
-                print(f"[{day}] no data")
+            done = committed_hashes(day, "newsapi_reuters")  # 上次中断前已落盘的记录
+            items = (it for it in iter_reuters_by_day(day_dt, max_pages=max_pages) if it["url_hash"] not in done)
+            with writer:
+                for rec in iter_processed(items, seen=seen, raw=raw):
+                    writer.write(rec)
+            if journal is not None: journal.done(unit, writer.count)
+            total += writer.count
+            print(f"[{day}] saved: {writer.count}" if writer.count else f"[{day}] no data")
         except Exception as e:
-            print(f"[{day}] error: {e}")
-
+            if journal is not None: journal.fail(unit, str(e))
+            total += writer.count
+            print(f"[{day}] error: {e} (committed: {writer.count})")
+            # 多半是限流或额度用尽，继续也只会连续失败；进度已记入日志，下次从这里续跑
             break
         time.sleep(0.5)  # 礼貌节流
         day -= timedelta(days=1)
 
+    if raw is not None:
+        raw.evict()
+    if journal is not None:
+        print("JOURNAL:", journal.summary("newsapi_reuters"))
     print("TOTAL:", total)
 
 if __name__ == "__main__":
     days = int(os.environ.get("NEWSAPI_BACKFILL_DAYS", "30"))
     max_pages = int(os.environ.get("NEWSAPI_MAX_PAGES_PER_DAY", "3"))
-    main(days=days, max_pages=max_pages)
+    started = time.time()
+    try:
+        main(days=days, max_pages=max_pages)
+    finally:
+        metrics.export("backfill_newsapi", started)  # Prometheus textfile + 本轮 JSON 汇总
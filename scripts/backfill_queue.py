@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+分片并行的回填：协调器把 (source, day, domain, part) 展开成任务放进本地租约队列（QUEUE_DIR/jobs.sqlite），
+任意多个 worker 进程（同一主机或共享数据卷的多台主机）领取任务、各自写段，最后 merge 并入 bronze 的日期分区。
+
+    python scripts/backfill_queue.py enqueue gdelt      # 按 GDELT_BACKFILL_DAYS × GDELT_DOMAINS（固定切片模式再 × 切片）建任务
+    python scripts/backfill_queue.py enqueue newsapi    # 按 NEWSAPI_BACKFILL_DAYS 每天一个任务
+    python scripts/backfill_queue.py work --procs 4     # 本机起 4 个 worker，队列空了就退出（--wait 则一直等新任务）
+    python scripts/backfill_queue.py merge              # 已结束任务的段移进 data/bronze/<day>/segments/
+    python scripts/backfill_queue.py status
+
+worker 把段写到 BACKFILL_STAGING/<worker>/<day>/segments/，文件名带任务前缀；租约过期被别的 worker 接手的任务，
+新 worker 会跳过各暂存目录里该任务已提交的记录。所有 worker 共享 QUEUE_DIR/rate.sqlite 里的按 host 限速。
+
+多台主机时只有 QUEUE_DIR 和 BACKFILL_STAGING 放在共享卷上；STATE_DIR（seen / hosts / urlcanon / 抽取路由等
+WAL 库）必须是每台主机自己的目录。设置了 QUEUE_DIR 而 STATE_DIR 落在它里面时 worker 拒绝启动。
+"""
+import os, sys, time, socket, signal, argparse, threading, subprocess
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from src.core import metrics
+from src.core.jobqueue import JobQueue, LeaseLost, QUEUE_DIR, QUEUE_LEASE_S
+from src.core.storage import SegmentWriter, SEGMENT_DIR, committed_hashes, segment_files
+
+STAGING = Path(os.environ.get("BACKFILL_STAGING", "data/staging"))
+BRONZE_ROOT = Path(os.environ.get("BRONZE_ROOT", "data/bronze"))
+
+def _days(n: int) -> list:
+    today = datetime.now(timezone.utc).date()
+    return [str(today - timedelta(days=i + 1)) for i in range(n)]
+
+# ---- enqueue ----
+def enqueue(source: str) -> list:
+    if source == "gdelt":
+        from src.adapters.api_gdelt import parse_domains
+        days = int(os.environ.get("GDELT_BACKFILL_DAYS", "30"))
+        domains = parse_domains(os.environ.get("GDELT_DOMAINS"))
+        if os.environ.get("GDELT_ADAPTIVE", "1") == "1":
+            parts = [""]  # 自适应规划器整天一起切窗口
+        else:
+            n = int(os.environ.get("GDELT_SLICES_PER_DAY", "24"))
+            parts = [f"{k:02d}of{n}" for k in range(len(_slice_windows(n)))]
+        return [("gdelt", d, dom, p) for d in _days(days) for dom in domains for p in parts]
+    if source == "newsapi":
+        return [("newsapi_reuters", d, "reuters", "") for d in _days(int(os.environ.get("NEWSAPI_BACKFILL_DAYS", "30")))]
+    raise SystemExit(f"unknown source: {source}")
+
+def _slice_windows(n, day=None):
+    from src.adapters.api_gdelt import slice_windows
+    return slice_windows(day or datetime(2000, 1, 1, tzinfo=timezone.utc), n)
+
+# ---- work ----
+def _prefix(unit) -> str:
+    source, _day, domain, part = unit
+    if source == "newsapi_reuters":
+        return "newsapi_reuters"
+    return f"gdelt-{domain}" + (f"-p{part}" if part else "")
+
+def _items(unit, stats, history):
+    source, day, domain, part = unit
+    day_dt = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    if source == "newsapi_reuters":
+        from src.adapters.api_newsapi import iter_reuters_by_day
+        return iter_reuters_by_day(day_dt, max_pages=int(os.environ.get("NEWSAPI_MAX_PAGES_PER_DAY", "3")))
+    from src.adapters.api_gdelt import iter_domain_adaptive, _fetch_slice
+    if not part:
+        return iter_domain_adaptive(day_dt, domain, stats=stats, history=history)
+    k, n = (int(x) for x in part.split("of"))
+    start, end = _slice_windows(n, day_dt)[k]
+    return iter(_fetch_slice(domain, start, end))
+
+class Lease(threading.Thread):
+    """处理任务期间每 1/3 租约续租一次；续租失败（已被别人接手）时置 lost。用自己的连接，不和主线程的事务交错。"""
+    def __init__(self, unit, owner):
+        super().__init__(daemon=True)
+        self.q, self.unit, self.owner = JobQueue(), unit, owner
+        self.lost, self._halt = False, threading.Event()
+        self.until = time.time() + QUEUE_LEASE_S  # 刚领到的租约；续租成功后顺延
+
+    def run(self):
+        while not self._halt.wait(QUEUE_LEASE_S / 3):
+            t = time.time()
+            if not self.q.renew(self.unit, self.owner):
+                self.lost = True
+                return
+            self.until = t + QUEUE_LEASE_S
+
+    def check(self):
+        """段提交前调用：租约已丢或即将到期（续租线程卡住）时抛 LeaseLost。"""
+        if self.lost or time.time() >= self.until - QUEUE_LEASE_S / 10:
+            self.lost = True
+            raise LeaseLost(f"{self.unit} taken over by another worker")
+
+    def stop(self):
+        self._halt.set()
+        self.join(); self.q.close()
+
+def run_job(unit, owner, seen, raw, history) -> int:
+    from src.pipeline import iter_processed
+    day = datetime.fromisoformat(unit[1]).date()
+    prefix = _prefix(unit)
+    # 之前的尝试（可能是别的 worker、别的主机，或已 merge 进 bronze 的失败尝试）已提交的记录
+    done = committed_hashes(day, prefix, root=str(BRONZE_ROOT))
+    for wd in STAGING.iterdir() if STAGING.is_dir() else []:
+        done |= committed_hashes(day, prefix, root=str(wd))
+    lease = Lease(unit, owner); lease.start()
+    stats = {}
+    writer = SegmentWriter(prefix, day=day, root=str(STAGING / owner), before_commit=lease.check,
+                           on_commit=seen.mark_many if seen is not None else None)
+    try:
+        with writer, metrics.tags(source_id=unit[0]):
+            try:
+                items = (it for it in _items(unit, stats, history) if it["url_hash"] not in done)
+                for rec in iter_processed(items, seen=seen, raw=raw):
+                    lease.check()
+                    writer.write(rec)
+                writer.flush()  # 最后一段也在这里提交，提交前同样检查租约
+            except LeaseLost:
+                # 新 owner 已按接手时的暂存段建好跳过集合，这里缓冲的记录不能再落盘，否则 merge 会并入两份
+                dropped = writer.discard()
+                if seen is not None:
+                    seen.release(r.get("url_hash") for r in dropped)
+                raise
+    finally:
+        lease.stop()
+    return writer.count
+
+def _check_state_dir():
+    # WAL 依赖共享内存，跨主机共享会损坏库：QUEUE_DIR 指向共享卷时，STATE_DIR 不能在同一处
+    from src.core.state import STATE_DIR
+    if QUEUE_DIR is None:
+        return
+    state, queue = Path(STATE_DIR).resolve(), Path(QUEUE_DIR).resolve()
+    if state == queue or queue in state.parents:
+        sys.exit(f"STATE_DIR ({STATE_DIR}) is inside QUEUE_DIR ({QUEUE_DIR}); "
+                 "queue workers need a host-local STATE_DIR")
+
+def work(wait: bool):
+    _check_state_dir()
+    from src.core.fetcher import limiter
+    from src.core.hosts import SharedRate
+    from src.core.seen_index import SeenIndex
+    from src.core.rawstore import RawStore
+    from src.adapters.api_gdelt import VolumeHistory
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    q = JobQueue()
+    limiter.shared = SharedRate(QUEUE_DIR)  # 所有 worker 合起来遵守每个 host 的 FETCH_HOST_RPS
+    seen = SeenIndex() if os.environ.get("SEEN_INDEX", "1") == "1" else None
+    raw = RawStore() if os.environ.get("RAW_STORE", "1") == "1" else None
+    history = VolumeHistory()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *a: stop.set())  # 当前任务做完再退出
+    started, n_jobs = time.time(), 0
+    while not stop.is_set():
+        unit = q.lease(owner)
+        if unit is None:
+            if not wait:
+                break
+            stop.wait(30); continue
+        t0 = time.perf_counter()
+        try:
+            n = run_job(unit, owner, seen, raw, history)
+            q.done(unit, owner, n)
+            metrics.inc("queue_jobs", source_id=unit[0], status="done")
+            print(f"[{owner}] {unit} saved: {n}", flush=True)
+        except Exception as e:
+            q.fail(unit, owner, f"{type(e).__name__}: {e}")
+            metrics.inc("queue_jobs", source_id=unit[0], status="failed")
+            print(f"[{owner}] {unit} error: {e}", flush=True)
+        metrics.observe("queue_job", time.perf_counter() - t0, source_id=unit[0])
+        n_jobs += 1
+    if raw is not None:
+        raw.evict()
+    print(f"[{owner}] exiting after {n_jobs} jobs", flush=True)
+    metrics.export(f"backfill_queue_{owner}", started)
+
+def spawn(procs: int, wait: bool):
+    cmd = [sys.executable, os.path.abspath(__file__), "work"] + (["--wait"] if wait else [])
+    children = [subprocess.Popen(cmd) for _ in range(procs)]
+    def forward(signum, frame):
+        for c in children: c.send_signal(signum)
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    return max(c.wait() for c in children)
+
+# ---- merge ----
+def merge() -> dict:
+    """把已结束任务在各暂存目录里的段移进 bronze；同一文件系统上是原子的 rename，段名全局唯一不会冲突。"""
+    q = JobQueue()
+    units = q.unmerged()
+    moved, days = 0, set()
+    workers = [wd for wd in STAGING.iterdir() if wd.is_dir()] if STAGING.is_dir() else []
+    for unit in units:
+        for wd in workers:
+            for p in segment_files(wd / unit[1], _prefix(unit)):
+                dst = BRONZE_ROOT / unit[1] / SEGMENT_DIR
+                dst.mkdir(parents=True, exist_ok=True)
+                os.replace(p, dst / p.name)
+                moved += 1; days.add(unit[1])
+    q.mark_merged(units)
+    return {"jobs": len(units), "segments": moved, "days": sorted(days)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("enqueue"); e.add_argument("source", choices=["gdelt", "newsapi"])
+    e.add_argument("--requeue-failed", action="store_true", help="把失败的任务重新排队")
+    w = sub.add_parser("work"); w.add_argument("--procs", type=int, default=1); w.add_argument("--wait", action="store_true")
+    sub.add_parser("merge"); sub.add_parser("status")
+    a = ap.parse_args()
+    if a.cmd == "enqueue":
+        q = JobQueue()
+        units = enqueue(a.source)
+        print(f"enqueued {q.enqueue(units)} new of {len(units)} jobs")
+        if a.requeue_failed:
+            print(f"requeued {q.requeue_failed(units[0][0] if units else None)} failed jobs")
+    elif a.cmd == "work":
+        _check_state_dir()
+        sys.exit(spawn(a.procs, a.wait) if a.procs > 1 else work(a.wait))
+    elif a.cmd == "merge":
+        r = merge()
+        print(f"merged {r['segments']} segments from {r['jobs']} jobs; days: {' '.join(r['days']) or '-'}")
+        if r["days"]:
+            print("run dedupe for them, e.g. DEDUPE_DAYS=all python scripts/dedupe_repair.py")
+    else:
+        print(JobQueue().summary())
+
+if __name__ == "__main__":
+    main()
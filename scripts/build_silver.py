@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+import os, sys, json, shutil
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.silver import SCHEMA, PARTITIONING, SILVER_ROOT
+
+BRONZE_ROOT = Path(os.getenv("BRONZE_ROOT", "data/bronze"))
+DAYS = os.getenv("SILVER_DAYS", "all").strip()
+ROW_GROUP = int(os.getenv("SILVER_ROW_GROUP", "50000"))
+MANIFEST = Path(SILVER_ROOT) / "_manifest.json"
+
+def _stamp(day_dir: Path) -> list:
+    # 输入是 docs_dedup.parquet（+ 近重复聚类 sidecar），二者任一变化都要重建该天
+    return [(f.name, f.stat().st_size, f.stat().st_mtime_ns)
+            for f in (day_dir / "docs_dedup.parquet", day_dir / "docs_clusters.parquet") if f.exists()]
+
+def list_days():
+    days = sorted(p.parent for p in BRONZE_ROOT.glob("*/docs_dedup.parquet"))
+    if DAYS.isdigit(): return days[-int(DAYS):]
+    return days
+
+def to_silver(day_dir: Path) -> pa.Table:
+    df = pd.read_parquet(day_dir / "docs_dedup.parquet")
+    clusters = day_dir / "docs_clusters.parquet"
+    if clusters.exists() and "url_hash" in df.columns:
+        df = df.merge(pd.read_parquet(clusters), on="url_hash", how="left")
+    if "published_at" in df.columns:
+        df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
+    if "text_len" not in df.columns:
+        df["text_len"] = df["text"].fillna("").astype(str).str.len() if "text" in df.columns else 0
+    df = df.sort_values("published_at", na_position="last") if "published_at" in df.columns else df
+    cols = {}
+    for f in SCHEMA:
+        col = df[f.name] if f.name in df.columns else pd.Series([None] * len(df), index=df.index)
+        if pa.types.is_dictionary(f.type):
+            cols[f.name] = pa.array(col.astype(object).where(col.notna(), None), type=pa.string()).dictionary_encode()
+        else:
+            cols[f.name] = pa.array(col.astype(object).where(col.notna(), None) if f.name != "published_at" else col, type=f.type, from_pandas=True)
+    t = pa.table(cols, schema=SCHEMA)
+    src = df["source_id"] if "source_id" in df.columns else pd.Series(["unknown"] * len(df))
+    t = t.append_column("date", pa.array([day_dir.name] * len(df), pa.string()))
+    return t.append_column("source_id", pa.array(src.fillna("unknown").astype(str).tolist(), pa.string()))
+
+def write_day(t: pa.Table, root=SILVER_ROOT):
+    fmt = ds.ParquetFileFormat()
+    opts = fmt.make_write_options(compression="zstd", use_dictionary=True, write_statistics=True)
+    ds.write_dataset(t, root, format=fmt, partitioning=PARTITIONING, file_options=opts,
+                     basename_template="part-{i}.parquet", existing_data_behavior="delete_matching",
+                     max_rows_per_group=ROW_GROUP, min_rows_per_group=min(ROW_GROUP, 10_000))
+
+def replace_day(day: str, t: pa.Table):
+    """
+    整天写进暂存目录（以 . 开头，数据集扫描会忽略），再改名换入 date=<day>。
+    旧目录先改名让出位置，两次改名之间读者会短暂看不到这一天，但不会看到半天的数据；
+    中途被停掉时 manifest 还没更新，下次运行重建这一天。
+    """
+    root = Path(SILVER_ROOT)
+    stage, old = root / f".staging-{day}", root / f".old-{day}"
+    for d in (stage, old):
+        shutil.rmtree(d, ignore_errors=True)
+    write_day(t, str(stage))
+    live, new = root / f"date={day}", stage / f"date={day}"
+    if live.exists():
+        os.replace(live, old)
+    if new.exists():  # 空表不产生任何文件
+        os.replace(new, live)
+    shutil.rmtree(stage, ignore_errors=True); shutil.rmtree(old, ignore_errors=True)
+
+def main():
+    os.makedirs(SILVER_ROOT, exist_ok=True)
+    try:
+        manifest = json.loads(MANIFEST.read_text())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    for day_dir in list_days():
+        stamp = [list(x) for x in _stamp(day_dir)]
+        if manifest.get(day_dir.name) == stamp:
+            continue
+        t = to_silver(day_dir)
+        replace_day(day_dir.name, t)  # 整天换掉：某个来源消失时它的旧分区也随之去掉
+        manifest[day_dir.name] = stamp
+        tmp = MANIFEST.with_suffix(".tmp"); tmp.write_text(json.dumps(manifest, indent=1)); os.replace(tmp, MANIFEST)
+        print(f"[silver] {day_dir.name}: {t.num_rows} rows")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,38 @@
 #!/usr/bin/env python
-import os, sys
+import os, io, sys, json, hashlib
 from pathlib import Path
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pj
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.storage import day_dirs, day_inputs, read_segment
+from src.core.urlcanon import URL_CANON, UrlAliases, canonicalize
 
 MIN_TEXT_CHARS = int(os.getenv("MIN_TEXT_CHARS", "0"))
 FILTER_YH_NEWS = os.getenv("FILTER_YH_NEWS", "0") == "1"
 DAYS = os.getenv("DEDUPE_DAYS", "").strip()
+WORKERS = int(os.getenv("DEDUPE_WORKERS", str(os.cpu_count() or 1)))
+FORCE = os.getenv("DEDUPE_FORCE", "0") == "1"  # 忽略 manifest，全部重算
+NEARDUP = os.getenv("NEARDUP", "1") == "1"     # 去重后再做跨来源/跨天近重复聚类
+TERM_INDEX = os.getenv("TERM_INDEX", "1") == "1"  # 最后更新 ticker / 机构名倒排索引
 
 # 在容器里 /app 是工作目录，这里显式用绝对路径更稳
-BRONZE_ROOT = Path("/app/data/bronze")
+BRONZE_ROOT = Path(os.getenv("BRONZE_ROOT", "/app/data/bronze"))
+MANIFEST = BRONZE_ROOT / "_dedupe_manifest.json"
+
+# 只有这些列参与清洗/排序/去重；text 只用来算长度，留在 Arrow 缓冲区里不转成 Python 字符串
+KEY_COLS = ["url", "url_hash", "extract_method", "published_at", "source_id"]
 
-def list_day_files():
-    days = sorted(BRONZE_ROOT.glob("*/docs.jsonl"))
+def list_day_dirs():
+    # 旧布局（docs.jsonl）和新布局（segments/*.jsonl.zst）都算输入
+    days = day_dirs(BRONZE_ROOT)
     if not days:
-        print("No docs.jsonl found under /app/data/bronze"); sys.exit(0)
+        print(f"No bronze data found under {BRONZE_ROOT}"); sys.exit(0)
     if DAYS == "all": return days
     if DAYS.isdigit(): return days[-int(DAYS):]
     return [days[-1]]
@@ -22,8 +41,99 @@ def preferred_order(m):
     order = {"trafilatura":0,"readability":1,"boilerpipe":2,"justext":3,"fallback":9,None:5,"":5}
     return order.get(m, 5)
 
-def load_df(p: Path) -> pd.DataFrame:
-    df = pd.read_json(p, lines=True)
+# ---- manifest：记录每个分区各输入文件的 size / mtime / hash，未变化的分区直接跳过 ----
+def _params():
+    p = {"MIN_TEXT_CHARS": MIN_TEXT_CHARS, "FILTER_YH_NEWS": FILTER_YH_NEWS}
+    if URL_CANON:
+        p["URL_CANON"] = 1  # 去重键改变后，旧 manifest 记录的分区需要重算一次
+    return p
+
+def _file_hash(p: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(m: dict):
+    tmp = MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(m, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, MANIFEST)
+
+def fingerprint(day_dir: Path, prev: dict | None) -> dict:
+    # 旧版 manifest 只记 docs.jsonl 一个文件（size/mtime_ns/hash 在顶层），照样复用
+    prev = prev or {}
+    prev_files = prev.get("files") or ({"docs.jsonl": prev} if "size" in prev else {})
+    files = {}
+    for p in day_inputs(day_dir):
+        name = p.relative_to(day_dir).as_posix()
+        st, old = p.stat(), prev_files.get(name) or {}
+        f = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        # size/mtime 都没变就不重新算 hash（段文件提交后不再改动）
+        f["hash"] = old.get("hash") if old.get("size") == f["size"] and old.get("mtime_ns") == f["mtime_ns"] else _file_hash(p)
+        files[name] = f
+    if list(files) == ["docs.jsonl"]:
+        combined = files["docs.jsonl"]["hash"]  # 只有旧布局时与旧 manifest 的 hash 一致
+    else:
+        combined = hashlib.blake2b("".join(f"{n}:{f['hash']};" for n, f in files.items()).encode(), digest_size=16).hexdigest()
+    return {"files": files, "hash": combined, "params": _params()}
+
+def is_unchanged(day_dir: Path, fp: dict, prev: dict | None) -> bool:
+    if FORCE or not prev or not (day_dir / "docs_dedup.parquet").exists():
+        return False
+    return prev.get("hash") == fp["hash"] and prev.get("params") == fp["params"]
+
+# ---- 读取 ----
+def _read_one(p: Path) -> pa.Table:
+    schema = pa.schema([(c, pa.string()) for c in KEY_COLS + ["text"]])
+    opts = pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="infer", newlines_in_values=False)
+    src = p if p.name == "docs.jsonl" else pa.BufferReader(read_segment(p))
+    return pj.read_json(src, read_options=pj.ReadOptions(block_size=16 << 20), parse_options=opts)
+
+def read_table(day_dir: Path) -> pa.Table:
+    inputs = day_inputs(day_dir)
+    tables = [_read_one(p) for p in inputs]
+    t = tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options="permissive")
+    # explicit_schema 会补出文件里根本不存在的列，去掉它们以免影响 url_hash/url 的去重分支
+    missing = [c for c in KEY_COLS + ["text"] if t[c].null_count == t.num_rows and t.num_rows]
+    t = t.drop_columns(missing)
+    # explicit_schema 的列会被排到最前面；按文件里首次出现的顺序排回去，输出列序与 pd.read_json 一致
+    head = _first_seen_columns(inputs[0])
+    order = [c for c in head if c in t.column_names] + [c for c in t.column_names if c not in head]
+    return t.select(order)
+
+def _first_seen_columns(p: Path, nbytes=1 << 20) -> list:
+    if p.name == "docs.jsonl":
+        with open(p, "rb") as f:
+            chunk = f.read(nbytes)
+    else:
+        chunk = read_segment(p)[:nbytes]
+    chunk = chunk[:chunk.rfind(b"\n") + 1]
+    try:
+        return pj.read_json(pa.BufferReader(chunk)).column_names if chunk else []
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return []
+
+def key_frame(t: pa.Table) -> pd.DataFrame:
+    df = t.select([c for c in KEY_COLS if c in t.column_names]).to_pandas()
+    df["_row"] = range(len(df))
+    if "published_at" in df.columns:
+        df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
+    df["text_len"] = pc.fill_null(pc.utf8_length(t["text"]).cast(pa.int64()), 0).to_numpy() if "text" in t.column_names else 0
+    df["method_rank"] = df["extract_method"].apply(preferred_order) if "extract_method" in df.columns else 5
+    return df
+
+def load_df(day_dir: Path) -> pd.DataFrame:
+    # 旧实现：Arrow 解析失败（类型冲突等）时的兜底
+    frames = [pd.read_json(p if p.name == "docs.jsonl" else io.BytesIO(read_segment(p)), lines=True)
+              for p in day_inputs(day_dir)]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
     if "published_at" in df.columns:
         df["published_at"] = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
     if "text" in df.columns:
@@ -46,40 +156,158 @@ def dedupe_df(df: pd.DataFrame) -> pd.DataFrame:
     cols += ["text_len"]
     if "published_at" in df.columns: cols.append("published_at")
     df = df.sort_values(cols, ascending=[True, False, True], na_position="last")
-    if "url_hash" in df.columns:
+    if URL_CANON and "url" in df.columns:
+        # 按规范化 URL 去重：跟踪参数、AMP、http/https、跳转前后的写法合并为一条。
+        # 与 canonical_url_hash 同一算法，但从 url 现算：用上抓取之后才学到的别名，也覆盖没有这一列的旧记录
+        key = canonical_keys(df["url"])
+        if "url_hash" in df.columns:
+            key = key.fillna(df["url_hash"])
+        df = df[~key.duplicated(keep="first") | key.isna()]
+    elif "url_hash" in df.columns:
         df = df.drop_duplicates(subset=["url_hash"], keep="first")
     elif "url" in df.columns:
         df = df.drop_duplicates(subset=["url"], keep="first")
     return df
 
+_alias_map = None
+
+def canonical_keys(urls: pd.Series) -> pd.Series:
+    global _alias_map
+    if _alias_map is None:
+        _alias_map = UrlAliases().snapshot()  # 每个进程读一次
+    def key(u):
+        c = canonicalize(u)
+        return _alias_map.get(hashlib.md5(c.encode()).hexdigest(), c)
+    uniq = urls.dropna().unique()
+    return urls.map(dict(zip(uniq, map(key, uniq))))
+
+def materialize(t: pa.Table, keep: pd.DataFrame) -> pd.DataFrame:
+    # 只把去重后存活的行（含 text）转成 pandas
+    taken = t.take(pa.array(keep["_row"].to_numpy()))
+    df = taken.to_pandas()
+    for c in taken.column_names:
+        # pd.read_json 把缺值的布尔列（比如部分记录没有 paywall）读成 float64 的 0.0/1.0/NaN，保持同样的 dtype
+        if pa.types.is_boolean(t[c].type) and t[c].null_count:
+            df[c] = taken[c].cast(pa.float64()).to_numpy(zero_copy_only=False)
+    if "published_at" in df.columns:
+        df["published_at"] = keep["published_at"].to_numpy()
+    if "text" not in t.column_names:
+        df["text"] = ""
+    df["text_len"] = keep["text_len"].to_numpy()
+    df["method_rank"] = keep["method_rank"].to_numpy() if "method_rank" in keep.columns else 5
+    df.index = keep.index
+    return df
+
 def save_outputs(df: pd.DataFrame, day_dir: Path):
     out_parquet = day_dir / "docs_dedup.parquet"
     out_jsonl   = day_dir / "docs_dedup.jsonl"
-    # 直接让 pandas 处理时间序列化（ISO）
-    df.to_parquet(out_parquet, index=False)
-    df.to_json(out_jsonl, orient="records", lines=True, force_ascii=False, date_format="iso")
+    # 先写临时文件再替换，读者不会看到写了一半的输出
+    tmp_parquet, tmp_jsonl = out_parquet.with_suffix(".parquet.tmp"), out_jsonl.with_suffix(".jsonl.tmp")
+    df.to_parquet(tmp_parquet, index=False)
+    df.to_json(tmp_jsonl, orient="records", lines=True, force_ascii=False, date_format="iso")
+    os.replace(tmp_parquet, out_parquet); os.replace(tmp_jsonl, out_jsonl)
     return out_jsonl, out_parquet
 
-def process_one(p: Path):
-    day_dir = p.parent
-    print(f"=== {day_dir.name} ===")
-    src = load_df(p); n0 = len(src)
-    by_src0 = src["source_id"].value_counts() if "source_id" in src.columns else None
+def process_one(day_dir: Path) -> str:
+    log = [f"=== {day_dir.name} ==="]
+    try:
+        t = read_table(day_dir)
+        src = key_frame(t)
+        df = dedupe_df(clean_df(src))
+        out = materialize(t, df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        src = load_df(day_dir)
+        out = dedupe_df(clean_df(src.copy()))
+    n0, n1 = len(src), len(out)
+
+    out_jsonl, out_parquet = save_outputs(out, day_dir)
+    log.append(f"Input: {n0}  →  Deduped: {n1}  (removed: {n0-n1})")
+    if "source_id" in src.columns:
+        log.append("By source (before):"); log.append(src["source_id"].value_counts().to_string())
+    if "source_id" in out.columns:
+        log.append("By source (after):"); log.append(out["source_id"].value_counts().to_string())
+    log.append(f"Saved: {out_jsonl}  &  {out_parquet}\n")
+    return "\n".join(log)
+
+# ---- 近重复聚类：结果写到每天的 docs_clusters.parquet（url_hash → cluster_id / canonical_doc） ----
+NEARDUP_COLS = ["url_hash", "text", "method_rank", "text_len", "published_at", "source_id"]
+
+def _neardup_docs(day_dir: Path):
+    p = day_dir / "docs_dedup.parquet"
+    cols = [c for c in NEARDUP_COLS if c in pq.read_schema(p).names]
+    df = pd.read_parquet(p, columns=cols)
+    if "published_at" in df.columns:
+        df["published_at"] = df["published_at"].map(lambda x: x.isoformat() if pd.notna(x) else None)
+    for c in ("method_rank", "text_len"):
+        if c in df.columns: df[c] = df[c].astype("Int64")
+    return df.astype(object).where(df.notna(), None).to_dict("records")
 
-    df = clean_df(src.copy())
-    df = dedupe_df(df); n1 = len(df)
+def neardup_stage(day_dirs):
+    from src.core.neardup import NearDupIndex, NEARDUP_WINDOW_DAYS
+    idx = NearDupIndex()
+    newest = max([d.name for d in day_dirs] + idx.days())
+    cutoff = (date.fromisoformat(newest) - timedelta(days=NEARDUP_WINDOW_DAYS - 1)).isoformat()
+    processed = set()
+    for d in sorted(day_dirs, key=lambda d: d.name):
+        if d.name >= cutoff:  # 窗口之外的旧分区不进索引
+            docs = _neardup_docs(d)
+            gone = idx.sync_day(d.name, (x["url_hash"] for x in docs))  # 再次 dedupe 后不在了的文档
+            n = idx.add(d.name, docs)
+            processed.add(d.name)
+            print(f"[neardup] {d.name}: indexed {n}" + (f"  removed {gone}" if gone else ""))
+    idx.prune(newest)
+    # 新文档可能改变窗口内旧簇的代表文档，所以窗口内每天的聚类结果都重写；
+    # 文档全部在前几天入过索引的分区也要写
+    for day in sorted(set(idx.days()) | {d for d in processed if d >= cutoff}):
+        day_dir = BRONZE_ROOT / day
+        if not day_dir.is_dir():
+            continue
+        ids = pd.read_parquet(day_dir / "docs_dedup.parquet", columns=["url_hash"]).dropna()
+        rows = idx.assignments(day, ids["url_hash"].tolist())
+        # 之前挂在别的天、随那天再次 dedupe 被删掉的文档，在这一天重新入索引
+        missing = set(ids["url_hash"]) - {r["url_hash"] for r in rows}
+        if missing and idx.add(day, [x for x in _neardup_docs(day_dir) if x["url_hash"] in missing]):
+            rows = idx.assignments(day, ids["url_hash"].tolist())
+        df = pd.DataFrame(rows, columns=["url_hash", "cluster_id", "canonical_doc"])
+        # 正文太短没有签名的文档自成一簇，保证每条记录都有 cluster_id
+        df = ids.merge(df, on="url_hash", how="left")
+        df["cluster_id"] = df["cluster_id"].fillna(df["url_hash"])
+        df["canonical_doc"] = df["canonical_doc"].fillna(df["url_hash"])
+        tmp = day_dir / "docs_clusters.parquet.tmp"
+        df.to_parquet(tmp, index=False); os.replace(tmp, day_dir / "docs_clusters.parquet")
+        print(f"[neardup] {day}: docs {len(df)}  clusters {df['cluster_id'].nunique()}")
 
-    out_jsonl, out_parquet = save_outputs(df, day_dir)
-    print(f"Input: {n0}  →  Deduped: {n1}  (removed: {n0-n1})")
-    if by_src0 is not None:
-        print("By source (before):"); print(by_src0.to_string())
-    if "source_id" in df.columns:
-        print("By source (after):"); print(df["source_id"].value_counts().to_string())
-    print(f"Saved: {out_jsonl}  &  {out_parquet}\n")
+# ---- ticker / 机构名倒排索引：docs_dedup.parquet 变了的分区整天重建 ----
+def term_index_stage():
+    from src.core.termindex import TermIndex
+    idx = TermIndex()
+    for day, (docs, postings) in sorted(idx.update(day_dirs(BRONZE_ROOT)).items()):
+        print(f"[termindex] {day}: docs {docs}  postings {postings}")
 
 def main():
-    for p in list_day_files():
-        process_one(p)
+    manifest = load_manifest()
+    todo = {}
+    for d in list_day_dirs():
+        day = d.name
+        fp = fingerprint(d, manifest.get(day))
+        if is_unchanged(d, fp, manifest.get(day)):
+            print(f"=== {day} === unchanged, skipped")
+            manifest[day] = fp
+            continue
+        todo[d] = fp
+        manifest.pop(day, None)  # 处理完成前先作废旧记录，中途崩溃时下次会重做
+    save_manifest(manifest)
+    if todo:
+        # 各天分区互相独立，多核并行
+        with ProcessPoolExecutor(max_workers=max(1, min(WORKERS, len(todo)))) as pool:
+            for (d, fp), log in zip(todo.items(), pool.map(process_one, todo)):
+                print(log)
+                manifest[d.name] = fp
+                save_manifest(manifest)
+        if NEARDUP:
+            neardup_stage(list(todo))
+    if TERM_INDEX:  # 分区没变时也检查一遍：首次运行或索引库被删后补建
+        term_index_stage()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+查看按域名学到的抽取策略统计（STATE_DIR/extract_routes.sqlite）：
+每个策略的尝试次数、命中率、胜出次数、平均耗时，以及当前是否被跳过。
+
+python scripts/extract_routes.py [--domain finance.yahoo.com] [--json] [--reset]
+"""
+import os, sys, json, argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from src.core.extract_routes import ExtractRoutes, EXTRACT_ROUTE_MIN_DOCS, EXTRACT_ROUTE_SKIP_BELOW
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--domain"); ap.add_argument("--json", action="store_true")
+    ap.add_argument("--reset", action="store_true", help="清空统计（指定 --domain 时只清该域名）")
+    a = ap.parse_args()
+    r = ExtractRoutes()
+    if a.reset:
+        r.reset(a.domain); print("reset", a.domain or "all"); return
+    rows = [{"domain": d, "strategy": s, "attempts": round(n, 1), "hit_rate": round(h / n, 3) if n else None,
+             "wins": round(w, 1), "mean_ms": round(c / n * 1e3, 2) if n else None,
+             "skipped": n >= EXTRACT_ROUTE_MIN_DOCS and h / n < EXTRACT_ROUTE_SKIP_BELOW}
+            for d, s, n, h, w, c, _t in r.rows(a.domain)]
+    if a.json:
+        print(json.dumps(rows, indent=1)); return
+    print(f"{'domain':<32} {'strategy':<14} {'attempts':>8} {'hit%':>6} {'wins':>7} {'mean_ms':>8}  skipped")
+    for x in rows:
+        hit = f"{x['hit_rate'] * 100:.1f}" if x["hit_rate"] is not None else "-"
+        print(f"{x['domain']:<32} {x['strategy']:<14} {x['attempts']:>8} {hit:>6} {x['wins']:>7} {x['mean_ms']!s:>8}  {'yes' if x['skipped'] else ''}")
+
+if __name__ == "__main__":
+    main()
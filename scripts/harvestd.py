@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+常驻采集进程：取代 cron 每 10 分钟冷启动一次 run_all.py（cron 方式仍然可用）。
+
+- 模型、连接池、抽取进程池、SQLite 连接都只初始化一次；config/sources.yaml 改动后自动重新读入
+- 每个 rss_sources 条目按自己的间隔轮询：间隔根据 feed 的实际更新情况调整（见 feed_state.next_interval），
+  带随机抖动，限制在 [SCHED_MIN_S, SCHED_MAX_S]，持久化在 feeds.sqlite，重启后沿用
+- 每天 HARVESTD_MAINTENANCE_AT（本地时间）在后台跑一次 dedupe_repair.py + build_silver.py，不阻塞采集
+- SIGTERM / SIGINT：当前 feed 处理完后停止，提交缓冲中的段（并登记 seen、保存 ETag），导出指标后退出
+"""
+import os, sys, time, yaml, signal, threading, subprocess
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from src.core import metrics
+from src.pipeline import run_adapter
+from src.adapters.rss_generic import RSSAdapter
+from src.core.seen_index import SeenIndex
+from src.core.feed_state import FeedValidators, FeedSchedule, next_interval, jittered, SCHED_MAX_S
+from src.core.rawstore import RawStore
+from src.core.hosts import HostOpen
+from src.core.fetcher import health
+from src.core.storage import SegmentWriter
+
+SOURCES = os.environ.get("HARVESTD_SOURCES", "config/sources.yaml")
+MAINTENANCE_AT = os.environ.get("HARVESTD_MAINTENANCE_AT", "03:00").strip()  # 空 = 不跑（仍由 cron 负责）
+METRICS_EVERY_S = float(os.environ.get("HARVESTD_METRICS_S", "60"))
+EVICT_EVERY_S = float(os.environ.get("HARVESTD_EVICT_S", "3600"))
+_TICK_S = 5.0  # 空闲时最长睡这么久：检查停止信号、到期的段与周期任务
+
+def _log(msg):
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {msg}", flush=True)
+
+class Sources:
+    """sources.yaml 的 rss_sources，文件修改时间变化时重新读入。"""
+    def __init__(self, path):
+        self.path, self._mtime, self.feeds = path, None, []
+
+    def refresh(self) -> list:
+        m = os.stat(self.path).st_mtime
+        if m != self._mtime:
+            self.feeds = yaml.safe_load(open(self.path, "r", encoding="utf-8"))["rss_sources"]
+            if self._mtime is not None:
+                _log(f"[CONFIG] reloaded {len(self.feeds)} feeds")
+            self._mtime = m
+        return self.feeds
+
+class Maintenance(threading.Thread):
+    """
+    每日维护：到点后在子进程里依次跑 dedupe_repair.py 和 build_silver.py。
+    用子进程而不是在本进程里调用：dedupe 自己会开进程池，从带着抓取线程的进程里 fork 不安全，
+    而且大 DataFrame 占用的内存随子进程退出归还，不会留在常驻进程里。
+    """
+    JOBS = ["scripts/dedupe_repair.py", "scripts/build_silver.py"]
+
+    def __init__(self, at: str, sched: FeedSchedule, stop: threading.Event):
+        super().__init__(name="maintenance", daemon=True)
+        # 解析成 time 再比较：按字符串比，"3:00" 要到 10:00 之后才算到点
+        self.at = datetime.strptime(at, "%H:%M").time()
+        self.sched, self.stop, self.proc = sched, stop, None
+
+    def due(self) -> str | None:
+        now = datetime.now()
+        day = now.strftime("%Y-%m-%d")
+        if now.time() >= self.at and self.sched.last_run("maintenance") != day:
+            return day
+        return None
+
+    def run(self):
+        while not self.stop.wait(30):
+            day = self.due()
+            if day is None:
+                continue
+            _log("[MAINT] start")
+            t0 = time.perf_counter()
+            for job in self.JOBS:
+                self.proc = subprocess.Popen([sys.executable, os.path.join(ROOT, job)], cwd=os.getcwd())
+                rc = self.proc.wait()
+                self.proc = None
+                if self.stop.is_set():
+                    return
+                metrics.inc("harvestd_maintenance", job=os.path.basename(job), status="ok" if rc == 0 else "error")
+                if rc != 0:
+                    _log(f"[MAINT] {job} exited with {rc}")
+                    break
+            self.sched.mark_run("maintenance", day)
+            metrics.observe("harvestd_maintenance", time.perf_counter() - t0)
+            _log(f"[MAINT] done in {time.perf_counter() - t0:.0f}s")
+
+    def terminate(self):
+        # dedupe 按 manifest 续做；silver 每天写在暂存目录里再改名换入，manifest 最后才更新，中途停掉是安全的
+        p = self.proc
+        if p is not None and p.poll() is None:
+            p.terminate()
+            try: p.wait(30)
+            except subprocess.TimeoutExpired: p.kill()
+
+def poll(s, sched, seen, validators, raw, writer) -> bool:
+    """轮询一个 feed；feed 正常响应（含 304）时返回 True。"""
+    url = s["url"]
+    prev, _ = sched.get(url)
+    adapter = RSSAdapter(url, s["id"], s["name"], validators=validators, seen=seen)
+    t0 = time.perf_counter()
+    n, ok = 0, False
+    try:
+        n = run_adapter(adapter, seen=seen, raw=raw, writer=writer)
+        ok = True
+        interval = next_interval(prev, n, adapter.published, adapter.not_modified)
+        _log(f"[DONE] {s['id']} -> {n} docs" + (" (not modified)" if adapter.not_modified else "") + f", next in {interval:.0f}s")
+    except HostOpen as e:
+        hh = health()
+        wait = hh.open_for((urlsplit(url).hostname or "").lower()) if hh is not None else 0
+        interval = max(prev, wait)
+        _log(f"[SKIP] {s['id']} -> {e}")
+    except Exception as e:  # 单个 feed 的异常不能让常驻进程退出
+        interval = min(prev * 2, SCHED_MAX_S)
+        metrics.inc("harvestd_poll_error", source_id=s["id"])
+        _log(f"[ERROR] {s['id']} -> {type(e).__name__}: {e}")
+    metrics.observe("harvestd_poll", time.perf_counter() - t0, source_id=s["id"])
+    sched.save(url, interval, time.time() + jittered(interval), n)
+    return ok
+
+def main():
+    started = time.time()
+    stop = threading.Event()
+    def on_signal(signum, frame):
+        _log(f"[STOP] signal {signum}, finishing current feed")
+        stop.set()
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    sources = Sources(SOURCES)
+    sched = FeedSchedule()
+    seen = SeenIndex() if os.environ.get("SEEN_INDEX", "1") == "1" else None
+    validators = FeedValidators() if os.environ.get("FEED_CONDITIONAL", "1") == "1" else None
+    raw = RawStore() if os.environ.get("RAW_STORE", "1") == "1" else None
+    maint = Maintenance(MAINTENANCE_AT, FeedSchedule(), stop) if MAINTENANCE_AT else None
+    if maint is not None:
+        maint.start()
+    last_metrics = last_evict = time.monotonic()
+    last_ok = None  # 最近一次成功轮询的时间戳：健康检查据此判断，而不是看指标文件是否刚被重写
+    _log(f"[START] {len(sources.refresh())} feeds")
+
+    # 一个长期存在的段写入器：按 BRONZE_SEGMENT_RECORDS / BRONZE_SEGMENT_SECONDS 提交，空闲时由 flush_if_due 兜底
+    writer = SegmentWriter("rss", on_commit=seen.mark_many if seen is not None else None)
+    try:
+        while not stop.is_set():
+            due = sorted(((sched.get(s["url"])[1], i) for i, s in enumerate(sources.refresh())))
+            if due and due[0][0] <= time.time():
+                if poll(sources.feeds[due[0][1]], sched, seen, validators, raw, writer):
+                    last_ok = time.time()
+            else:
+                stop.wait(min(_TICK_S, max(0.0, due[0][0] - time.time())) if due else _TICK_S)
+            writer.flush_if_due()
+            now = time.monotonic()
+            if now - last_metrics >= METRICS_EVERY_S:
+                metrics.export("harvestd", started, last_ok, cumulative=True); last_metrics = now
+            if raw is not None and now - last_evict >= EVICT_EVERY_S:
+                raw.evict(); last_evict = now
+    finally:
+        writer.close()
+        if maint is not None:
+            maint.terminate()
+        metrics.export("harvestd", started, last_ok, cumulative=True)
+        _log("[STOP] flushed, exiting")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+离线重抽取：用本地存档的原始 HTML（RawStore）重新跑 extract_text + normalize_record，
+并原子地重写对应日期分区的 docs.jsonl 与各个段文件，全程不访问网络。
+"""
+import os, sys, json
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from src.core.rawstore import RawStore
+from src.core.extractor import extract_text
+from src.core.normalizer import normalize_record
+from src.core.storage import day_dirs, day_inputs, read_segment, write_segment
+
+BRONZE_ROOT = Path(os.getenv("BRONZE_ROOT", "data/bronze"))
+DAYS = os.getenv("REEXTRACT_DAYS", "").strip()
+WORKERS = int(os.getenv("REEXTRACT_WORKERS", str(os.cpu_count() or 2)))
+INCLUDE_TODAY = os.getenv("REEXTRACT_INCLUDE_TODAY", "0") == "1"  # 当天分区 cron 仍在追加，默认跳过
+
+_store = None
+
+def list_day_dirs():
+    days = day_dirs(BRONZE_ROOT)
+    if not INCLUDE_TODAY:
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        days = [d for d in days if d.name != today]
+    if DAYS == "all": return days
+    if DAYS.isdigit(): return days[-int(DAYS):]
+    return days[-1:]
+
+def _reextract(line: str) -> tuple[str, bool]:
+    global _store
+    _store = _store or RawStore()
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return line, False
+    html = _store.get(rec.get("url_hash") or "")
+    if html is None:
+        return line, False
+    try:
+        rec.update(extract_text(html))
+        rec.pop("http_status", None)
+        rec.pop("language", None)  # 按新正文重新识别：旧正文可能为空或只是页面样板
+        rec = normalize_record(rec)
+    except Exception:
+        return line, False
+    return json.dumps(rec, ensure_ascii=False) + "\n", True
+
+def process_one(day_dir: Path, pool) -> None:
+    total = changed = 0
+    for p in day_inputs(day_dir):
+        text = read_segment(p).decode("utf-8")
+        lines = [l + "\n" for l in text.split("\n") if l.strip()]
+        out = []
+        for line, ok in pool.map(_reextract, lines, chunksize=32):
+            out.append(line); changed += ok
+        # 段文件提交后不可变；这里整段重写并原子替换，写入器不会再碰已提交的段
+        write_segment(p, "".join(out).encode("utf-8"))
+        total += len(lines)
+    print(f"[{day_dir.name}] records: {total}  re-extracted: {changed}")
+
+def main():
+    with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+        for d in list_day_dirs():
+            process_one(d, pool)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,42 @@
 #!/usr/bin/env python
-import os, sys, yaml
+import os, sys, time, yaml
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from src.core import metrics
 
 from src.pipeline import run_adapter
 from src.adapters.rss_generic import RSSAdapter
+from src.core.seen_index import SeenIndex
+from src.core.feed_state import FeedValidators
+from src.core.rawstore import RawStore
+from src.core.hosts import HostOpen
+from src.core.storage import SegmentWriter
 
 def main():
     cfg = yaml.safe_load(open("config/sources.yaml","r",encoding="utf-8"))
-    total = 0
-    for s in cfg["rss_sources"]:
-        adapter = RSSAdapter(s["url"], s["id"], s["name"])
-        n = run_adapter(adapter)
-        print(f"[DONE] {s['id']} -> {n} docs")
-        total += n
+    seen = SeenIndex() if os.environ.get("SEEN_INDEX", "1") == "1" else None
+    validators = FeedValidators() if os.environ.get("FEED_CONDITIONAL", "1") == "1" else None
+    raw = RawStore() if os.environ.get("RAW_STORE", "1") == "1" else None
+    total = done = 0
+    # 一轮 cron 的所有 feed 共用一个段写入器：记录攒成少量大段，而不是每个 feed 一个小文件
+    with SegmentWriter("rss", on_commit=seen.mark_many if seen is not None else None) as writer:
+        for s in cfg["rss_sources"]:
+            adapter = RSSAdapter(s["url"], s["id"], s["name"], validators=validators, seen=seen)
+            try:
+                n = run_adapter(adapter, seen=seen, raw=raw, writer=writer)
+            except HostOpen as e:  # 熔断中的 host 这一轮直接跳过，不再占用 cron 窗口
+                print(f"[SKIP] {s['id']} -> {e}")
+                continue
+            print(f"[DONE] {s['id']} -> {n} docs" + (" (not modified)" if adapter.not_modified else ""))
+            total += n; done += 1
     print(f"Total: {total}")
+    if raw is not None:
+        raw.evict()
+    return done
 
 if __name__ == "__main__":
-    main()
+    started, success = time.time(), None
+    try:
+        if main():  # 至少一个 feed 正常走完才算成功；全部熔断跳过或中途异常都不算
+            success = time.time()
+    finally:
+        metrics.export("run_all", started, success)  # Prometheus textfile + 本轮 JSON 汇总
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+ticker / 机构名倒排索引（STATE_DIR/termindex.sqlite）：dedupe_repair.py 结束时自动更新，这里可以单独补建和查询。
+
+python scripts/term_index.py --update                               # 索引 docs_dedup.parquet 有变化的分区
+python scripts/term_index.py NVDA --from 2025-08-01 --to 2025-08-31 # 提到 NVDA 的文档（也可以写 Nvidia、$NVDA）
+python scripts/term_index.py ECB --load --json                      # 连同标题、URL 一起输出
+python scripts/term_index.py --top 20 --from 2025-08-01             # 期间文档数最多的词条
+"""
+import os, sys, json, time, argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.core.storage import day_dirs
+from src.core.termindex import TermIndex, load
+
+BRONZE_ROOT = os.getenv("BRONZE_ROOT", "data/bronze")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("term", nargs="?")
+    ap.add_argument("--from", dest="start"); ap.add_argument("--to", dest="end")
+    ap.add_argument("--update", action="store_true"); ap.add_argument("--top", type=int)
+    ap.add_argument("--load", action="store_true", help="从天分区读出标题、URL、发布时间")
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args()
+    idx = TermIndex()
+    if a.update:
+        for day, (docs, postings) in sorted(idx.update(day_dirs(BRONZE_ROOT)).items()):
+            print(f"[termindex] {day}: docs {docs}  postings {postings}")
+    if a.top:
+        for term, n in idx.terms(a.start, a.end, a.top):
+            print(f"{term:<12} {n:>7}")
+    if not a.term:
+        return
+    t0 = time.perf_counter()
+    hits = idx.lookup(a.term, a.start, a.end)
+    dt = time.perf_counter() - t0
+    rows = list(load(hits, ["url", "title", "published_at", "source_id"], root=BRONZE_ROOT)) if a.load else hits
+    if a.json:
+        print(json.dumps(rows, indent=1, ensure_ascii=False, default=str)); return
+    print(f"{idx.matcher.resolve(a.term)}: {len(hits)} docs in {dt * 1e3:.1f} ms", file=sys.stderr)
+    for r in rows:
+        if a.load:
+            print(f"{str(r.get('published_at') or '')[:19]:<19}  {r.get('source_id') or '':<24} {r.get('title')}  {r.get('url')}")
+        else:
+            print(f"{r['day']}  {r['url_hash']}  {len(r['positions'])}")
+
+if __name__ == "__main__":
+    main()
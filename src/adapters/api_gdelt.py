@@ -1,9 +1,30 @@
-import hashlib, requests, json
+import os, math, time, json
 from datetime import datetime, timezone, timedelta
-from typing import Iterable, Dict, Any, List
-from tenacity import retry, wait_exponential, stop_after_attempt
+from typing import Iterable, Dict, Any, List, Tuple
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from src.core.state import connect
+from src.core.fetcher import get
+from src.core.urlcanon import url_fields
 
 BASE = "https://api.gdeltproject.org/api/v2/doc/doc"
+MAX_RECORDS = 250                                                           # GDELT artlist 单次上限
+GDELT_TARGET_PER_CALL = int(os.environ.get("GDELT_TARGET_PER_CALL", "200"))  # 规划时每个窗口的期望条数
+GDELT_MIN_WINDOW_S = int(os.environ.get("GDELT_MIN_WINDOW_S", "600"))        # 二分到这么短仍饱和就记为截断
+
+# 回填默认的域名列表（GDELT_DOMAINS 逗号分隔可覆盖），backfill_gdelt_domains.py 与 backfill_queue.py 共用
+DEFAULT_DOMAINS = [
+    "cnbc.com","finance.yahoo.com","marketwatch.com","nasdaq.com","nyse.com",
+    "ecb.europa.eu","federalreserve.gov","bankofengland.co.uk","boj.or.jp",
+    "sec.gov","cftc.gov","bis.org","imf.org",
+]
+
+def parse_domains(env): return [d.strip() for d in env.split(",") if d.strip()] if env else DEFAULT_DOMAINS
+
+# GDELT 给的是语言全称；转成与 langid 一致的 ISO 639-1 代码，认不出的留空交给 langid
+_LANG = {
+    "English": "en", "French": "fr", "German": "de", "Spanish": "es", "Italian": "it", "Portuguese": "pt",
+    "Dutch": "nl", "Japanese": "ja", "Chinese": "zh", "Korean": "ko", "Russian": "ru", "Arabic": "ar",
+}
 
 def _parse_seendate(s: str) -> str | None:
     if not s: return None
@@ -16,8 +37,12 @@ def _parse_seendate(s: str) -> str | None:
     except Exception:
         return None
 
-@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5))
-def _fetch_slice(domain: str, start_dt: datetime, end_dt: datetime, max_records: int = 250) -> List[dict]:
+def _fetch_slice(domain: str, start_dt: datetime, end_dt: datetime, max_records: int = MAX_RECORDS) -> List[dict]:
+    return _query_slice(domain, start_dt, end_dt, max_records)[0]
+
+@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5), retry=retry_if_exception_type(json.JSONDecodeError))
+def _query_slice(domain: str, start_dt: datetime, end_dt: datetime, max_records: int = MAX_RECORDS) -> Tuple[List[dict], int]:
+    """返回 (记录, 接口原始条数)；原始条数达到 max_records 说明窗口饱和、结果被截断。"""
     params = {
         "query": f"domain:{domain}",
         "mode": "artlist",
@@ -27,8 +52,7 @@ def _fetch_slice(domain: str, start_dt: datetime, end_dt: datetime, max_records:
         "startdatetime": start_dt.strftime("%Y%m%d%H%M%S"),
         "enddatetime":   end_dt.strftime("%Y%m%d%H%M%S"),
     }
-    r = requests.get(BASE, params=params, timeout=30)
-    r.raise_for_status()
+    r = get(BASE, params=params, timeout=30, block=True)  # HTTP 层的重试与熔断在 fetcher.get 里
     try:
         j = r.json()
     except json.JSONDecodeError:
@@ -43,25 +67,112 @@ def _fetch_slice(domain: str, start_dt: datetime, end_dt: datetime, max_records:
         pub = _parse_seendate(a.get("seendate") or a.get("date") or a.get("published") or "")
         out.append({
             "url": url,
-            "url_hash": hashlib.md5(url.encode()).hexdigest(),
+            **url_fields(url),
             "title": a.get("title"),
             "description": a.get("title"),
             "published_at": pub,
             "source_id": f"gdelt_{domain.replace('.', '_')}",
             "source_name": f"{domain} via GDELT",
             "crawl_method": "gdelt",
-            "language": a.get("language"),
+            "language": _LANG.get(a.get("language") or ""),
             "paywall": False,
         })
-    return out
+    return out, len(items)
 
-def iter_domain_by_day(day_utc: datetime, domain: str, slices_per_day: int = 24) -> Iterable[Dict[str, Any]]:
+def slice_windows(day_utc: datetime, slices_per_day: int = 24) -> List[Tuple[datetime, datetime]]:
+    """固定切片模式下一天的各个窗口（按整小时步长，首尾闭区间）。"""
     day_utc = day_utc.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     step = timedelta(hours=max(1, 24 // max(1, slices_per_day)))
     start = day_utc
     end_of_day = day_utc + timedelta(days=1) - timedelta(seconds=1)
+    out = []
     while start <= end_of_day:
-        end = min(start + step - timedelta(seconds=1), end_of_day)
+        out.append((start, min(start + step - timedelta(seconds=1), end_of_day)))
+        start += step
+    return out
+
+def iter_domain_by_day(day_utc: datetime, domain: str, slices_per_day: int = 24) -> Iterable[Dict[str, Any]]:
+    for start, end in slice_windows(day_utc, slices_per_day):
         for it in _fetch_slice(domain, start, end):
             yield it
-        start += step
+
+class VolumeHistory:
+    """每个 domain 按小时（UTC）的文章量 EWMA，用来给自适应规划器切窗口。"""
+    ALPHA = 0.3
+
+    def __init__(self, name="gdelt.sqlite"):
+        self._db = connect(name)
+        self._db.execute("CREATE TABLE IF NOT EXISTS volume(domain TEXT PRIMARY KEY, hourly TEXT NOT NULL, days INTEGER NOT NULL, updated_at REAL NOT NULL)")
+
+    def hourly(self, domain: str) -> List[float] | None:
+        row = self._db.execute("SELECT hourly FROM volume WHERE domain=?", (domain,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, domain: str, counts: List[int]) -> None:
+        prev = self.hourly(domain)
+        new = counts if prev is None else [p + self.ALPHA * (c - p) for p, c in zip(prev, counts)]
+        self._db.execute("""INSERT INTO volume VALUES(?,?,1,?) ON CONFLICT(domain) DO UPDATE SET
+            hourly=excluded.hourly, days=volume.days+1, updated_at=excluded.updated_at""",
+            (domain, json.dumps([round(x, 2) for x in new]), time.time()))
+
+def plan_windows(day_utc: datetime, hourly: List[float] | None, target: int = GDELT_TARGET_PER_CALL,
+                 default_slices: int = 4) -> List[Tuple[datetime, datetime]]:
+    """
+    按历史小时量把一天切成若干窗口：相邻的稀疏小时合并，直到窗口期望量接近 target；
+    期望量超过 target 的繁忙小时再等分成几段（仍饱和时由执行阶段二分）。
+    没有历史时均分成 default_slices 段。
+    """
+    if hourly is None:
+        spans = [24 * 3600 // default_slices] * default_slices
+    else:
+        spans, acc, n = [], 0.0, 0
+        for h in range(24):
+            v = hourly[h] * 1.25  # 留 25% 余量：EWMA 只是期望，实际量有波动
+            if v > target:
+                if n: spans.append(n * 3600); acc, n = 0.0, 0
+                k = math.ceil(v / target)
+                spans.extend([3600 // k] * (k - 1) + [3600 - 3600 // k * (k - 1)])
+                continue
+            if n and acc + v > target:
+                spans.append(n * 3600); acc, n = 0.0, 0
+            acc += v; n += 1
+        if n: spans.append(n * 3600)
+    out, start = [], day_utc
+    for sec in spans:
+        end = start + timedelta(seconds=sec)
+        out.append((start, end - timedelta(seconds=1)))
+        start = end
+    return out
+
+def iter_domain_adaptive(day_utc: datetime, domain: str, stats: Dict[str, int] | None = None,
+                         history: VolumeHistory | None = None) -> Iterable[Dict[str, Any]]:
+    """
+    自适应切片：窗口饱和（达到 MAX_RECORDS）就二分后重查，直到不饱和或短于 GDELT_MIN_WINDOW_S；
+    稀疏时段按历史量合并成大窗口以减少调用。stats 里累计 calls / windows / splits / truncated / items。
+    """
+    day_utc = day_utc.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = stats if stats is not None else {}
+    for k in ("calls", "windows", "splits", "truncated", "items"):
+        stats.setdefault(k, 0)
+    history = history or VolumeHistory()
+    counts = [0] * 24
+    stack = list(reversed(plan_windows(day_utc, history.hourly(domain))))
+    while stack:
+        start, end = stack.pop()
+        items, n_raw = _query_slice(domain, start, end)
+        stats["calls"] += 1
+        span = (end - start).total_seconds() + 1
+        if n_raw >= MAX_RECORDS and span > GDELT_MIN_WINDOW_S:
+            mid = start + timedelta(seconds=int(span // 2))
+            stack.append((mid, end)); stack.append((start, mid - timedelta(seconds=1)))
+            stats["splits"] += 1
+            continue
+        if n_raw >= MAX_RECORDS:
+            stats["truncated"] += 1
+        stats["windows"] += 1
+        for it in items:
+            hr = datetime.fromisoformat(it["published_at"]).hour if it.get("published_at") else start.hour
+            counts[hr] += 1
+            stats["items"] += 1
+            yield it
+    history.update(domain, counts)
@@ -1,8 +1,8 @@
-import os, math, hashlib, time
+import os, math, time
 from datetime import datetime, timedelta, timezone
 from typing import Iterable, Dict, Any
-import requests
-from tenacity import retry, wait_exponential, stop_after_attempt
+from src.core.fetcher import get
+from src.core.urlcanon import url_fields
 
 NEWSAPI_KEY = os.environ.get("NEWSAPI_KEY")
 BASE = "https://newsapi.org/v2/everything"
@@ -10,20 +10,16 @@ BASE = "https://newsapi.org/v2/everything"
 def _hdr():
     return {"X-Api-Key": NEWSAPI_KEY, "User-Agent": "fintext-harvester/1.0"}
 
-@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5))
 def _get(params):
-    r = requests.get(BASE, headers=_hdr(), params=params, timeout=30)
-    if r.status_code == 429:
-        raise RuntimeError("NewsAPI rate limit (429)")
-    r.raise_for_status()
-    return r.json()
+    # 重试、限速与熔断都在 fetcher.get 里；429 会打开 newsapi.org 的熔断，之后的调用直接失败
+    return get(BASE, headers=_hdr(), params=params, timeout=30, block=True).json()
 
 def _collect(block):
     for a in block.get("articles", []):
         url = a.get("url") or ""
         yield {
             "url": url,
-            "url_hash": hashlib.md5(url.encode()).hexdigest(),
+            **url_fields(url),
             "title": a.get("title"),
             "description": a.get("description"),
             "published_at": a.get("publishedAt"),
@@ -8,3 +8,7 @@ class BaseAdapter(ABC):
     def iter_items(self) -> Iterable[Dict[str, Any]]:
         """yield dicts with: url, title, description, published_at, source_id/name"""
         ...
+
+    def commit(self) -> None:
+        """本轮结果落盘后调用：适配器在这里持久化自己的增量状态（如 feed 的 ETag）。"""
+        pass
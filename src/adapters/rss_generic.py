@@ -1,32 +1,106 @@
-import hashlib, datetime as dt, feedparser
+import os, datetime as dt, feedparser
 from typing import Iterable, Dict, Any
 from .base import BaseAdapter
+from src.core import metrics
 from src.core.fetcher import get  # 关键：带UA/重试的请求
+from src.core.feedparse import etree, iter_entries
+from src.core.urlcanon import url_fields, url_hash
+
+FEED_FAST_PARSE = os.environ.get("FEED_FAST_PARSE", "1") == "1"  # 0 = 一律用 feedparser
+FEED_WATERMARK = os.environ.get("FEED_WATERMARK", "1") == "1"    # 解析到上次已见过的旧条目就停止（需要 validators）
 
 class RSSAdapter(BaseAdapter):
-    def __init__(self, feed_url: str, source_id: str, source_name: str):
+    def __init__(self, feed_url: str, source_id: str, source_name: str, validators=None, seen=None):
         self.feed_url = feed_url
         self.source_id = source_id
         self.source_name = source_name
+        self.validators = validators  # FeedValidators：有则发条件请求
+        self.seen = seen  # SeenIndex：有则水位线只记已有终局的条目
+        self.not_modified = False
+        self.published = []  # 本次 feed 里全部条目的发布时间（含已抓过的），供调度器估计更新频率
+        self.stopped_early = False
+        self._resp, self._entries, self._links = None, None, {}
 
     def iter_items(self) -> Iterable[Dict[str, Any]]:
-        # 先下载（带UA/重试/可跟随跳转），再把字节交给 feedparser
-        resp = get(self.feed_url)
-        feed = feedparser.parse(resp.content)
-        for e in feed.entries:
-            url = e.get("link")
+        # 先下载（带UA/重试/可跟随跳转），再流式解析条目
+        hdrs = self.validators.headers(self.feed_url) if self.validators else None
+        resp = get(self.feed_url, headers=hdrs)
+        if resp.status_code == 304:  # feed 未变化：不解析、不产出
+            self.not_modified = True
+            return
+        self._resp = resp
+        known = self.validators.watermark(self.feed_url) if self.validators and FEED_WATERMARK else {}
+        mark = max((p for p in known.values() if p), default=None)
+        entries, last, ordered = {}, None, True
+        for e in self._parse(resp.content):
+            key, pub = e["guid"] or e["link"], e["published"]
+            if pub:
+                ordered = ordered and (last is None or pub <= last)
+                last = pub
+            # 上次见过、不比水位线新，且到这里为止 feed 按时间倒序：后面都是更旧的条目
+            if ordered and pub and mark and pub <= mark and key in known:
+                self.stopped_early = True
+                metrics.inc("feed_early_stop", source_id=self.source_id)
+                break
+            entries[key] = pub
+            self._links[key] = e["link"]
             yield {
-                "url": url,
-                "url_hash": hashlib.md5((url or "").encode()).hexdigest(),
-                "title": e.get("title"),
-                "description": e.get("summary"),
-                "published_at": self._parse_dt(e),
+                "url": e["link"],
+                **url_fields(e["link"]),
+                "title": e["title"],
+                "description": e["summary"],
+                "published_at": pub,
                 "source_id": self.source_id,
                 "source_name": self.source_name,
                 "crawl_method": "rss"
             }
+        if self.stopped_early:  # 没解析的部分就是上次记下的那些条目
+            entries.update((k, p) for k, p in known.items() if k not in entries)
+        self._entries = entries
+        self.published = list(entries.values())
+
+    def _parse(self, content: bytes):
+        """lxml 流式解析；没有 lxml 或文档不合法（比如 RSS 里的 HTML 实体）时退回 feedparser，跳过已产出的条目。"""
+        done = set()
+        if FEED_FAST_PARSE and etree is not None:
+            try:
+                for e in iter_entries(content):
+                    done.add(e["guid"])
+                    yield e
+                return
+            except etree.XMLSyntaxError:
+                metrics.inc("feed_parse_fallback", source_id=self.source_id)
+        for e in feedparser.parse(content).entries:
+            link = e.get("link")
+            guid = e.get("id") or link
+            if guid not in done:
+                yield {"link": link, "title": e.get("title"), "summary": e.get("summary"),
+                       "published": self._parse_dt(e), "guid": guid}
+
+    def commit(self) -> None:
+        # 条目写盘后才记下 ETag，避免中途崩溃后拿到 304 而漏掉条目
+        if self.validators and self._resp is not None:
+            self.validators.store(self.feed_url, self._resp)
+            if FEED_WATERMARK and self._entries is not None:
+                self.validators.store_watermark(self.feed_url, self._settled_entries())
+
+    def _settled_entries(self) -> dict:
+        """
+        水位线只记已有终局（ok / skipped）的条目，而且只记比每个未终局条目都旧的：
+        抓取失败、抽取为空或 host 熔断中的条目下次解析时还会经过，交给 seen 的 TTL 重试。
+        """
+        if self.seen is None:
+            return self._entries
+        # 提前停止时补进来的条目没有 link，它们上次就已是终局
+        pending = [self._entries[k] for k, link in self._links.items()
+                   if link and not self.seen.settled(url_hash(link))]
+        if any(p is None for p in pending):  # 没有日期的未终局条目位置不定，这次不记水位线
+            return {}
+        cutoff = min(pending, default=None)
+        return {k: p for k, p in self._entries.items() if cutoff is None or p is None or p < cutoff}
 
-    def _parse_dt(self, e):
+    @staticmethod
+    def _parse_dt(e):
         if "published_parsed" in e and e.published_parsed:
             return dt.datetime(*e.published_parsed[:6], tzinfo=dt.timezone.utc).isoformat()
         return None
@@ -0,0 +1,114 @@
+import os, time, random, threading
+from src.core.state import connect
+
+EXTRACT_ROUTING        = os.environ.get("EXTRACT_ROUTING", "1") == "1"
+EXTRACT_EXPLORE_RATE   = float(os.environ.get("EXTRACT_EXPLORE_RATE", "0.05"))  # 按原始级联完整跑一遍的文档比例
+EXTRACT_ROUTE_MIN_DOCS = int(os.environ.get("EXTRACT_ROUTE_MIN_DOCS", "30"))    # 某策略在该域名上至少试过这么多次才可能被跳过
+EXTRACT_ROUTE_SKIP_BELOW = float(os.environ.get("EXTRACT_ROUTE_SKIP_BELOW", "0.05"))  # 命中率低于此值的策略跳过
+EXTRACT_ROUTE_WINDOW   = float(os.environ.get("EXTRACT_ROUTE_WINDOW", "400"))   # 尝试次数超过此值时统计减半，旧样本逐渐淡出
+
+class ExtractRoutes:
+    """
+    按域名统计各抽取策略的尝试次数、命中次数、胜出次数（其文本被采用）与耗时，持久化在 extract_routes.sqlite。
+    plan(domain) 给出本篇要跳过的策略：常年落空的策略不再跑；按 EXTRACT_EXPLORE_RATE 抽样的文档
+    仍走完整级联，站点改版后被跳过的策略重新命中时，统计会把它找回来。
+
+    路由只决定跳过哪些策略，不改变级联顺序：先命中的策略的文本被采用，按耗时重排会改变抽取结果。
+    耗时（cost_s）只作观测之用，由 scripts/extract_routes.py 展示，不参与决策。
+
+    抽取子进程只在内存里累计增量，随批次结果 drain() 交回父进程 merge()，由父进程 flush() 落盘。
+    """
+    def __init__(self, name="extract_routes.sqlite"):
+        self._name = name
+        self._db = None
+        self._lock = threading.Lock()
+        self._stats = None   # {(domain, strategy): [attempts, hits, wins, cost_s]}
+        self._pending = {}
+
+    def _conn(self):
+        if self._db is None:
+            self._db = connect(self._name)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS routes(
+                domain TEXT NOT NULL, strategy TEXT NOT NULL, attempts REAL NOT NULL, hits REAL NOT NULL,
+                wins REAL NOT NULL, cost_s REAL NOT NULL, updated_at REAL NOT NULL,
+                PRIMARY KEY(domain, strategy)) WITHOUT ROWID""")
+        return self._db
+
+    def _load(self):
+        if self._stats is None:
+            self._stats = {(d, s): [a, h, w, c] for d, s, a, h, w, c in
+                           self._conn().execute("SELECT domain, strategy, attempts, hits, wins, cost_s FROM routes")}
+        return self._stats
+
+    def plan(self, domain: str | None) -> tuple[bool, set]:
+        """返回 (是否探索, 要跳过的策略集合)。"""
+        if not EXTRACT_ROUTING or not domain or random.random() < EXTRACT_EXPLORE_RATE:
+            return True, set()
+        with self._lock:
+            stats = self._load()
+            skip = {s for (d, s), (a, h, _w, _c) in stats.items()
+                    if d == domain and a >= EXTRACT_ROUTE_MIN_DOCS and h / a < EXTRACT_ROUTE_SKIP_BELOW}
+        return False, skip
+
+    def record(self, domain: str | None, tried: list, winner: str | None):
+        """tried 是 [(策略, 是否命中, 耗时秒)]。"""
+        if not EXTRACT_ROUTING or not domain:
+            return
+        with self._lock:
+            stats = self._load()
+            for s, hit, dt in tried:
+                d = (1, int(hit), int(s == winner), dt)
+                for tbl in (stats, self._pending):
+                    row = tbl.setdefault((domain, s), [0, 0, 0, 0.0])
+                    for i, v in enumerate(d): row[i] += v
+                _decay(stats[(domain, s)])
+
+    def drain(self) -> dict:
+        with self._lock:
+            out, self._pending = self._pending, {}
+        return out
+
+    def merge(self, delta: dict):
+        with self._lock:
+            stats = self._load()
+            for key, d in delta.items():
+                for tbl in (stats, self._pending):
+                    row = tbl.setdefault(key, [0, 0, 0, 0.0])
+                    for i, v in enumerate(d): row[i] += v
+                _decay(stats[key])
+
+    def flush(self):
+        """把累计的增量写入 SQLite（多个进程并发写也只是各自累加）。"""
+        delta = self.drain()
+        if not delta:
+            return
+        db, now = self._conn(), time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("""INSERT INTO routes VALUES(?,?,?,?,?,?,?)
+                ON CONFLICT(domain, strategy) DO UPDATE SET attempts=attempts+excluded.attempts, hits=hits+excluded.hits,
+                wins=wins+excluded.wins, cost_s=cost_s+excluded.cost_s, updated_at=excluded.updated_at""",
+                [(d, s, a, h, w, c, now) for (d, s), (a, h, w, c) in delta.items()])
+            db.execute("UPDATE routes SET attempts=attempts/2, hits=hits/2, wins=wins/2, cost_s=cost_s/2 WHERE attempts > ?",
+                       (EXTRACT_ROUTE_WINDOW,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK"); raise
+        with self._lock:
+            self._stats = None   # 下次使用时重新读入（含其他进程写入的部分）
+
+    def rows(self, domain: str | None = None) -> list:
+        q, args = "SELECT domain, strategy, attempts, hits, wins, cost_s, updated_at FROM routes", ()
+        if domain:
+            q, args = q + " WHERE domain=?", (domain,)
+        return self._conn().execute(q + " ORDER BY domain, strategy", args).fetchall()
+
+    def reset(self, domain: str | None = None):
+        self._conn().execute("DELETE FROM routes WHERE domain=?", (domain,)) if domain else self._conn().execute("DELETE FROM routes")
+        with self._lock:
+            self._stats = None
+
+def _decay(row):
+    # 与 flush() 的减半规则一致，内存里的统计同样只反映最近一段样本
+    if row[0] > EXTRACT_ROUTE_WINDOW:
+        for i in range(4): row[i] /= 2
@@ -1,18 +1,39 @@
-import hashlib, json, re
+import hashlib, json, re, time
 import trafilatura
+import lxml.html
+from trafilatura.utils import load_html
 from readability import Document
-from bs4 import BeautifulSoup
+from src.core import metrics
+from src.core.extract_routes import ExtractRoutes
+
+# 与 BeautifulSoup.get_text 保持一致：script/style/template 里的文本不算正文
+_TEXT_XPATH = ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+_CSS_CLASS_RE = re.compile(r"(caas-body|article-body|story-content)")
 
 def _clean_text(txt: str) -> str:
     txt = re.sub(r"\s+", " ", txt or "").strip()
     return txt
 
-def _from_json_ld(html: bytes) -> str | None:
-    # 抓取 JSON-LD 里的 Article/articleBody（Yahoo 常见）
-    soup = BeautifulSoup(html, "lxml")
-    for s in soup.find_all("script", attrs={"type": "application/ld+json"}):
+def _node_text(node) -> str:
+    return " ".join(node.xpath(_TEXT_XPATH))
+
+def _parse(html: bytes):
+    # 整个级联只解析一次：用 trafilatura 自己的加载器，保证它拿到的树与直接传字节时一致
+    tree = load_html(html)
+    if tree is None:
         try:
-            data = json.loads(s.string or "")
+            tree = lxml.html.fromstring(html)
+        except Exception:
+            return None
+    return tree
+
+def _from_json_ld(tree, html: bytes) -> str | None:
+    # 抓取 JSON-LD 里的 Article/articleBody（Yahoo 常见）；字节级预检，没有 ld+json 就不走 XPath
+    if b"application/ld+json" not in html:
+        return None
+    for s in tree.xpath('//script[@type="application/ld+json"]'):
+        try:
+            data = json.loads(s.text or "")
             # 可能是列表或单个对象
             items = data if isinstance(data, list) else [data]
             for it in items:
@@ -25,51 +46,96 @@ def _from_json_ld(html: bytes) -> str | None:
             continue
     return None
 
-def _from_common_selectors(html: bytes) -> str | None:
+def _from_common_selectors(tree) -> str | None:
     # 一些常见容器（包括 Yahoo 的 caas-body）
-    soup = BeautifulSoup(html, "lxml")
     candidates = [
-        ("div", {"class": re.compile(r"(caas-body|article-body|story-content)")} ),
-        ("article", {}),
-        ("div", {"itemprop": "articleBody"}),
+        lambda: next((d for d in tree.iter("div") if _CSS_CLASS_RE.search(d.get("class") or "")), None),
+        lambda: next(tree.iter("article"), None),
+        lambda: next(iter(tree.xpath('//div[@itemprop="articleBody"]')), None),
     ]
-    for tag, attrs in candidates:
-        node = soup.find(tag, attrs=attrs)
-        if node:
-            text = node.get_text(separator=" ").strip()
+    for find in candidates:
+        node = find()
+        if node is not None:
+            text = _node_text(node).strip()
             if len(text) > 80:
                 return _clean_text(text)
     return None
 
-def extract_text(html: bytes) -> dict:
-    # 1) trafilatura 试一次
-    txt = trafilatura.extract(html, include_comments=False, include_tables=False)
-    method = "trafilatura"
-    if txt and len(txt) >= 200:
-        return _pack(txt, method)
+def _from_readability(tree) -> str | None:
+    # readability 会就地修改传入的树，所以它必须排在级联最后
+    doc = Document(tree)
+    summary_html = doc.summary(html_partial=True)
+    txt = _node_text(lxml.html.fromstring(summary_html)).strip()
+    if len(txt) > 80:
+        return _clean_text(txt)
+    return None
+
+def _timed(strategy: str, fn, tried: list, *args):
+    # 每个策略单独计时，命中（hit）与落空（miss）分开统计：落空的策略耗时也算在抽取成本里
+    t0, outcome = time.perf_counter(), "error"
+    try:
+        txt = fn(*args)
+        outcome = "hit" if txt else "miss"
+        return txt
+    finally:
+        dt = time.perf_counter() - t0
+        tried.append((strategy, outcome == "hit", dt))
+        metrics.observe("extract_strategy", dt, strategy=strategy, outcome=outcome)
 
-    # 2) JSON-LD 抽取（很多“动态站”会把全文放进 JSON-LD）
-    txt = _from_json_ld(html)
-    if txt:
-        return _pack(txt, "json-ld")
+def _trafilatura(tree):
+    # 传入树时 trafilatura 会先自行 copy，不影响后续策略
+    txt = trafilatura.extract(tree, include_comments=False, include_tables=False)
+    return txt if txt and len(txt) >= 200 else None
 
-    # 3) 常见选择器（Yahoo: .caas-body 等）
-    txt = _from_common_selectors(html)
-    if txt:
-        return _pack(txt, "css-selectors")
+# 级联顺序：trafilatura → JSON-LD（很多“动态站”会把全文放进 JSON-LD）→ 常见选择器（Yahoo: .caas-body 等）→ readability 兜底
+_STRATEGIES = {
+    "trafilatura": lambda tree, html: _trafilatura(tree),
+    "json-ld": _from_json_ld,
+    "css-selectors": lambda tree, html: _from_common_selectors(tree),
+    "readability": lambda tree, html: _from_readability(tree),
+}
 
-    # 4) readability 兜底
-    try:
-        doc = Document(html)
-        summary_html = doc.summary(html_partial=True)
-        soup = BeautifulSoup(summary_html, "lxml")
-        txt = soup.get_text(separator=" ").strip()
-        if len(txt) > 80:
-            return _pack(_clean_text(txt), "readability")
-    except Exception:
-        pass
+_routes = None
+
+def routes() -> ExtractRoutes:
+    global _routes
+    if _routes is None:
+        _routes = ExtractRoutes()
+    return _routes
+
+def extract_text(html: bytes, domain: str | None = None) -> dict:
+    """
+    传入 domain 时按该域名的历史统计跳过常年落空的策略（见 ExtractRoutes）；
+    跳过后一无所获的文档再补跑被跳过的策略，所以路由只省时间，不会少抽到正文。
+    """
+    t0 = time.perf_counter()
+    explore, skip = routes().plan(domain) if domain else (True, set())
+    tried = []
+    out = _extract(html, [s for s in _STRATEGIES if s not in skip], tried)
+    if out["extract_method"] == "none" and skip:
+        metrics.inc("extract_route_fallback")
+        out = _extract(html, [s for s in _STRATEGIES if s in skip], tried)
+    if domain:
+        routes().record(domain, tried, out["extract_method"])
+    metrics.observe("extract", time.perf_counter() - t0, method=out["extract_method"],
+                    route="full" if explore else "routed")
+    return out
 
-    # 5) 实在不行，返回空
+def _extract(html: bytes, order: list, tried: list) -> dict:
+    with metrics.timer("extract_parse"):
+        tree = _parse(html)
+    if tree is None:
+        return _pack("", "none")
+    for name in order:
+        try:
+            txt = _timed(name, _STRATEGIES[name], tried, tree, html)
+        except Exception:
+            if name != "readability":
+                raise
+            continue
+        if txt:
+            return _pack(txt, name)
+    # 实在不行，返回空
     return _pack("", "none")
 
 def _pack(txt: str, method: str) -> dict:
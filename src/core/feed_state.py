@@ -0,0 +1,103 @@
+import os, json, time, random, statistics
+from datetime import datetime
+from src.core.state import connect
+
+FEED_WATERMARK_KEEP = int(os.environ.get("FEED_WATERMARK_KEEP", "200"))  # 每个 feed 记住最近多少条的 GUID / 发布时间
+
+class FeedValidators:
+    """
+    记录每个 feed 的 ETag / Last-Modified，用于条件请求（命中时服务端返回 304）；
+    以及水位线：上次 feed 里各条目的 GUID → 发布时间，解析时遇到已见过的旧条目即可停止。
+    """
+    def __init__(self, name="feeds.sqlite"):
+        self._db = connect(name)
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS validators(
+            url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, updated_at REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS watermarks(url TEXT PRIMARY KEY, entries TEXT NOT NULL, updated_at REAL NOT NULL);
+        """)
+
+    def headers(self, url: str) -> dict:
+        row = self._db.execute("SELECT etag, last_modified FROM validators WHERE url=?", (url,)).fetchone()
+        if not row:
+            return {}
+        h = {}
+        if row[0]: h["If-None-Match"] = row[0]
+        if row[1]: h["If-Modified-Since"] = row[1]
+        return h
+
+    def store(self, url: str, resp) -> None:
+        etag, lm = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if not (etag or lm):
+            return
+        self._db.execute("""INSERT INTO validators(url, etag, last_modified, updated_at) VALUES(?,?,?,?)
+            ON CONFLICT(url) DO UPDATE SET etag=excluded.etag, last_modified=excluded.last_modified,
+            updated_at=excluded.updated_at""", (url, etag, lm, time.time()))
+
+    def watermark(self, url: str) -> dict:
+        """上次记下的 {guid: 发布时间 ISO 或 None}。"""
+        row = self._db.execute("SELECT entries FROM watermarks WHERE url=?", (url,)).fetchone()
+        return dict(json.loads(row[0])) if row else {}
+
+    def store_watermark(self, url: str, entries: dict) -> None:
+        # 只留最新的 FEED_WATERMARK_KEEP 条；没有日期的排在最后
+        keep = sorted(entries.items(), key=lambda kv: kv[1] or "", reverse=True)[:FEED_WATERMARK_KEEP]
+        self._db.execute("INSERT OR REPLACE INTO watermarks VALUES(?,?,?)", (url, json.dumps(keep), time.time()))
+
+SCHED_DEFAULT_S = float(os.environ.get("SCHED_DEFAULT_S", "600"))   # 新 feed 的初始轮询间隔（与 cron 的 10 分钟一致）
+SCHED_MIN_S     = float(os.environ.get("SCHED_MIN_S", "120"))
+SCHED_MAX_S     = float(os.environ.get("SCHED_MAX_S", "3600"))
+SCHED_BACKOFF   = float(os.environ.get("SCHED_BACKOFF", "1.5"))     # 没有新条目（或 304）时间隔乘以这个系数
+SCHED_ITEMS_PER_POLL = float(os.environ.get("SCHED_ITEMS_PER_POLL", "3"))  # 期望每次轮询拿到的新条目数
+SCHED_JITTER    = float(os.environ.get("SCHED_JITTER", "0.1"))      # 下次轮询时间的随机抖动比例
+
+def _median_gap(published: list) -> float | None:
+    ts = sorted({datetime.fromisoformat(p).timestamp() for p in published if p}, reverse=True)[:11]
+    gaps = [a - b for a, b in zip(ts, ts[1:]) if a > b]
+    return statistics.median(gaps) if len(gaps) >= 2 else None
+
+def next_interval(prev: float, n_new: int, published: list, not_modified=False) -> float:
+    """
+    按 feed 的实际更新情况调整轮询间隔：没有新条目就退避；有新条目时向
+    “最近条目的发布间隔 × SCHED_ITEMS_PER_POLL” 靠拢；新条目占了整个 feed 的八成以上
+    （上次之后可能有条目已经滚出 feed）时间隔立即减半。结果限制在 [SCHED_MIN_S, SCHED_MAX_S]。
+    """
+    if not_modified or n_new == 0:
+        target = prev * SCHED_BACKOFF
+    else:
+        gap = _median_gap(published)
+        target = (prev + gap * SCHED_ITEMS_PER_POLL) / 2 if gap else prev
+        if published and n_new >= 0.8 * len(published):
+            target = min(target, prev / 2)
+    return min(SCHED_MAX_S, max(SCHED_MIN_S, target))
+
+def jittered(interval: float) -> float:
+    return interval * (1 + random.uniform(-SCHED_JITTER, SCHED_JITTER))
+
+class FeedSchedule:
+    """每个 feed 的轮询间隔与下次轮询时间（feeds.sqlite），常驻进程重启后沿用；另记每日维护任务的最近运行日期。"""
+    def __init__(self, name="feeds.sqlite"):
+        self._db = connect(name)
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS schedule(
+            url TEXT PRIMARY KEY, interval_s REAL NOT NULL, next_at REAL NOT NULL,
+            last_new INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS jobs(name TEXT PRIMARY KEY, last_run TEXT NOT NULL);
+        """)
+
+    def get(self, url: str) -> tuple[float, float]:
+        """(间隔秒数, 下次轮询的时间戳)；没见过的 feed 立即轮询。"""
+        row = self._db.execute("SELECT interval_s, next_at FROM schedule WHERE url=?", (url,)).fetchone()
+        return tuple(row) if row else (SCHED_DEFAULT_S, 0.0)
+
+    def save(self, url: str, interval: float, next_at: float, n_new: int) -> None:
+        self._db.execute("""INSERT INTO schedule(url, interval_s, next_at, last_new, updated_at) VALUES(?,?,?,?,?)
+            ON CONFLICT(url) DO UPDATE SET interval_s=excluded.interval_s, next_at=excluded.next_at,
+            last_new=excluded.last_new, updated_at=excluded.updated_at""", (url, interval, next_at, n_new, time.time()))
+
+    def last_run(self, job: str) -> str | None:
+        row = self._db.execute("SELECT last_run FROM jobs WHERE name=?", (job,)).fetchone()
+        return row[0] if row else None
+
+    def mark_run(self, job: str, day: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO jobs VALUES(?,?)", (job, day))
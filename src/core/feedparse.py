@@ -0,0 +1,67 @@
+import io
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+try:  # 可选依赖：没有 lxml 时 RSSAdapter 一律用 feedparser
+    from lxml import etree
+except ImportError:
+    etree = None
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_RSS1 = "{http://purl.org/rss/1.0/}"
+_DC = "{http://purl.org/dc/elements/1.1/}"
+_CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+_ITEM_TAGS = ("item", f"{_ATOM}entry", f"{_RSS1}item")
+
+def parse_date(s: str | None) -> str | None:
+    """RFC 822（RSS pubDate）或 ISO 8601（Atom、dc:date）→ UTC ISO 字符串，与 feedparser 的 published_parsed 一样精确到秒。"""
+    if not s:
+        return None
+    s = s.strip()
+    try:
+        d = parsedate_to_datetime(s)
+    except (TypeError, ValueError):
+        try:
+            d = datetime.fromisoformat(s.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return d.astimezone(timezone.utc).replace(microsecond=0).isoformat()
+
+def _text(el, *tags) -> str | None:
+    for t in tags:
+        c = el.find(t)
+        if c is not None and c.text and c.text.strip():
+            return c.text.strip()
+    return None
+
+def _entry(el) -> dict:
+    if el.tag == f"{_ATOM}entry":
+        link = None
+        for l in el.iterfind(f"{_ATOM}link"):
+            if l.get("rel", "alternate") == "alternate" and l.get("href"):
+                link = l.get("href").strip(); break
+        guid = _text(el, f"{_ATOM}id")
+        return {"link": link, "title": _text(el, f"{_ATOM}title"), "summary": _text(el, f"{_ATOM}summary", f"{_ATOM}content"),
+                "published": parse_date(_text(el, f"{_ATOM}published", f"{_DC}date")), "guid": guid or link}
+    ns = _RSS1 if el.tag.startswith(_RSS1) else ""
+    link = _text(el, f"{ns}link")
+    g = el.find("guid")
+    guid = g.text.strip() if g is not None and g.text and g.text.strip() else None
+    if link is None and guid and g.get("isPermaLink", "true") != "false" and guid.startswith("http"):
+        link = guid  # 和 feedparser 一样：没有 <link> 时用 permalink 形式的 guid
+    return {"link": link, "title": _text(el, f"{ns}title"), "summary": _text(el, f"{ns}description", _CONTENT + "encoded"),
+            "published": parse_date(_text(el, "pubDate", f"{_DC}date")), "guid": guid or link}
+
+def iter_entries(content: bytes):
+    """
+    逐条流式解析 RSS 2.0 / RSS 1.0 / Atom，产出 {link, title, summary, published, guid}。
+    只取采集用到的字段，每条解析完就释放，不建整棵树；文档不合法时抛 etree.XMLSyntaxError（调用方退回 feedparser）。
+    """
+    for _ev, el in etree.iterparse(io.BytesIO(content), events=("end",), tag=_ITEM_TAGS,
+                                   resolve_entities=False, no_network=True, huge_tree=False):
+        yield _entry(el)
+        el.clear()
+        while el.getprevious() is not None:  # 已处理的兄弟节点也删掉，内存与 feed 长度无关
+            del el.getparent()[0]
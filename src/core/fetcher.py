@@ -1,15 +1,235 @@
-import random, time, requests
-from tenacity import retry, wait_exponential, stop_after_attempt
+import os, re, random, time, threading, requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_not_exception_type
+from src.core.hosts import HostHealth, HostOpen, PermanentError, retry_after_s
+from src.core import urlcanon
+from src.core import metrics
 
 UA_POOL = [
   "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120 Safari/537.36",
   "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/605.1.15 Version/17 Safari/605.1.15"
 ]
 
-@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5))
-def get(url, timeout=20, headers=None):
+FETCH_WORKERS  = int(os.environ.get("FETCH_WORKERS", "16"))      # 全局并发线程数
+FETCH_PER_HOST = int(os.environ.get("FETCH_PER_HOST", "4"))      # 单 host 同时在途请求数
+FETCH_HOST_RPS = float(os.environ.get("FETCH_HOST_RPS", "2.0"))  # 单 host 每秒请求预算（替代原来的 sleep(0.3)）
+HOST_BREAKER   = os.environ.get("HOST_BREAKER", "1") == "1"      # 按 host 熔断 + 负缓存（状态存 hosts.sqlite）
+BREAKER_MAX_WAIT_S = float(os.environ.get("BREAKER_MAX_WAIT_S", "120"))  # API 调用（block=True）最多等熔断结束多久
+FETCH_MAX_BYTES  = int(os.environ.get("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))  # 文章正文（解压后）的字节上限
+FETCH_SNIFF_BYTES = 64 * 1024                                                    # 在这么多字节内判断付费墙
+FETCH_PAYWALL_ABORT = os.environ.get("FETCH_PAYWALL_ABORT", "1") == "1"
+_CHUNK = 16 * 1024
+
+# 强付费墙特征：schema.org 明确声明不可免费访问。"subscribe" 之类的弱特征只打标，不中断
+_PAYWALL_RE = re.compile(rb'"isaccessibleforfree"\s*:\s*"?false', re.I)
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+class HostLimiter:
+    """按 host 限并发 + 限速：每个 host 一个信号量，外加按 1/rps 间隔发放的时间槽。"""
+    def __init__(self, per_host=FETCH_PER_HOST, rps=FETCH_HOST_RPS):
+        self.per_host, self.interval = max(1, per_host), (1.0 / rps if rps > 0 else 0.0)
+        self._lock = threading.Lock()
+        self._sems, self._next = {}, {}
+        self.shared = None  # SharedRate：多个 worker 进程/主机共用一份限速预算（backfill 队列的 worker 会设置）
+
+    def _sem(self, host):
+        with self._lock:
+            if host not in self._sems:
+                self._sems[host] = threading.BoundedSemaphore(self.per_host)
+            return self._sems[host]
+
+    def _wait_slot(self, host):
+        if self.shared is not None and self.interval:
+            slot = self.shared.reserve(host, self.interval)
+            delay = slot - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def acquire(self, host):
+        self._sem(host).acquire()
+        self._wait_slot(host)
+
+    def release(self, host):
+        self._sem(host).release()
+
+limiter = HostLimiter()
+
+# 共享 Session：urllib3 按 host 维护连接池，复用 TCP/TLS 连接
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=64, pool_maxsize=max(FETCH_PER_HOST, 1))
+_session.mount("http://", _adapter); _session.mount("https://", _adapter)
+
+_health = None
+_health_lock = threading.Lock()
+
+def health():
+    # 惰性创建：抽取子进程也会 import 本模块，但用不到熔断状态
+    global _health
+    with _health_lock:
+        if _health is None and HOST_BREAKER:
+            _health = HostHealth()
+        return _health
+
+def _is_failure(resp) -> bool:
+    # 计入熔断的响应：限流、拒绝访问、服务端错误
+    return resp.status_code in (403, 429) or resp.status_code >= 500
+
+class Forbidden(Exception):
+    """403：不重试（只会再拿 403，还会把同一次请求在熔断里记上好几次），也不进负缓存——Yahoo 的 403 常是临时限流。"""
+
+# 熔断、永久失败与 403 都不交给 tenacity 重试：那正是原来一个坏 host 卡住整轮 cron 的原因
+@retry(wait=wait_exponential(min=1, max=30), stop=stop_after_attempt(5),
+       retry=retry_if_not_exception_type((HostOpen, PermanentError, Forbidden)))
+def get(url, timeout=20, headers=None, params=None, block=False, stream=False):
+    """
+    带 UA、限速、熔断与重试的 GET。host 熔断时抛 HostOpen（不发请求）；
+    block=True（单 host 的 API 调用）时先等待熔断结束，最多 BREAKER_MAX_WAIT_S 秒。
+    """
     hdrs = {"User-Agent": random.choice(UA_POOL), **(headers or {})}
-    resp = requests.get(url, timeout=timeout, headers=hdrs)
+    host, hh = _host(url), health()
+    if hh is not None:
+        wait_s = hh.open_for(host) if block else 0
+        if 0 < wait_s <= BREAKER_MAX_WAIT_S:
+            time.sleep(wait_s)
+        try:
+            hh.allow(host)
+        except HostOpen:
+            metrics.inc("fetch_rejected", host=host)
+            raise
+    t0 = time.perf_counter()
+    limiter.acquire(host)
+    t1 = time.perf_counter()
+    metrics.observe("fetch_wait", t1 - t0, host=host)  # 排队等 host 并发/限速的时间
+    try:
+        resp = _session.get(url, timeout=timeout, headers=hdrs, params=params, stream=stream)
+    except Exception as e:
+        metrics.observe("fetch_request", time.perf_counter() - t1, host=host, status=type(e).__name__)
+        if hh is not None: hh.failure(host)
+        raise
+    finally:
+        limiter.release(host)
+    # stream=True 时这是到响应头为止的时间（DNS + 连接 + TLS + 服务端处理），正文下载另计 fetch_body
+    metrics.observe("fetch_request", time.perf_counter() - t1, host=host, status=resp.status_code)
+    if hh is not None:
+        if _is_failure(resp):
+            hh.failure(host, retry_after_s(resp) if resp.status_code in (429, 503) else None)
+        else:
+            hh.success(host)
+    if resp.status_code == 403:
+        resp.close()
+        raise Forbidden(f"403 {url}")
+    if resp.status_code in (404, 410):
+        resp.close()
+        if hh is not None: hh.add_negative(url, str(resp.status_code))
+        raise PermanentError(f"{resp.status_code} {url}")
+    if resp.status_code >= 400:
+        resp.close()
     resp.raise_for_status()
-    time.sleep(0.3)  # 轻微节流
     return resp
+
+class Skipped(PermanentError):
+    """文章没有下载完就放弃了；reason 写进记录的 skip_reason，declared 是服务端声明的长度（可能为空）。"""
+    def __init__(self, reason: str, url: str, declared: int | None = None):
+        super().__init__(f"{reason}: {url}")
+        self.reason, self.declared = reason, declared
+
+def fetch_article(url, timeout=20) -> bytes:
+    """
+    流式抓取文章页，返回 HTML 字节。以下情况提前中断并抛 Skipped：
+    负缓存命中、Content-Type 不是 HTML、Content-Length 或实际读到的字节超过 FETCH_MAX_BYTES、
+    开头 FETCH_SNIFF_BYTES 内出现强付费墙特征。前两种在读正文之前就判定，体积超限的 URL 写入负缓存。
+    """
+    try:
+        return _fetch_article(url, timeout)
+    except Skipped as e:
+        metrics.inc("fetch_skipped", host=_host(url), reason=e.reason)
+        if e.declared: metrics.inc("fetch_skipped_bytes", e.declared, host=_host(url), reason=e.reason)
+        raise
+
+def _fetch_article(url, timeout) -> bytes:
+    hh = health()
+    if hh is not None and hh.is_negative(url):
+        raise Skipped("negative_cache", url)
+    resp = get(url, timeout=timeout, stream=True)
+    t0 = time.perf_counter()
+    with resp:
+        ctype = resp.headers.get("Content-Type", "").lower()
+        clen = resp.headers.get("Content-Length")
+        declared = int(clen) if clen and clen.isdigit() else None
+        reason = None
+        if ctype and "html" not in ctype:
+            reason = "non_html"
+        elif declared is not None and declared > FETCH_MAX_BYTES:
+            reason = "too_large"
+        if reason:
+            if hh is not None: hh.add_negative(url, reason)
+            raise Skipped(reason, url, declared)
+
+        buf, size, sniffed = [], 0, not FETCH_PAYWALL_ABORT
+        for chunk in resp.iter_content(_CHUNK):
+            buf.append(chunk); size += len(chunk)
+            if size > FETCH_MAX_BYTES:
+                if hh is not None: hh.add_negative(url, "too_large")
+                raise Skipped("too_large", url, declared)
+            if not sniffed and size >= FETCH_SNIFF_BYTES:
+                sniffed = True
+                if _PAYWALL_RE.search(b"".join(buf)):
+                    raise Skipped("paywall", url, declared)
+        body = b"".join(buf)
+        if not sniffed and _PAYWALL_RE.search(body):
+            raise Skipped("paywall", url, declared)
+    host = _host(url)
+    metrics.observe("fetch_body", time.perf_counter() - t0, host=host)
+    metrics.inc("fetch_bytes", len(body), host=host)
+    if urlcanon.URL_CANON:
+        _learn_aliases(url, resp.url, body)
+    return body
+
+def _learn_aliases(url, final, body):
+    # 跳转后的地址与页面声明的 canonical 记进别名缓存，下次在任何来源里遇到这些写法都能在抓取前认出来
+    try:
+        canon = urlcanon.rel_canonical(body[:FETCH_SNIFF_BYTES], final or url)
+        target = canon or (final if final and urlcanon.plausible_target(url, final) else None)
+        if target:
+            if urlcanon.aliases().add(url, target, "canonical" if canon else "redirect"):
+                metrics.inc("url_alias", host=_host(url), kind="canonical" if canon else "redirect")
+            if canon and final:
+                urlcanon.aliases().add(final, canon, "canonical")
+    except Exception:
+        pass  # 别名只是优化，失败不影响本次抓取
+
+def fetch_many(items, fetch=get, key=lambda it: it["url"], workers=None):
+    """
+    并发抓取：items 可以是惰性迭代器（边拉取边提交），按完成顺序 yield (item, resp, err)。
+    在途任务数上限为 2×workers，避免一次性把整个迭代器读进内存。
+    """
+    workers = workers or FETCH_WORKERS
+    it = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * 2:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    exhausted = True; break
+                pending[pool.submit(fetch, key(item))] = item
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                item = pending.pop(fut)
+                err = fut.exception()
+                yield item, (None if err else fut.result()), err
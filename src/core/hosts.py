@@ -0,0 +1,131 @@
+import os, time, hashlib, threading
+from email.utils import parsedate_to_datetime
+from src.core.state import connect
+
+BREAKER_FAILURES     = int(os.environ.get("BREAKER_FAILURES", "5"))            # 连续失败多少次后熔断
+BREAKER_COOLDOWN_S   = float(os.environ.get("BREAKER_COOLDOWN_S", "300"))      # 首次熔断时长，之后每次半开探测失败翻倍
+BREAKER_MAX_COOLDOWN_S = float(os.environ.get("BREAKER_MAX_COOLDOWN_S", "21600"))
+NEG_CACHE_TTL_S      = float(os.environ.get("NEG_CACHE_TTL_S", str(7 * 86400)))  # 404/410/非 HTML 的 URL 多久内不再请求
+
+class HostOpen(Exception):
+    """host 处于熔断期（或半开探测已在进行），请求没有发出。"""
+
+class PermanentError(Exception):
+    """重试也不会成功的结果（404/410、非 HTML 等），已写入负缓存。"""
+
+def retry_after_s(resp) -> float | None:
+    # Retry-After 可以是秒数，也可以是 HTTP 日期
+    v = (resp.headers.get("Retry-After") or "").strip() if resp is not None else ""
+    if not v:
+        return None
+    if v.isdigit():
+        return float(v)
+    try:
+        return max(0.0, parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _url_key(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()
+
+class HostHealth:
+    """
+    按 host 的熔断器 + URL 负缓存，持久化在 hosts.sqlite，cron 的多次调用与 backfill 共享。
+    closed：正常；连续失败 BREAKER_FAILURES 次（或收到带 Retry-After 的 429/503）→ open，
+    冷却期内请求直接抛 HostOpen；冷却结束后 half-open，只放行一个探测请求，成功则 closed，失败则冷却翻倍再 open。
+    """
+    def __init__(self, name="hosts.sqlite"):
+        self._db = connect(name)
+        self._lock = threading.Lock()
+        self._probing = set()
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS hosts(
+            host TEXT PRIMARY KEY, failures INTEGER NOT NULL DEFAULT 0, open_until REAL NOT NULL DEFAULT 0,
+            cooldown REAL NOT NULL DEFAULT 0, updated_at REAL NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS negative(
+            url_hash TEXT PRIMARY KEY, reason TEXT, expires_at REAL NOT NULL) WITHOUT ROWID;
+        """)
+
+    def _row(self, host):
+        row = self._db.execute("SELECT failures, open_until, cooldown FROM hosts WHERE host=?", (host,)).fetchone()
+        return row or (0, 0.0, 0.0)
+
+    def _save(self, host, failures, open_until, cooldown):
+        self._db.execute("""INSERT INTO hosts(host, failures, open_until, cooldown, updated_at) VALUES(?,?,?,?,?)
+            ON CONFLICT(host) DO UPDATE SET failures=excluded.failures, open_until=excluded.open_until,
+            cooldown=excluded.cooldown, updated_at=excluded.updated_at""",
+            (host, failures, open_until, cooldown, time.time()))
+
+    def open_for(self, host: str) -> float:
+        """距离熔断结束还有多少秒；0 表示可以请求。"""
+        with self._lock:
+            return max(0.0, self._row(host)[1] - time.time())
+
+    def allow(self, host: str) -> None:
+        """不允许请求时抛 HostOpen；冷却已过（半开）时只放行一个探测请求。"""
+        with self._lock:
+            open_until = self._row(host)[1]
+            if open_until > time.time():
+                raise HostOpen(f"{host}: circuit open for {open_until - time.time():.0f}s")
+            if open_until:
+                if host in self._probing:
+                    raise HostOpen(f"{host}: half-open probe in flight")
+                self._probing.add(host)
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._probing.discard(host)
+            if self._row(host) != (0, 0.0, 0.0):
+                self._save(host, 0, 0.0, 0.0)
+
+    def failure(self, host: str, retry_after: float | None = None) -> None:
+        with self._lock:
+            probing = host in self._probing
+            self._probing.discard(host)
+            failures, open_until, cooldown = self._row(host)
+            failures += 1
+            now = time.time()
+            if retry_after is not None:
+                # 服务端明确要求退避：立即熔断，时长以 Retry-After 为准
+                self._save(host, failures, now + min(retry_after, BREAKER_MAX_COOLDOWN_S), cooldown)
+            elif probing:
+                cooldown = min(cooldown * 2, BREAKER_MAX_COOLDOWN_S) if cooldown else BREAKER_COOLDOWN_S
+                self._save(host, failures, now + cooldown, cooldown)
+            elif failures >= BREAKER_FAILURES:
+                self._save(host, failures, now + BREAKER_COOLDOWN_S, BREAKER_COOLDOWN_S)
+            else:
+                self._save(host, failures, open_until, cooldown)
+
+    def is_negative(self, url: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT expires_at FROM negative WHERE url_hash=?", (_url_key(url),)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def add_negative(self, url: str, reason: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO negative VALUES(?,?,?)",
+                             (_url_key(url), reason, time.time() + NEG_CACHE_TTL_S))
+
+class SharedRate:
+    """
+    跨进程、跨主机共享的按 host 请求时间槽（rate.sqlite，放在各 worker 共同可见的目录）。
+    每次请求在一个短事务里领取下一个槽位，所有 backfill worker 合起来仍遵守每个 host 的 FETCH_HOST_RPS。
+    槽位用墙钟时间，多台主机需要做时钟同步（NTP）。
+    """
+    def __init__(self, root: str | None = None, name="rate.sqlite"):
+        self._db = connect(name, root=root, wal=False)
+        self._lock = threading.Lock()
+        self._db.execute("CREATE TABLE IF NOT EXISTS slots(host TEXT PRIMARY KEY, next_at REAL NOT NULL) WITHOUT ROWID")
+
+    def reserve(self, host: str, interval: float) -> float:
+        """领取 host 的下一个请求时间槽（时间戳）；调用方睡到那个时刻再发请求。"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT next_at FROM slots WHERE host=?", (host,)).fetchone()
+                slot = max(time.time(), row[0] if row else 0.0)
+                self._db.execute("INSERT OR REPLACE INTO slots VALUES(?,?)", (host, slot + interval))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); raise
+        return slot
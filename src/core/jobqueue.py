@@ -0,0 +1,102 @@
+import os, time
+from src.core.state import connect
+
+QUEUE_DIR           = os.environ.get("QUEUE_DIR") or None              # 队列与全局限速库所在目录，多主机时放在共享卷上；默认 STATE_DIR
+QUEUE_LEASE_S       = float(os.environ.get("QUEUE_LEASE_S", "900"))    # 租约时长；worker 每 1/3 租约续一次
+QUEUE_MAX_ATTEMPTS  = int(os.environ.get("QUEUE_MAX_ATTEMPTS", "5"))   # 失败或租约过期超过次数的任务不再发放
+
+class LeaseLost(Exception):
+    """租约已过期并被别的 worker 接手，本 worker 应放弃该任务。"""
+
+class JobQueue:
+    """
+    本地租约式任务队列（jobs.sqlite，回滚日志模式，多台主机可经共享卷使用）。
+    任务键与 WorkJournal 的单元相同：(source, day, domain, part)。
+    queued → leased（owner + lease_until）→ done / failed；租约过期的任务可被任何 worker 重新领取，
+    失败的任务在 QUEUE_MAX_ATTEMPTS 次以内重新排队。merged 标记任务的段是否已并入 bronze。
+    """
+    def __init__(self, root: str | None = QUEUE_DIR, name="jobs.sqlite"):
+        self._db = connect(name, root=root, wal=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS jobs(
+            source TEXT NOT NULL, day TEXT NOT NULL, domain TEXT NOT NULL, part TEXT NOT NULL,
+            status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, lease_until REAL,
+            records INTEGER, error TEXT, merged INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL,
+            PRIMARY KEY(source, day, domain, part)) WITHOUT ROWID""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, day)")
+
+    def _tx(self, fn):
+        # BEGIN IMMEDIATE 先拿写锁：两个 worker 不可能领到同一个任务
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            out = fn()
+            self._db.execute("COMMIT")
+            return out
+        except Exception:
+            self._db.execute("ROLLBACK"); raise
+
+    def enqueue(self, units) -> int:
+        """加入任务；已存在的（无论状态）保持不变。返回新加入的数量。"""
+        now = time.time()
+        def fn():
+            before = self._db.total_changes
+            self._db.executemany("""INSERT OR IGNORE INTO jobs(source, day, domain, part, status, updated_at)
+                VALUES(?,?,?,?, 'queued', ?)""", [(*u, now) for u in units])
+            return self._db.total_changes - before
+        return self._tx(fn)
+
+    def requeue_failed(self, source: str | None = None) -> int:
+        q = "UPDATE jobs SET status='queued', attempts=0, error=NULL, merged=0, updated_at=? WHERE status='failed'"
+        args = (time.time(),)
+        if source:
+            q, args = q + " AND source=?", args + (source,)
+        return self._db.execute(q, args).rowcount
+
+    def lease(self, owner: str, lease_s: float = QUEUE_LEASE_S):
+        """领取一个任务（新任务或租约已过期的任务），没有可领的返回 None。近的日期优先。"""
+        def fn():
+            now = time.time()
+            # 租约过期且次数用尽的任务（worker 反复崩溃）直接判失败
+            self._db.execute("""UPDATE jobs SET status='failed', error='lease expired', lease_until=NULL, updated_at=?
+                WHERE status='leased' AND lease_until < ? AND attempts >= ?""", (now, now, QUEUE_MAX_ATTEMPTS))
+            row = self._db.execute("""SELECT source, day, domain, part FROM jobs
+                WHERE (status='queued' OR (status='leased' AND lease_until < ?)) AND attempts < ?
+                ORDER BY day DESC, domain, part LIMIT 1""", (now, QUEUE_MAX_ATTEMPTS)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("""UPDATE jobs SET status='leased', owner=?, lease_until=?, attempts=attempts+1, updated_at=?
+                WHERE source=? AND day=? AND domain=? AND part=?""", (owner, now + lease_s, now, *row))
+            return tuple(row)
+        return self._tx(fn)
+
+    def renew(self, unit, owner: str, lease_s: float = QUEUE_LEASE_S) -> bool:
+        """续租；返回 False 表示租约已被别人接手。"""
+        return self._db.execute("""UPDATE jobs SET lease_until=?, updated_at=? WHERE source=? AND day=? AND domain=? AND part=?
+            AND owner=? AND status='leased'""", (time.time() + lease_s, time.time(), *unit, owner)).rowcount == 1
+
+    def done(self, unit, owner: str, records: int = 0) -> bool:
+        return self._db.execute("""UPDATE jobs SET status='done', records=?, error=NULL, lease_until=NULL, merged=0, updated_at=?
+            WHERE source=? AND day=? AND domain=? AND part=? AND owner=? AND status='leased'""",
+            (records, time.time(), *unit, owner)).rowcount == 1
+
+    def fail(self, unit, owner: str, error: str) -> bool:
+        return self._db.execute("""UPDATE jobs SET status=CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+            error=?, lease_until=NULL, merged=0, updated_at=? WHERE source=? AND day=? AND domain=? AND part=? AND owner=? AND status='leased'""",
+            (QUEUE_MAX_ATTEMPTS, error[:500], time.time(), *unit, owner)).rowcount == 1
+
+    def unmerged(self) -> list:
+        """已结束（done / failed）但段还没并入 bronze 的任务。"""
+        return [tuple(r) for r in self._db.execute("""SELECT source, day, domain, part FROM jobs
+            WHERE status IN ('done', 'failed') AND merged=0 ORDER BY day""")]
+
+    def mark_merged(self, units) -> None:
+        self._tx(lambda: self._db.executemany("""UPDATE jobs SET merged=1, updated_at=?
+            WHERE source=? AND day=? AND domain=? AND part=?""", [(time.time(), *u) for u in units]))
+
+    def summary(self, source: str | None = None) -> dict:
+        q, args = "SELECT status, COUNT(*), SUM(COALESCE(records, 0)) FROM jobs", ()
+        if source:
+            q, args = q + " WHERE source=?", (source,)
+        return {s: {"jobs": n, "records": r} for s, n, r in self._db.execute(q + " GROUP BY status", args)}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,51 @@
+import os, time
+from src.core.state import connect
+
+JOURNAL_MAX_ATTEMPTS = int(os.environ.get("JOURNAL_MAX_ATTEMPTS", "5"))  # 失败超过次数的单元不再自动重试
+
+class WorkJournal:
+    """
+    回填任务的持久工作日志。每个单元 (source, day, domain, part) 记录状态
+    pending / done / failed、写入的段前缀和记录数。重跑时跳过 done 的单元；
+    未完成的单元重跑时，调用方用 storage.committed_hashes(day, prefix) 跳过上次已提交的记录，
+    因此续跑不会产生重复行。
+    """
+    def __init__(self, name="journal.sqlite"):
+        self._db = connect(name)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS units(
+            source TEXT NOT NULL, day TEXT NOT NULL, domain TEXT NOT NULL, part TEXT NOT NULL,
+            status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, prefix TEXT,
+            records INTEGER, error TEXT, updated_at REAL NOT NULL,
+            PRIMARY KEY(source, day, domain, part)) WITHOUT ROWID""")
+
+    def _row(self, unit):
+        return self._db.execute("""SELECT status, attempts FROM units
+            WHERE source=? AND day=? AND domain=? AND part=?""", unit).fetchone()
+
+    def should_run(self, unit) -> bool:
+        row = self._row(unit)
+        if row is None:
+            return True
+        status, attempts = row[0], row[1]
+        return status != "done" and attempts < JOURNAL_MAX_ATTEMPTS
+
+    def start(self, unit, prefix: str | None = None) -> None:
+        self._db.execute("""INSERT INTO units(source, day, domain, part, status, attempts, prefix, updated_at)
+            VALUES(?,?,?,?, 'pending', 1, ?, ?) ON CONFLICT(source, day, domain, part) DO UPDATE SET
+            status='pending', attempts=units.attempts+1, prefix=excluded.prefix, error=NULL,
+            updated_at=excluded.updated_at""", (*unit, prefix, time.time()))
+
+    def done(self, unit, records: int = 0) -> None:
+        self._db.execute("""UPDATE units SET status='done', records=?, updated_at=?
+            WHERE source=? AND day=? AND domain=? AND part=?""", (records, time.time(), *unit))
+
+    def fail(self, unit, error: str) -> None:
+        self._db.execute("""UPDATE units SET status='failed', error=?, updated_at=?
+            WHERE source=? AND day=? AND domain=? AND part=?""", (error[:500], time.time(), *unit))
+
+    def summary(self, source: str) -> dict:
+        rows = self._db.execute("SELECT status, COUNT(*) FROM units WHERE source=? GROUP BY status", (source,))
+        return dict(rows.fetchall())
+
+    def close(self):
+        self._db.close()
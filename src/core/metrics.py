@@ -0,0 +1,191 @@
+import os, json, time, random, threading, contextvars
+from contextlib import contextmanager
+
+METRICS          = os.environ.get("METRICS", "1") == "1"
+METRICS_DIR      = os.environ.get("METRICS_DIR", "data/metrics")
+METRICS_SLOW_DOC_S = float(os.environ.get("METRICS_SLOW_DOC_S", "2.0"))     # 抽取超过这么久的文档记为慢文档
+METRICS_PROFILE_RATE = float(os.environ.get("METRICS_PROFILE_RATE", "0"))  # 抽样用 cProfile 跑的文档比例，0 = 关闭
+_SLOW_KEEP = 50
+
+# 当前上下文的公共标签（source_id / host），由调用方用 tags() 设置，各埋点自动带上
+_tags = contextvars.ContextVar("metrics_tags", default=())
+
+class Registry:
+    """
+    进程内的计数器与计时器：key 是 (名字, 排好序的标签)，计时器记 count/sum/max。
+    一次更新就是加锁后改一个 dict，生产环境常开的开销可以忽略。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters, self.timers, self.slow = {}, {}, []
+
+    def inc(self, name, n=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            c, s, m = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (c + 1, s + seconds, max(m, seconds))
+
+    def slow_doc(self, info: dict):
+        with self._lock:
+            self.slow.append(info)
+            self.slow.sort(key=lambda d: -d["seconds"])
+            del self.slow[_SLOW_KEEP:]
+
+    def drain(self) -> dict:
+        """取出并清空当前数据（抽取子进程每批结束时交回父进程）。"""
+        with self._lock:
+            snap = {"counters": list(self.counters.items()), "timers": list(self.timers.items()), "slow": self.slow}
+            self.counters, self.timers, self.slow = {}, {}, []
+        return snap
+
+    def merge(self, snap: dict):
+        with self._lock:
+            for key, n in snap["counters"]:
+                self.counters[key] = self.counters.get(key, 0) + n
+            for key, (c, s, m) in snap["timers"]:
+                c0, s0, m0 = self.timers.get(key, (0, 0.0, 0.0))
+                self.timers[key] = (c0 + c, s0 + s, max(m0, m))
+        for info in snap["slow"]:
+            self.slow_doc(info)
+
+registry = Registry()
+
+def _labels(labels: dict) -> tuple:
+    base = dict(_tags.get())
+    base.update((k, v) for k, v in labels.items() if v is not None)
+    return tuple(sorted((k, str(v)) for k, v in base.items()))
+
+def inc(name, n=1, **labels):
+    if METRICS: registry.inc(name, n, **labels)
+
+def observe(name, seconds, **labels):
+    if METRICS: registry.observe(name, seconds, **labels)
+
+@contextmanager
+def timer(name, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if METRICS: registry.observe(name, time.perf_counter() - t0, **labels)
+
+@contextmanager
+def tags(**labels):
+    token = _tags.set(tuple({**dict(_tags.get()), **{k: v for k, v in labels.items() if v is not None}}.items()))
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+@contextmanager
+def doc_profile(url_hash: str, **info):
+    """
+    包住单篇文档的抽取：超过 METRICS_SLOW_DOC_S 记为慢文档；按 METRICS_PROFILE_RATE 抽样用 cProfile 跑，
+    抽中且确实慢的把 pstats 存到 METRICS_DIR/profiles/<url_hash>.prof。
+    """
+    prof = None
+    if METRICS and METRICS_PROFILE_RATE > 0 and random.random() < METRICS_PROFILE_RATE:
+        import cProfile
+        prof = cProfile.Profile(); prof.enable()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        if prof is not None:
+            prof.disable()
+        if METRICS and dt >= METRICS_SLOW_DOC_S:
+            rec = {"url_hash": url_hash, "seconds": round(dt, 3), **dict(_tags.get()), **info}
+            if prof is not None:
+                os.makedirs(os.path.join(METRICS_DIR, "profiles"), exist_ok=True)
+                rec["profile"] = os.path.join(METRICS_DIR, "profiles", f"{url_hash}.prof")
+                prof.dump_stats(rec["profile"])
+            registry.slow_doc(rec)
+
+# ---- 导出 ----
+def _prom_name(name: str) -> str:
+    return "fintext_" + name.replace(".", "_")
+
+def _prom_labels(job: str, labels: tuple) -> str:
+    parts = [f'job="{job}"'] + ['%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels]
+    return "{" + ",".join(parts) + "}"
+
+def _write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def prometheus_text(job: str, started: float, finished: float, last_success: float | None = None,
+                    cumulative: bool = False) -> str:
+    # 一次性运行（cron、backfill）：textfile collector 读的是最近一次运行的值，全部按 gauge 导出。
+    # 常驻进程（cumulative=True）：计数从进程启动起累计，按 counter 导出，用 rate() 看每段时间的量
+    out, seen = [], set()
+    scope, kind = ("since process start", "counter") if cumulative else ("in the last run", "gauge")
+    def head(n, h, t="gauge"):
+        if n not in seen:
+            seen.add(n); out.append(f"# HELP {n} {h}"); out.append(f"# TYPE {n} {t}")
+    for (name, labels), n in sorted(registry.counters.items()):
+        pn = _prom_name(name)
+        head(pn, f"{name} {scope}", kind)
+        out.append(f"{pn}{_prom_labels(job, labels)} {n}")
+    timers = sorted(registry.timers.items())
+    for name in sorted({n for (n, _), _v in timers}):
+        # 同一指标族的样本必须连续，所以按后缀分组输出
+        for i, suffix in enumerate(("_seconds_count", "_seconds_sum", "_seconds_max")):
+            pn = _prom_name(name) + suffix
+            head(pn, f"{name} timer {scope}", "gauge" if suffix == "_seconds_max" else kind)
+            out += [f"{pn}{_prom_labels(job, l)} {v[i]:.6g}" for (n, l), v in timers if n == name]
+    for pn, v in (("fintext_run_started_timestamp_seconds", started), ("fintext_run_finished_timestamp_seconds", finished),
+                  ("fintext_run_duration_seconds", finished - started)):
+        head(pn, pn.replace("_", " "))
+        out.append(f'{pn}{{job="{job}"}} {v:.3f}')
+    if last_success is not None:
+        pn = "fintext_last_success_timestamp_seconds"
+        head(pn, "end of the last run that completed without error")
+        out.append(f'{pn}{{job="{job}"}} {last_success:.3f}')
+    return "\n".join(out) + "\n"
+
+def _previous_success(path: str) -> float | None:
+    # 本轮失败时沿用上一次成功的时间戳：健康检查看的是“多久没成功了”，而不是文件有没有被重写
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("fintext_last_success_timestamp_seconds"):
+                    return float(line.split()[-1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def summary(job: str, started: float, finished: float) -> dict:
+    return {
+        "job": job, "started": started, "finished": finished, "duration_s": round(finished - started, 3),
+        "counters": [{"name": n, **dict(l), "value": v} for (n, l), v in sorted(registry.counters.items())],
+        "timers": [{"name": n, **dict(l), "count": c, "sum_s": round(s, 6), "max_s": round(m, 6)}
+                   for (n, l), (c, s, m) in sorted(registry.timers.items())],
+        "slow_docs": registry.slow,
+    }
+
+def export(job: str, started: float, success: float | None = None, cumulative: bool = False) -> None:
+    """
+    运行结束时调用：METRICS_DIR/<job>.prom 给 node_exporter 的 textfile collector，
+    METRICS_DIR/runs/<job>-<时间戳>.json 是这一轮的完整汇总（含慢文档列表）。
+    success 是本轮成功完成的时间戳（失败时不传），导出为 fintext_last_success_timestamp_seconds，
+    失败的运行沿用文件里上一次的值；docker/healthcheck.sh 据此判断管道是否还在正常工作。
+    常驻进程周期性导出时传 cumulative=True（见 prometheus_text）。
+    """
+    if not METRICS:
+        return
+    finished = time.time()
+    path = os.path.join(METRICS_DIR, f"{job}.prom")
+    last = success if success is not None else _previous_success(path)
+    _write_atomic(path, prometheus_text(job, started, finished, last, cumulative))
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(started))
+    _write_atomic(os.path.join(METRICS_DIR, "runs", f"{job}-{stamp}.json"),
+                  json.dumps({**summary(job, started, finished), "last_success": last}, ensure_ascii=False, indent=1))
@@ -0,0 +1,138 @@
+import os, re, json, zlib, hashlib
+from datetime import date, timedelta
+import numpy as np
+from src.core.state import connect
+
+NEARDUP_PERMS     = 128
+NEARDUP_BANDS     = 16                                                  # 16 段 × 8 行，约在 Jaccard≈0.7 处陡升
+NEARDUP_SHINGLE   = 5                                                   # 按词的 5-gram
+NEARDUP_THRESHOLD = float(os.environ.get("NEARDUP_THRESHOLD", "0.8"))  # 签名估计的 Jaccard 下限
+NEARDUP_WINDOW_DAYS = int(os.environ.get("NEARDUP_WINDOW_DAYS", "7"))  # LSH 索引覆盖的滑动窗口
+NEARDUP_MIN_WORDS = 30
+
+_PRIME = (1 << 32) - 5
+_rng = np.random.RandomState(20250805)  # 固定种子：签名必须跨运行可比
+_A = _rng.randint(1, _PRIME, size=NEARDUP_PERMS, dtype=np.uint64)
+_B = _rng.randint(0, _PRIME, size=NEARDUP_PERMS, dtype=np.uint64)
+_ROWS = NEARDUP_PERMS // NEARDUP_BANDS
+_WORD_RE = re.compile(r"\w+")
+
+def signature(text: str) -> np.ndarray | None:
+    """词级 shingle 的 MinHash 签名（uint32 × NEARDUP_PERMS）；正文太短返回 None。"""
+    if not isinstance(text, str):
+        return None
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < NEARDUP_MIN_WORDS:
+        return None
+    k = NEARDUP_SHINGLE
+    sh = {zlib.crc32(" ".join(words[i:i+k]).encode()) for i in range(len(words) - k + 1)}
+    x = np.fromiter(sh, dtype=np.uint64, count=len(sh))
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def _band_keys(sig: np.ndarray) -> list:
+    out = []
+    for b in range(NEARDUP_BANDS):
+        d = hashlib.blake2b(sig[b*_ROWS:(b+1)*_ROWS].tobytes(), digest_size=8).digest()
+        out.append((b, int.from_bytes(d, "big", signed=True)))
+    return out
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class NearDupIndex:
+    """
+    跨来源、跨天的近重复聚类。每篇文档存一份 MinHash 签名，并按段写入 LSH 桶表；
+    新文档只和同桶的候选比较（不做两两全比较），超过阈值就并入最相似候选所在的簇。
+    索引只保留 NEARDUP_WINDOW_DAYS 天的滑动窗口。
+    """
+    def __init__(self, name="neardup.sqlite"):
+        self._db = connect(name)
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS docs(
+            doc_id TEXT PRIMARY KEY, day TEXT NOT NULL, sig BLOB NOT NULL, cluster_id TEXT NOT NULL,
+            method_rank INTEGER, text_len INTEGER, published_at TEXT, source_id TEXT);
+        CREATE INDEX IF NOT EXISTS docs_day ON docs(day);
+        CREATE INDEX IF NOT EXISTS docs_cluster ON docs(cluster_id);
+        CREATE TABLE IF NOT EXISTS bands(
+            band INTEGER NOT NULL, bucket INTEGER NOT NULL, doc_id TEXT NOT NULL, day TEXT NOT NULL,
+            PRIMARY KEY(band, bucket, doc_id)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS bands_day ON bands(day);
+        """)
+
+    def _candidates(self, keys) -> set:
+        out = set()
+        for b, k in keys:
+            out.update(r[0] for r in self._db.execute("SELECT doc_id FROM bands WHERE band=? AND bucket=?", (b, k)))
+        return out
+
+    def add(self, day: str, docs) -> int:
+        """
+        docs: 可迭代的 dict（url_hash, text, method_rank, text_len, published_at, source_id）。
+        返回新入索引的文档数；已在索引里的 doc_id 跳过。
+        """
+        added = 0
+        self._db.execute("BEGIN")
+        for d in docs:
+            doc_id = d.get("url_hash")
+            if not doc_id or self._db.execute("SELECT 1 FROM docs WHERE doc_id=?", (doc_id,)).fetchone():
+                continue
+            sig = signature(d.get("text"))
+            if sig is None:
+                continue
+            keys = _band_keys(sig)
+            best, best_sim = None, NEARDUP_THRESHOLD
+            for cand in self._candidates(keys):
+                row = self._db.execute("SELECT sig, cluster_id FROM docs WHERE doc_id=?", (cand,)).fetchone()
+                sim = similarity(sig, np.frombuffer(row[0], dtype=np.uint32))
+                if sim >= best_sim:
+                    best, best_sim = row[1], sim
+            self._db.execute("INSERT INTO docs VALUES(?,?,?,?,?,?,?,?)", (
+                doc_id, day, sig.tobytes(), best or doc_id,
+                d.get("method_rank"), d.get("text_len"), d.get("published_at"), d.get("source_id")))
+            self._db.executemany("INSERT OR IGNORE INTO bands VALUES(?,?,?,?)", [(b, k, doc_id, day) for b, k in keys])
+            added += 1
+        self._db.execute("COMMIT")
+        return added
+
+    def prune(self, newest_day: str) -> None:
+        cutoff = (date.fromisoformat(newest_day) - timedelta(days=NEARDUP_WINDOW_DAYS - 1)).isoformat()
+        self._db.execute("BEGIN")
+        self._db.execute("DELETE FROM bands WHERE day < ?", (cutoff,))
+        self._db.execute("DELETE FROM docs WHERE day < ?", (cutoff,))
+        self._db.execute("COMMIT")
+
+    def days(self) -> list:
+        return [r[0] for r in self._db.execute("SELECT DISTINCT day FROM docs ORDER BY day")]
+
+    def sync_day(self, day: str, keep) -> int:
+        """删掉该天索引里已不在 docs_dedup.parquet 中的文档（再次 dedupe 时被去掉的），返回删除数。"""
+        keep = set(keep)
+        gone = [r[0] for r in self._db.execute("SELECT doc_id FROM docs WHERE day=?", (day,)) if r[0] not in keep]
+        if gone:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM bands WHERE day=? AND doc_id=?", [(day, g) for g in gone])
+            self._db.executemany("DELETE FROM docs WHERE doc_id=?", [(g,) for g in gone])
+            self._db.execute("COMMIT")
+        return len(gone)
+
+    def assignments(self, day: str, ids=None) -> list:
+        """
+        该天每篇文档的 (url_hash, cluster_id, canonical_doc)。代表文档按 dedupe 的 preferred_order
+        规则挑选：method_rank 小优先，其次 text_len 大，其次 published_at 早（空值排最后）。
+        传入 ids（该天 docs_dedup.parquet 的 url_hash）时按 id 查：前几天已入索引的同一篇文章沿用它原来的簇。
+        """
+        if ids is None:
+            target, args = "SELECT doc_id, cluster_id FROM docs WHERE day=?", (day,)
+        else:
+            target, args = ("SELECT doc_id, cluster_id FROM docs WHERE doc_id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(list(ids)),))
+        rows = self._db.execute(f"""
+            WITH target AS ({target}),
+            ranked AS (
+              SELECT cluster_id, doc_id, ROW_NUMBER() OVER (PARTITION BY cluster_id ORDER BY
+                COALESCE(method_rank, 5), COALESCE(text_len, 0) DESC,
+                published_at IS NULL, published_at, doc_id) AS rn
+              FROM docs WHERE cluster_id IN (SELECT cluster_id FROM target))
+            SELECT t.doc_id, t.cluster_id, r.doc_id FROM target t
+            JOIN ranked r ON r.cluster_id = t.cluster_id AND r.rn = 1""", args)
+        return [{"url_hash": a, "cluster_id": c, "canonical_doc": k} for a, c, k in rows]
@@ -1,8 +1,58 @@
-import langid, pandas as pd
+import time
+from datetime import datetime, timezone
+from typing import List
+from src.core import metrics
+
+# langid / pandas 都很重：只在真正需要时才导入，cron 冷启动不再为它们买单
+_identifier = None
+
+def _langid():
+    global _identifier
+    if _identifier is None:
+        from langid.langid import LanguageIdentifier, model
+        _identifier = LanguageIdentifier.from_modelstring(model)
+    return _identifier
+
+def _iso_utc(s) -> str | None:
+    # 快速路径：适配器产出的都是 ISO 8601（含 Z / 偏移量 / 纯日期），直接用 fromisoformat
+    if not isinstance(s, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(s.strip())
+    except ValueError:
+        return None
+    dt = dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+    return dt.isoformat()
+
+def _parse_published(values: list) -> list:
+    out = [_iso_utc(v) for v in values]
+    rest = [i for i, v in enumerate(out) if v is None]
+    if rest:
+        # 慢路径：非 ISO 格式（RFC 2822 等）一次性交给 pandas 向量化解析，逐条兼容各自格式
+        import pandas as pd
+        parsed = pd.to_datetime(pd.Series([values[i] for i in rest], dtype=object), utc=True, errors="coerce", format="mixed")
+        for i, ts in zip(rest, parsed):
+            out[i] = ts.isoformat()  # 解析失败为 NaT，与旧实现一致输出 "NaT"
+    return out
+
+def normalize_batch(records: List[dict]) -> List[dict]:
+    """
+    批量规范化：发布时间一次性解析为 UTC ISO 字符串；语言识别只对还没有 language 的记录运行，
+    模型在首次使用时加载一次。原地修改并返回 records。
+    """
+    idx = [i for i, r in enumerate(records) if r.get("published_at")]
+    if idx:
+        with metrics.timer("normalize_dates"):
+            for i, v in zip(idx, _parse_published([records[i]["published_at"] for i in idx])):
+                records[i]["published_at"] = v
+    for rec in records:
+        if rec.get("language"):
+            continue
+        t0 = time.perf_counter()
+        blob = " ".join([rec.get("title") or "", rec.get("description") or "", rec.get("text") or ""])[:1000]
+        rec["language"] = _langid().classify(blob)[0] if blob.strip() else None
+        metrics.observe("normalize_langid", time.perf_counter() - t0, source_id=rec.get("source_id"))
+    return records
 
 def normalize_record(rec: dict) -> dict:
-    if rec.get("published_at"):
-        rec["published_at"] = pd.to_datetime(rec["published_at"], utc=True, errors="coerce").isoformat()
-    blob = " ".join([rec.get("title") or "", rec.get("description") or "", rec.get("text") or ""])[:1000]
-    rec["language"] = langid.classify(blob)[0] if blob.strip() else None
-    return rec
+    return normalize_batch([rec])[0]
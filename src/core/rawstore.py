@@ -0,0 +1,73 @@
+import os, gzip
+
+try:  # 可选依赖：有 zstandard 就用 zstd，否则退回标准库 gzip
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+RAW_STORE_DIR = os.environ.get("RAW_STORE_DIR", "data/raw")
+RAW_STORE_MAX_BYTES = int(float(os.environ.get("RAW_STORE_MAX_BYTES", str(5 * 1024**3))))
+
+_EXT = ".html.zst" if zstd else ".html.gz"
+
+def _compress(b: bytes) -> bytes:
+    return zstd.ZstdCompressor(level=6).compress(b) if zstd else gzip.compress(b, compresslevel=6)
+
+def _decompress(b: bytes, path: str) -> bytes:
+    if path.endswith(".zst"):
+        return zstd.ZstdDecompressor().decompress(b)
+    return gzip.decompress(b)
+
+class RawStore:
+    """原始 HTML 的本地存档：按 url_hash 寻址、压缩存储，按总大小淘汰最旧的文件。"""
+    def __init__(self, root=RAW_STORE_DIR, max_bytes=RAW_STORE_MAX_BYTES):
+        self.root, self.max_bytes = root, max_bytes
+
+    def _path(self, url_hash: str, ext=_EXT) -> str:
+        return os.path.join(self.root, url_hash[:2], url_hash + ext)
+
+    def put(self, url_hash: str, html: bytes) -> str:
+        path = self._path(url_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_compress(html))
+        os.replace(tmp, path)  # 原子替换，读者看不到半截文件
+        return path
+
+    def get(self, url_hash: str) -> bytes | None:
+        for ext in (".html.zst", ".html.gz"):
+            path = self._path(url_hash, ext)
+            if os.path.exists(path) and (ext == ".html.gz" or zstd):
+                with open(path, "rb") as f:
+                    return _decompress(f.read(), path)
+        return None
+
+    def __contains__(self, url_hash: str) -> bool:
+        return any(os.path.exists(self._path(url_hash, e)) for e in (".html.zst", ".html.gz"))
+
+    def evict(self) -> int:
+        """总量超过 max_bytes 时按 mtime 从旧到新删除，返回删除的文件数。"""
+        files, total = [], 0
+        if not os.path.isdir(self.root):
+            return 0
+        for sub in os.scandir(self.root):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(".tmp"):
+                    continue
+                st = e.stat()
+                files.append((st.st_mtime, st.st_size, e.path)); total += st.st_size
+        removed = 0
+        if total <= self.max_bytes:
+            return 0
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size; removed += 1
+            if total <= self.max_bytes:
+                break
+        return removed
@@ -0,0 +1,110 @@
+import os, time, threading
+from typing import Iterable, Dict, Any
+from src.core.state import connect
+
+SEEN_RETRY_ERROR_S = float(os.environ.get("SEEN_RETRY_ERROR_S", str(6 * 3600)))   # 抓取失败后多久重试
+SEEN_RETRY_EMPTY_S = float(os.environ.get("SEEN_RETRY_EMPTY_S", str(24 * 3600)))  # 抽取为空后多久重试
+SEEN_MAX_ATTEMPTS  = int(os.environ.get("SEEN_MAX_ATTEMPTS", "5"))                # 超过次数后不再重试
+
+def doc_status(rec: dict) -> str:
+    # ok / empty / error / skipped：seen 索引与指标共用的结局分类
+    if rec.get("http_status") == "error":
+        return "error"
+    if rec.get("skip_reason"):
+        return "skipped"
+    return "ok" if rec.get("text") else "empty"
+
+class SeenIndex:
+    """
+    已抓取 URL 的持久索引（SQLite，url_hash 为主键的 WITHOUT ROWID 表）。
+    ok / skipped（非 HTML、超长、付费墙）的记录永不重抓；error / empty 的记录在 TTL 到期后重试，最多 SEEN_MAX_ATTEMPTS 次。
+    记录带 canonical_url_hash 时一并登记：同一文章换一种写法（跟踪参数、AMP、feed 跳转）再出现，
+    只要该规范键已有 ok / skipped 的记录也跳过。
+    """
+    def __init__(self, name="seen.sqlite"):
+        self._db = connect(name)
+        self._lock = threading.Lock()
+        # 本进程已放行、尚未登记的 url_hash → canonical_url_hash：同一轮里别的 feed 再给出同一篇文章时不重复抓
+        self._inflight, self._inflight_canon = {}, {}
+        self._db.execute("""CREATE TABLE IF NOT EXISTS seen(
+            url_hash TEXT PRIMARY KEY, content_hash TEXT, status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 1, updated_at REAL NOT NULL, canonical_hash TEXT) WITHOUT ROWID""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_content ON seen(content_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS seen_canonical ON seen(canonical_hash)")
+
+    def _row(self, url_hash: str):
+        with self._lock:
+            return self._db.execute("SELECT status, attempts, updated_at FROM seen WHERE url_hash=?", (url_hash,)).fetchone()
+
+    def settled(self, url_hash: str) -> bool:
+        """已有终局（ok / skipped，或重试次数用尽）：以后永远不会再抓。"""
+        row = self._row(url_hash)
+        return row is not None and (row[0] in ("ok", "skipped") or row[1] >= SEEN_MAX_ATTEMPTS)
+
+    def should_fetch(self, url_hash: str, now: float | None = None, canonical: str | None = None) -> bool:
+        row = self._row(url_hash)
+        if row is None:
+            return canonical is None or not self._canonical_done(canonical)
+        status, attempts, updated_at = row
+        if status in ("ok", "skipped") or attempts >= SEEN_MAX_ATTEMPTS:
+            return False
+        ttl = SEEN_RETRY_ERROR_S if status == "error" else SEEN_RETRY_EMPTY_S
+        return (now or time.time()) - updated_at >= ttl
+
+    def _canonical_done(self, canonical: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM seen WHERE canonical_hash=? AND status IN ('ok', 'skipped') LIMIT 1",
+                                    (canonical,)).fetchone() is not None
+
+    def has_content(self, content_hash: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM seen WHERE content_hash=? LIMIT 1", (content_hash,)).fetchone() is not None
+
+    def filter_new(self, recs: Iterable[Dict[str, Any]], admitted: set | None = None) -> Iterable[Dict[str, Any]]:
+        """放行需要抓取的记录；admitted 里收集放行的 url_hash，调用方最后把没登记的交给 release。"""
+        for rec in recs:
+            h, c = rec["url_hash"], rec.get("canonical_url_hash")
+            if self._is_inflight(h, c) or not self.should_fetch(h, canonical=c):
+                continue
+            with self._lock:
+                # 查库与登记之间别的线程可能已放行同一篇文章：在锁内再判一次
+                if h in self._inflight or (c is not None and c in self._inflight_canon):
+                    continue
+                self._inflight[h] = c
+                if c is not None:
+                    self._inflight_canon[c] = h
+            if admitted is not None:
+                admitted.add(h)
+            yield rec
+
+    def _is_inflight(self, h: str, c: str | None) -> bool:
+        with self._lock:
+            return h in self._inflight or (c is not None and c in self._inflight_canon)
+
+    def _drop_inflight(self, hashes: Iterable[str]) -> None:
+        # 调用方持有 self._lock
+        for h in hashes:
+            c = self._inflight.pop(h, None)
+            if c is not None and self._inflight_canon.get(c) == h:
+                del self._inflight_canon[c]
+
+    def release(self, hashes: Iterable[str]) -> None:
+        """把放行后不会经 mark_many 登记的 url_hash 移出 inflight。"""
+        with self._lock:
+            self._drop_inflight(hashes)
+
+    def mark_many(self, recs: Iterable[Dict[str, Any]], now: float | None = None):
+        now = now or time.time()
+        rows = [(r["url_hash"], r.get("content_hash"), doc_status(r), now, r.get("canonical_url_hash"))
+                for r in recs if r.get("url_hash")]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("""INSERT INTO seen(url_hash, content_hash, status, attempts, updated_at, canonical_hash)
+                VALUES(?,?,?,1,?,?) ON CONFLICT(url_hash) DO UPDATE SET
+                content_hash=excluded.content_hash, status=excluded.status, attempts=seen.attempts+1,
+                updated_at=excluded.updated_at, canonical_hash=COALESCE(excluded.canonical_hash, seen.canonical_hash)""", rows)
+            self._db.execute("COMMIT")
+            self._drop_inflight(r[0] for r in rows)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,72 @@
+import os
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# silver 层：按 date / source_id 做 Hive 分区的 Parquet 数据集（由 scripts/build_silver.py 生成）
+SILVER_ROOT = os.environ.get("SILVER_ROOT", "data/silver/docs")
+
+_dict = lambda: pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("url_hash", pa.string()),
+    ("canonical_url_hash", pa.string()),
+    ("title", pa.string()),
+    ("description", pa.string()),
+    ("published_at", pa.timestamp("us", tz="UTC")),
+    ("source_name", _dict()),
+    ("crawl_method", _dict()),
+    ("language", _dict()),
+    ("extract_method", _dict()),
+    ("paywall", pa.bool_()),
+    ("text_len", pa.int32()),
+    ("content_hash", pa.string()),
+    ("cluster_id", pa.string()),
+    ("canonical_doc", pa.string()),
+    ("text", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("source_id", pa.string())]), flavor="hive")
+
+def _day(d) -> str:
+    if isinstance(d, datetime): return d.date().isoformat()
+    if isinstance(d, date): return d.isoformat()
+    return str(d)
+
+def _ts(t):
+    if t is None: return None
+    t = datetime.fromisoformat(t.replace("Z", "+00:00")) if isinstance(t, str) else t
+    return pa.scalar(t, type=pa.timestamp("us", tz="UTC"))
+
+def dataset(root: str = SILVER_ROOT) -> ds.Dataset:
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+def build_filter(start=None, end=None, sources: Sequence[str] | None = None, languages: Sequence[str] | None = None,
+                 published_from=None, published_to=None) -> ds.Expression | None:
+    """日期范围走分区裁剪；published_at 走 row group 的 min/max 统计；其余条件下推到扫描。"""
+    conds = []
+    if start is not None: conds.append(ds.field("date") >= _day(start))
+    if end is not None: conds.append(ds.field("date") <= _day(end))
+    if sources: conds.append(ds.field("source_id").isin(list(sources)))
+    if languages: conds.append(ds.field("language").isin(list(languages)))
+    if published_from is not None: conds.append(ds.field("published_at") >= _ts(published_from))
+    if published_to is not None: conds.append(ds.field("published_at") < _ts(published_to))
+    expr = None
+    for c in conds:
+        expr = c if expr is None else expr & c
+    return expr
+
+def scan(start=None, end=None, columns: Iterable[str] | None = None, sources=None, languages=None,
+         published_from=None, published_to=None, batch_size: int = 64_000, root: str = SILVER_ROOT) -> Iterator[pa.RecordBatch]:
+    """
+    惰性读取：按日期范围 + 来源/语言/发布时间过滤，只解码 columns 指定的列。
+    不含 text 的元数据查询完全不会读取正文所在的列块。
+    """
+    if not os.path.isdir(root):
+        return iter(())
+    flt = build_filter(start, end, sources, languages, published_from, published_to)
+    return dataset(root).to_batches(columns=list(columns) if columns else None, filter=flt, batch_size=batch_size)
+
+def read_table(*args, **kwargs) -> pa.Table:
+    batches = list(scan(*args, **kwargs))
+    return pa.Table.from_batches(batches) if batches else pa.table({})
@@ -0,0 +1,20 @@
+import os, sqlite3
+
+# 所有跨运行的持久状态（索引、日志、缓存）统一放在这里
+STATE_DIR = os.environ.get("STATE_DIR", "data/state")
+
+def state_path(name: str, root: str | None = None) -> str:
+    root = root or STATE_DIR
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, name)
+
+def connect(name: str, root: str | None = None, wal: bool = True) -> sqlite3.Connection:
+    """
+    打开 STATE_DIR（或 root）下的 SQLite 库：默认 WAL 模式，允许 cron/backfill 多进程并发读写。
+    WAL 依赖共享内存，只在同一台主机内有效；多台主机共享的库（任务队列、全局限速）用 wal=False 的回滚日志模式，
+    靠文件锁互斥（共享卷需支持 POSIX 锁，如 NFSv4）。其余默认 WAL 的库因此要求 STATE_DIR 是主机本地目录。
+    """
+    conn = sqlite3.connect(state_path(name, root), timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL" if wal else "PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA synchronous=NORMAL" if wal else "PRAGMA synchronous=FULL")
+    return conn
@@ -1,6 +1,21 @@
-
-import os, json, pandas as pd
+import os, re, json, gzip, time
+from pathlib import Path
 from datetime import datetime, timezone, date
+from src.core import metrics
+
+try:  # 可选依赖：orjson 序列化快得多；没有就用标准库 json
+    import orjson
+except ImportError:
+    orjson = None
+try:  # 可选依赖：有 zstandard 就用 zstd，否则退回标准库 gzip
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+BRONZE_SEGMENT_RECORDS = int(os.environ.get("BRONZE_SEGMENT_RECORDS", "500"))      # 攒够多少条写一个段
+BRONZE_SEGMENT_SECONDS = float(os.environ.get("BRONZE_SEGMENT_SECONDS", "60"))     # 或者最早一条攒了多久
+SEGMENT_DIR = "segments"
+_SEG_EXT = ".jsonl.zst" if zstd else ".jsonl.gz"
 
 def _bucket_dir(root="data/bronze"):
     d = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -22,3 +37,161 @@ def append_jsonl_for_day(records, day: date, root="data/bronze", fname="docs.jso
         for r in records: f.write(json.dumps(r, ensure_ascii=False)+"\n")
     return path
 
+
+# ---- 压缩段：每天一个 segments/ 目录，段文件写完才改名可见，读者永远看不到半截数据 ----
+def _dumps(r) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(r, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    return (json.dumps(r, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+def _zstd():
+    # 别的机器用 zstd 写的段，在没装 zstandard 的机器上读写时给出明确的错误
+    if zstd is None:
+        raise ImportError("reading or rewriting .jsonl.zst segments requires the 'zstandard' package")
+    return zstd
+
+def _compress(b: bytes, path: str = _SEG_EXT) -> bytes:
+    # 按文件扩展名选压缩算法：重写旧段时保持原格式
+    return _zstd().ZstdCompressor(level=3).compress(b) if path.endswith(".zst") else gzip.compress(b, compresslevel=6)
+
+def read_segment(path) -> bytes:
+    """读一个段（或旧的 docs.jsonl），返回解压后的 JSONL 字节。"""
+    path = str(path)
+    with open(path, "rb") as f:
+        b = f.read()
+    if path.endswith(".zst"):
+        return _zstd().ZstdDecompressor().decompress(b, max_output_size=1 << 31)
+    if path.endswith(".gz"):
+        return gzip.decompress(b)
+    return b
+
+def day_inputs(day_dir) -> list:
+    """某天分区的全部已提交输入：旧布局的 docs.jsonl 在前，之后是按文件名排序的段。"""
+    day_dir = Path(day_dir)
+    out = [day_dir / "docs.jsonl"] if (day_dir / "docs.jsonl").exists() else []
+    seg = day_dir / SEGMENT_DIR
+    if seg.is_dir():
+        out += sorted(p for p in seg.iterdir() if p.name.endswith((".jsonl.zst", ".jsonl.gz")))
+    return out
+
+def day_dirs(root="data/bronze") -> list:
+    """有原始数据（任一布局）的日期分区，按日期排序。"""
+    return sorted(d for d in Path(root).glob("????-??-??") if d.is_dir() and day_inputs(d))
+
+def iter_day_records(day_dir):
+    for p in day_inputs(day_dir):
+        for line in read_segment(p).splitlines():
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def write_segment(path, data: bytes) -> None:
+    """原子地（写临时文件 → fsync → 改名）整段重写一个段或旧的 docs.jsonl。"""
+    path = str(path)
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_compress(data, path) if path.endswith((".zst", ".gz")) else data)  # 旧布局的 docs.jsonl 不压缩
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class SegmentWriter:
+    """
+    流式写 bronze：记录先在内存里攒着，满 max_records 条或最早一条超过 max_age_s 秒（在 write 时检查）
+    就压缩成一个段原子提交，内存和崩溃损失都以一个段为上限。
+    day 为空时按写入时刻的 UTC 日期分区（cron）；on_commit(records) 在每个段提交后调用（登记 seen 等）；
+    before_commit() 在段改名生效之前调用，抛异常则放弃这个段（缓冲保留，可由 discard 丢掉）。
+    """
+    def __init__(self, prefix="docs", day: date | None = None, root="data/bronze", on_commit=None,
+                 max_records=BRONZE_SEGMENT_RECORDS, max_age_s=BRONZE_SEGMENT_SECONDS, before_commit=None):
+        self.prefix, self.day, self.root, self.on_commit = prefix, day, root, on_commit
+        self.before_commit = before_commit
+        self.max_records, self.max_age_s = max_records, max_age_s
+        self.count = 0  # 已提交的记录数
+        self._buf, self._lines, self._buf_day, self._t0 = [], [], None, 0.0
+        self._seq, self._after = 0, []
+
+    def write(self, rec: dict) -> None:
+        day = self.day or datetime.now(timezone.utc).date()
+        if self._buf and day != self._buf_day:
+            self.flush()
+        if not self._buf:
+            self._buf_day, self._t0 = day, time.monotonic()
+        t0 = time.perf_counter()
+        self._buf.append(rec); self._lines.append(_dumps(rec))
+        metrics.observe("storage_serialize", time.perf_counter() - t0)
+        if len(self._buf) >= self.max_records or time.monotonic() - self._t0 >= self.max_age_s:
+            self.flush()
+
+    def after_commit(self, fn) -> None:
+        """fn 在当前缓冲的记录都提交之后调用（缓冲为空则立即调用），比如保存 feed 的 ETag。"""
+        if self._buf: self._after.append(fn)
+        else: fn()
+
+    def flush(self) -> None:
+        if self._buf:
+            t0 = time.perf_counter()
+            seg = Path(_bucket_dir_for(self._buf_day, self.root)) / SEGMENT_DIR
+            seg.mkdir(exist_ok=True)
+            name = f"{self.prefix}-{int(time.time() * 1000)}-{os.getpid()}-{self._seq:04d}{_SEG_EXT}"
+            tmp = seg / f".{name}.tmp"
+            data = _compress(b"".join(self._lines))
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush(); os.fsync(f.fileno())
+            if self.before_commit is not None:
+                try:
+                    self.before_commit()
+                except BaseException:
+                    os.remove(tmp); raise
+            os.replace(tmp, seg / name)
+            metrics.observe("storage_segment", time.perf_counter() - t0, prefix=self.prefix)
+            metrics.inc("storage_records", len(self._buf), prefix=self.prefix)
+            metrics.inc("storage_bytes", len(data), prefix=self.prefix)
+            self._seq += 1
+            self.count += len(self._buf)
+            buf, self._buf, self._lines = self._buf, [], []
+            if self.on_commit is not None:
+                self.on_commit(buf)
+        after, self._after = self._after, []
+        for fn in after:
+            fn()
+
+    def flush_if_due(self) -> None:
+        """常驻进程在空闲时调用：缓冲里最早一条已超过 max_age_s 就提交，不必等下一次 write。"""
+        if self._buf and time.monotonic() - self._t0 >= self.max_age_s:
+            self.flush()
+
+    def discard(self) -> list:
+        """丢掉还没提交的缓冲（不写段、不调 on_commit / after_commit），返回丢掉的记录。"""
+        buf, self._buf, self._lines, self._after = self._buf, [], [], []
+        return buf
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # 出错时也提交：缓冲里的记录都已处理完，是有效数据
+        self.close()
+
+def segment_files(day_dir, prefix: str) -> list:
+    """某个前缀在该天已提交的段（精确匹配前缀，不会把 gdelt-x.com-p01 算进 gdelt-x.com）。"""
+    seg = Path(day_dir) / SEGMENT_DIR
+    if not seg.is_dir():
+        return []
+    pat = re.compile(re.escape(prefix) + r"-\d+-\d+-\d+\.jsonl\.(zst|gz)$")
+    return sorted(p for p in seg.iterdir() if pat.match(p.name))
+
+def committed_hashes(day: date, prefix: str, root="data/bronze") -> set:
+    """某个前缀在该天已提交段里的 url_hash，用于续跑时跳过上次已经落盘的记录。"""
+    out = set()
+    for p in segment_files(Path(root) / day.strftime("%Y-%m-%d"), prefix):
+        for line in read_segment(p).splitlines():
+            try: out.add(json.loads(line).get("url_hash"))
+            except ValueError: pass
+    out.discard(None)
+    return out
@@ -0,0 +1,187 @@
+import os, re, time, yaml, hashlib
+from array import array
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+import pyarrow.parquet as pq
+from src.core.state import connect
+
+TERM_ENTITIES = os.environ.get("TERM_ENTITIES", "config/entities.yaml")
+TERM_BARE_MIN = 3  # 不带 $ 的代码至少这么长才按整词匹配（C、V、MA、GS 这类只认 $C、(NYSE: C) 或公司名）
+
+_SYM = r"[A-Z]{1,5}(?:[.\-/][A-Z])?"
+_CASHTAG_RE = re.compile(rf"(?<![\w$])\$({_SYM})\b")
+_EXCHANGE_RE = re.compile(rf"\((?:NYSE|NASDAQ|Nasdaq|NasdaqGS|NYSE American|NYSEARCA|AMEX|OTC|TSX|LSE)\s*:\s*({_SYM})\)")
+
+def _norm_symbol(s: str) -> str:
+    return re.sub(r"[./]", "-", s.upper())
+
+def _feed_symbols(path: str) -> list:
+    # Yahoo 的 feed 按代码列表组织：...headline?s=AAPL,MSFT,...
+    try:
+        cfg = yaml.safe_load(open(path, "r", encoding="utf-8")) or {}
+    except FileNotFoundError:
+        return []
+    out = []
+    for s in cfg.get("rss_sources") or []:
+        for v in parse_qs(urlsplit(s.get("url", "")).query).get("s", []):
+            out.extend(x.strip() for x in v.split(",") if x.strip())
+    return out
+
+class TermMatcher:
+    """从正文里找 ticker（$TAG、交易所写法、已知代码、公司名）与机构名，返回 词条 → 字符位置列表。"""
+    def __init__(self, entities: str = TERM_ENTITIES, sources: str = "config/sources.yaml"):
+        try:
+            raw = open(entities, "rb").read()
+        except FileNotFoundError:
+            raw = b""
+        cfg = yaml.safe_load(raw) or {}
+        self.aliases = {}  # 别名 → 词条
+        for group in ("tickers", "institutions"):
+            for term, names in (cfg.get(group) or {}).items():
+                for n in names or []:
+                    self.aliases[n] = str(term)
+        symbols = set(_feed_symbols(sources)) | set(map(str, (cfg.get("tickers") or {}).keys()))
+        for s in symbols:
+            if len(s) >= TERM_BARE_MIN:
+                self.aliases.setdefault(s, _norm_symbol(s))
+        # 长的别名放前面，"Bank of America" 先于 "America" 这类前缀匹配
+        names = sorted(self.aliases, key=len, reverse=True)
+        self._alias_re = re.compile(r"(?<!\w)(" + "|".join(map(re.escape, names)) + r")(?!\w)") if names else None
+        self.terms = set(self.aliases.values())
+        # 词表指纹：entities.yaml 或 feed 的代码列表变了，已索引的分区都要重建
+        self.fingerprint = hashlib.md5(raw + ",".join(sorted(symbols)).encode()).hexdigest()
+
+    def resolve(self, query: str) -> str:
+        """查询词 → 词条：别名、$NVDA、nvda、brk.b 都可以。"""
+        q = query.strip()
+        if q in self.aliases:
+            return self.aliases[q]
+        lower = {k.lower(): v for k, v in self.aliases.items()}
+        if q.lower() in lower:
+            return lower[q.lower()]
+        return _norm_symbol(q.lstrip("$"))
+
+    def find(self, text: str) -> dict:
+        out = {}
+        if not text:
+            return out
+        for rx in (_CASHTAG_RE, _EXCHANGE_RE):
+            for m in rx.finditer(text):
+                out.setdefault(_norm_symbol(m.group(1)), []).append(m.start())
+        if self._alias_re is not None:
+            for m in self._alias_re.finditer(text):
+                out.setdefault(self.aliases[m.group(1)], []).append(m.start())
+        for pos in out.values():
+            pos.sort()
+        return out
+
+class TermIndex:
+    """
+    ticker / 机构名的倒排索引（termindex.sqlite），在 dedupe 之后按天增量更新：
+    docs_dedup.parquet 的 mtime 或词表指纹变了的分区整天重建，都没变的跳过。
+    postings 以 (term, day, doc) 为主键，按词条 + 日期范围查询是一次索引范围扫描；
+    位置是词条在 title + "\\n" + text 里的字符偏移（uint32 数组）。
+    """
+    def __init__(self, name="termindex.sqlite", matcher: TermMatcher | None = None):
+        self._db = connect(name)
+        self._matcher = matcher
+        self._db.executescript("""
+        CREATE TABLE IF NOT EXISTS docs(
+            doc INTEGER PRIMARY KEY, day TEXT NOT NULL, url_hash TEXT NOT NULL, UNIQUE(day, url_hash));
+        CREATE TABLE IF NOT EXISTS postings(
+            term TEXT NOT NULL, day TEXT NOT NULL, doc INTEGER NOT NULL, positions BLOB NOT NULL,
+            PRIMARY KEY(term, day, doc)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_day ON postings(day);
+        CREATE TABLE IF NOT EXISTS days(
+            day TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, docs INTEGER NOT NULL, postings INTEGER NOT NULL,
+            updated_at REAL NOT NULL, config TEXT);
+        """)
+
+    @property
+    def matcher(self) -> TermMatcher:
+        if self._matcher is None:
+            self._matcher = TermMatcher()
+        return self._matcher
+
+    def stale(self, day_dir) -> bool:
+        p = Path(day_dir) / "docs_dedup.parquet"
+        if not p.exists():
+            return False
+        row = self._db.execute("SELECT mtime_ns, config FROM days WHERE day=?", (Path(day_dir).name,)).fetchone()
+        return row is None or row[0] != p.stat().st_mtime_ns or row[1] != self.matcher.fingerprint
+
+    def add_day(self, day_dir) -> tuple[int, int]:
+        """（重新）索引一天的 docs_dedup.parquet，返回 (文档数, postings 数)。"""
+        day_dir = Path(day_dir)
+        p, day = day_dir / "docs_dedup.parquet", day_dir.name
+        mtime = p.stat().st_mtime_ns
+        cols = [c for c in ("url_hash", "title", "text") if c in pq.read_schema(p).names]
+        t = pq.read_table(p, columns=cols).to_pydict()
+        n = len(t.get("url_hash", []))
+        titles, texts = t.get("title", [None] * n), t.get("text", [None] * n)
+        m = self.matcher
+        self._db.execute("BEGIN")
+        try:
+            self._drop(day)
+            n_docs = n_post = 0
+            for h, title, text in zip(t.get("url_hash", []), titles, texts):
+                if not h:
+                    continue
+                found = m.find(f"{title or ''}\n{text or ''}")
+                if not found:
+                    continue
+                cur = self._db.execute("INSERT OR IGNORE INTO docs(day, url_hash) VALUES(?,?)", (day, h))
+                if cur.rowcount == 0:  # 同一天重复的 url_hash
+                    continue
+                doc = cur.lastrowid
+                self._db.executemany("INSERT INTO postings VALUES(?,?,?,?)",
+                                     [(term, day, doc, array("I", pos).tobytes()) for term, pos in found.items()])
+                n_docs += 1; n_post += len(found)
+            self._db.execute("INSERT OR REPLACE INTO days(day, mtime_ns, docs, postings, updated_at, config) VALUES(?,?,?,?,?,?)",
+                             (day, mtime, n_docs, n_post, time.time(), m.fingerprint))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK"); raise
+        return n_docs, n_post
+
+    def _drop(self, day: str) -> None:
+        self._db.execute("DELETE FROM postings WHERE day=?", (day,))
+        self._db.execute("DELETE FROM docs WHERE day=?", (day,))
+        self._db.execute("DELETE FROM days WHERE day=?", (day,))
+
+    def update(self, day_dirs) -> dict:
+        """只处理 docs_dedup.parquet 或词表变了的分区，返回 {day: (docs, postings)}。"""
+        return {Path(d).name: self.add_day(d) for d in day_dirs if self.stale(d)}
+
+    def lookup(self, term: str, start: str | None = None, end: str | None = None) -> list:
+        """
+        提到 term（别名会先解析成词条）的文档，按日期排序：[{day, url_hash, positions}]。
+        start / end 是含端点的 YYYY-MM-DD。正文不在索引里，用 load() 按需从天分区读。
+        """
+        rows = self._db.execute("""SELECT p.day, d.url_hash, p.positions FROM postings p JOIN docs d ON d.doc = p.doc
+            WHERE p.term=? AND p.day BETWEEN ? AND ? ORDER BY p.day, p.doc""",
+            (self.matcher.resolve(term), start or "0000-00-00", end or "9999-99-99"))
+        return [{"day": day, "url_hash": h, "positions": array("I", pos).tolist()} for day, h, pos in rows]
+
+    def terms(self, start: str | None = None, end: str | None = None, limit: int = 50) -> list:
+        """日期范围内文档数最多的词条：[(term, docs)]。"""
+        return self._db.execute("""SELECT term, COUNT(*) AS n FROM postings WHERE day BETWEEN ? AND ?
+            GROUP BY term ORDER BY n DESC LIMIT ?""", (start or "0000-00-00", end or "9999-99-99", limit)).fetchall()
+
+    def close(self):
+        self._db.close()
+
+def load(hits, columns=None, root="data/bronze"):
+    """按 lookup() 的结果从 <root>/<day>/docs_dedup.parquet 读出文档；每天只读一次，只读命中的行。"""
+    by_day = {}
+    for h in hits:
+        by_day.setdefault(h["day"], set()).add(h["url_hash"])
+    for day, hashes in sorted(by_day.items()):
+        p = Path(root) / day / "docs_dedup.parquet"
+        if not p.exists():
+            continue
+        cols = list(columns) if columns else None
+        if cols and "url_hash" not in cols:
+            cols.append("url_hash")
+        t = pq.read_table(p, columns=cols, filters=[("url_hash", "in", list(hashes))])
+        yield from t.to_pylist()
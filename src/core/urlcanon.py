@@ -0,0 +1,182 @@
+import os, re, time, hashlib, threading
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+from src.core.state import connect
+
+URL_CANON = os.environ.get("URL_CANON", "1") == "1"   # 0 = 不算 canonical_url_hash，dedupe 按 url_hash
+URL_ALIAS_MIN_SLUG = int(os.environ.get("URL_ALIAS_MIN_SLUG", "16"))      # 单段路径短于此值视为栏目页，不作别名目标
+URL_ALIAS_MAX_SOURCES = int(os.environ.get("URL_ALIAS_MAX_SOURCES", "8"))  # 同一目标的别名超过这么多就是公共落地页，全部作废
+
+# 各站通用的跟踪参数
+_TRACKING = {"guccounter", "guce_referrer", "guce_referrer_sig", ".tsrc", "tsrc", "ncid", "soc_src", "soc_trk",
+             "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "cmpid", "__source", "taid", "yptr",
+             "sr_share", "ito"}
+_TRACKING_PREFIX = ("utm_", "at_", "pk_", "mtm_")
+
+# 按域名的规则（后缀匹配）：query 为 None 表示文章只由路径确定，query 整个丢掉；否则只保留列出的参数
+DOMAIN_RULES = {
+    "cnbc.com":          {"query": None},
+    "finance.yahoo.com": {"query": None},
+    "reuters.com":       {"query": None},
+    "marketwatch.com":   {"query": None},
+    "nasdaq.com":        {"query": None},
+    "wsj.com":           {"query": None},
+    "ft.com":            {"query": None},
+    "bloomberg.com":     {"query": None},
+    "federalreserve.gov": {"query": None},
+    "ecb.europa.eu":     {"query": None},
+    "bankofengland.co.uk": {"query": None},
+}
+
+_AMP_PATH_RE = re.compile(r"(/amp)+/?$|/amp(?=/)|\.amp(?=\.html?$)", re.I)
+_CANONICAL_RE = re.compile(rb"<link\b[^>]*\brel=[\"']?canonical[\"']?[^>]*>", re.I)
+_HREF_RE = re.compile(rb"\bhref=[\"']?([^\"'\s>]+)", re.I)
+# 同意 / 登录 / 订阅之类的落地页：路径里的关键词，或以这些词开头的 host（consent.yahoo.com）
+_LANDING_RE = re.compile(r"(^|[/.])(consent|gdpr|cookies?|login|signin|sign-in|subscribe|paywall|account)([/.]|$)", re.I)
+
+def _rule(host: str):
+    for suffix, rule in DOMAIN_RULES.items():
+        if host == suffix or host.endswith("." + suffix):
+            return rule
+    return None
+
+def canonicalize(url: str) -> str:
+    """
+    同一篇文章的各种写法归一成一个 URL：https、小写 host、去 www./amp. 前缀与默认端口、
+    去掉 AMP 路径、末尾斜杠、片段和跟踪参数（按域名规则可整个去掉 query），剩余参数排序。
+    """
+    if not url:
+        return ""
+    try:
+        p = urlsplit(url.strip())
+        host = (p.hostname or "").lower().rstrip(".")
+        port = p.port
+    except ValueError:
+        return url.strip()
+    if not host:
+        return url.strip()
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    path = _AMP_PATH_RE.sub("", p.path) or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    rule = _rule(host)
+    keep = rule["query"] if rule else None
+    query = []
+    if rule is None or keep:
+        for k, v in parse_qsl(p.query, keep_blank_values=True):
+            kl = k.lower()
+            if rule is None and (kl in _TRACKING or kl.startswith(_TRACKING_PREFIX) or kl in ("amp", "outputtype")):
+                continue
+            if keep and k not in keep:
+                continue
+            query.append((k, v))
+    return urlunsplit(("https", netloc, path, urlencode(sorted(query)), ""))
+
+def canonical_url_hash(url: str) -> str:
+    return hashlib.md5(canonicalize(url).encode()).hexdigest()
+
+def _site(host: str) -> str:
+    # 粗略的“同一站点”：host 的最后两段（cnbc.com、yahoo.com）
+    return ".".join(host.split(".")[-2:])
+
+def plausible_target(url: str, target: str) -> bool:
+    """
+    target 能否作为 url 的别名目标：首页、短的栏目页、url 自己的上级路径、同意/登录/订阅落地页、
+    别的站点都不算（失效文章常被 301 到首页或栏目页，转载页的 canonical 指向原站）。
+    """
+    try:
+        p, b = urlsplit(target), urlsplit(url)
+    except ValueError:
+        return False
+    path, base = p.path.strip("/"), b.path.strip("/")
+    if not path or ("/" not in path and len(path) < URL_ALIAS_MIN_SLUG):
+        return False
+    if base.startswith(path + "/") or _LANDING_RE.search(p.path) or _LANDING_RE.match(p.hostname or ""):
+        return False
+    return _site((p.hostname or "").lower()) == _site((b.hostname or "").lower())
+
+def rel_canonical(html: bytes, base: str) -> str | None:
+    """页面头部声明的 <link rel=canonical>；不满足 plausible_target 的不算（有的站把 canonical 一律指向首页）。"""
+    m = _CANONICAL_RE.search(html)
+    h = _HREF_RE.search(m.group(0)) if m else None
+    if not h:
+        return None
+    href = urljoin(base, h.group(1).decode("utf-8", "replace").replace("&amp;", "&"))
+    return href if plausible_target(base, href) else None
+
+class UrlAliases:
+    """
+    别名缓存（urlcanon.sqlite）：跳转/短链/feed 代理地址 → 最终文章 URL，以及抓取时看到的 rel=canonical。
+    键是别名的 canonical_url_hash，值是目标的规范化 URL；之后再遇到别名，抓取前就能算出目标的 hash。
+    """
+    def __init__(self, name="urlcanon.sqlite"):
+        self._db = connect(name)
+        self._lock = threading.Lock()
+        self._db.execute("""CREATE TABLE IF NOT EXISTS aliases(
+            url_hash TEXT PRIMARY KEY, canonical TEXT NOT NULL, kind TEXT NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS aliases_target ON aliases(canonical)")
+
+    def resolve(self, url: str) -> str:
+        """url 的规范化形式；有别名记录时换成目标 URL。"""
+        c = canonicalize(url)
+        with self._lock:
+            row = self._db.execute("SELECT canonical FROM aliases WHERE url_hash=? AND kind != 'shared'",
+                                   (hashlib.md5(c.encode()).hexdigest(),)).fetchone()
+        return row[0] if row else c
+
+    def add(self, url: str, target: str, kind: str) -> bool:
+        """记下 url → target（kind：redirect / canonical）；两者规范化后相同时不记。"""
+        src, dst = canonicalize(url), canonicalize(target)
+        if not dst or src == dst:
+            return False
+        # 目标本身若也是别名，直接指向最终目标，查询时只需一跳
+        dst = self.resolve(dst)
+        if dst == src:
+            return False
+        with self._lock:
+            n, shared = self._db.execute("SELECT COUNT(*), COALESCE(MAX(kind = 'shared'), 0) FROM aliases WHERE canonical=?",
+                                         (dst,)).fetchone()
+            if shared or n >= URL_ALIAS_MAX_SOURCES:
+                # 很多不同的 URL 都跳到同一处：是公共落地页而不是文章，已有的别名一并作废（行留下，作为标记）
+                self._db.execute("UPDATE aliases SET kind='shared' WHERE canonical=?", (dst,))
+                return False
+            self._db.execute("INSERT OR REPLACE INTO aliases VALUES(?,?,?,?)",
+                             (hashlib.md5(src.encode()).hexdigest(), dst, kind, time.time()))
+        return True
+
+    def snapshot(self) -> dict:
+        """全部有效别名（hash → 目标 URL），供 dedupe 这类批量处理一次读入。"""
+        with self._lock:
+            return dict(self._db.execute("SELECT url_hash, canonical FROM aliases WHERE kind != 'shared'"))
+
+_aliases = None
+
+def aliases() -> UrlAliases:
+    global _aliases
+    if _aliases is None:
+        _aliases = UrlAliases()
+    return _aliases
+
+def url_hash(url: str) -> str:
+    """记录的主键 url_hash：原始 URL 字符串的 MD5，与 seen 索引、原始 HTML 存档、历史 bronze 一致，抓取后也不改变。"""
+    return hashlib.md5((url or "").encode()).hexdigest()
+
+def canonical_key(url: str) -> str | None:
+    """
+    canonical_url_hash：（经别名缓存解析后的）规范化 URL 的 MD5，抓取前计算。同一文章的跟踪参数、AMP、
+    http/https、feed 跳转等写法得到同一个值，seen 索引据此跳过别的写法已抓过的文章。URL_CANON=0 时为 None。
+    """
+    if not URL_CANON:
+        return None
+    return hashlib.md5(aliases().resolve(url or "").encode()).hexdigest()
+
+def url_fields(url: str) -> dict:
+    """adapter 产出记录时的 URL 键：url_hash，以及 URL_CANON=1 时的 canonical_url_hash。"""
+    out = {"url_hash": url_hash(url)}
+    c = canonical_key(url)
+    if c is not None:
+        out["canonical_url_hash"] = c
+    return out
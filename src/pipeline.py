@@ -1,24 +1,215 @@
-from src.core.fetcher import get
-from src.core.extractor import extract_text
-from src.core.normalizer import normalize_record
-from src.core.storage import append_jsonl
-from typing import List
-
-def run_adapter(adapter) -> int:
-    out = []
-    for rec in adapter.iter_items():
+import os, atexit, multiprocessing
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor, CancelledError, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from src.core.fetcher import fetch_many, fetch_article, Skipped
+from src.core.extractor import extract_text, routes
+from src.core.normalizer import normalize_record, normalize_batch
+from src.core.storage import SegmentWriter
+from src.core.seen_index import doc_status
+from src.core import metrics
+from typing import Iterable, Dict, Any, List, Tuple
+
+EXTRACT_WORKERS  = int(os.environ.get("EXTRACT_WORKERS", "0"))   # 0 = 在主进程里内联抽取
+EXTRACT_BATCH    = int(os.environ.get("EXTRACT_BATCH", "16"))    # 每个任务打包的文档数
+EXTRACT_INFLIGHT = int(os.environ.get("EXTRACT_INFLIGHT", "2"))  # 每个 worker 允许排队的批次数（背压）
+
+def _extract_into(rec: dict, html: bytes) -> dict:
+    # 简单付费墙特征
+    first = html[:6000].lower()
+    rec["paywall"] = rec.get("paywall", False) or (b"subscribe" in first or b"paywall" in first)
+    with metrics.tags(source_id=rec.get("source_id")), metrics.doc_profile(rec.get("url_hash") or "", url=rec.get("url")):
+        ext = extract_text(html, domain=_domain(rec.get("url")))
+    rec.update(ext)
+    return rec
+
+def _domain(url) -> str | None:
+    host = urlsplit(url or "").hostname
+    return host[4:] if host and host.startswith("www.") else host
+
+def process_html(rec: dict, html: bytes) -> dict:
+    return normalize_record(_extract_into(rec, html))
+
+def _process_batch(batch: List[Tuple[dict, bytes]]) -> Tuple[List[dict], dict, dict]:
+    # 在子进程里运行：单条异常只影响该条记录；规范化按批次一次完成；连同本批的指标与策略统计一起交回父进程
+    out, ok = [], []
+    for rec, html in batch:
+        try:
+            ok.append(_extract_into(rec, html))
+        except Exception:
+            rec["http_status"] = "error"
+        out.append(rec)
+    try:
+        normalize_batch(ok)
+    except Exception:
+        for rec in ok:
+            try: normalize_record(rec)
+            except Exception: rec["http_status"] = "error"
+    return out, metrics.registry.drain(), routes().drain()
+
+class ExtractPool:
+    """抽取用的进程池：子进程崩溃（段错误、OOM）后自动重建。"""
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+
+    def submit(self, batch):
+        for _ in range(2):
+            if self._pool is None:
+                # spawn 而非 fork：父进程里有抓取线程，fork 可能继承被持有的锁
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            pool = self._pool
+            try:
+                return pool, pool.submit(_process_batch, batch)
+            except BrokenProcessPool:
+                # 在途批次打崩了 worker：池子已不可用，换一个新池重新提交；旧池的 future 由 drain 处理
+                self.reset(pool)
+        raise BrokenProcessPool("extract pool broke twice while submitting")
+
+    def reset(self, broken):
+        if self._pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+_pools: Dict[int, ExtractPool] = {}
+
+def get_extract_pool(workers: int) -> ExtractPool:
+    # 同一进程内复用：cron 的多个 feed / backfill 的多个 domain-day 共用一组已预热的 worker
+    if workers not in _pools:
+        _pools[workers] = ExtractPool(workers)
+    return _pools[workers]
+
+@atexit.register
+def _shutdown_pools():
+    for p in _pools.values():
+        p.shutdown()
+
+def _iter_pooled(fetched: Iterable[Tuple[dict, bytes]], workers: int) -> Iterable[Dict[str, Any]]:
+    """
+    抓取结果按 EXTRACT_BATCH 打包送进进程池；在途批次达到 workers×EXTRACT_INFLIGHT 时
+    停止从抓取端拉取（背压），内存因此有界。进程池崩溃时，受牵连的文档最后逐条隔离重跑，
+    单独运行仍然打崩进程的文档被判定为毒文档，只保留元数据。
+    """
+    ep = get_extract_pool(workers)
+    inflight, suspects = {}, []  # future -> (pool, batch)
+
+    def submit(batch):
+        pool, fut = ep.submit(batch)
+        inflight[fut] = (pool, batch)
+
+    def drain(limit: int):
+        while len(inflight) > limit:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pool, batch = inflight.pop(fut)
+                try:
+                    out, snap, delta = fut.result()
+                    metrics.registry.merge(snap); routes().merge(delta)
+                    yield from out
+                except (BrokenProcessPool, CancelledError):
+                    # 池子坏掉后 submit 换了新池：旧池里尚未开跑的批次可能被取消而不是标记为 broken
+                    ep.reset(pool)
+                    suspects.extend(batch)
+
+    batch = []
+    for item in fetched:
+        batch.append(item)
+        if len(batch) >= EXTRACT_BATCH:
+            submit(batch); batch = []
+            yield from drain(workers * EXTRACT_INFLIGHT - 1)
+    if batch:
+        submit(batch)
+    yield from drain(0)
+
+    for rec, html in suspects:
+        pool, fut = ep.submit([(rec, html)])
         try:
-            html = get(rec["url"]).content
-            # 简单付费墙特征
-            first = html[:6000].lower()
-            rec["paywall"] = (b"subscribe" in first or b"paywall" in first)
-            ext = extract_text(html)
-            rec.update(ext)
-            rec = normalize_record(rec)
-            out.append(rec)
-        except Exception as e:
+            out, snap, delta = fut.result()
+            metrics.registry.merge(snap); routes().merge(delta)
+            yield from out
+        except BrokenProcessPool:
+            ep.reset(pool)
+            metrics.inc("extract_poison", source_id=rec.get("source_id"))
             rec["http_status"] = "error"
-            out.append(rec)
-    if out:
-        append_jsonl(out)
-    return len(out)
+            yield rec
+
+def iter_processed(recs: Iterable[Dict[str, Any]], seen=None, raw=None, workers=None) -> Iterable[Dict[str, Any]]:
+    """
+    并发流式抓取 + 抽取；按完成顺序产出，失败的记录保留元数据并标记 http_status=error，
+    提前放弃的（非 HTML、超长、付费墙）标记 skip_reason。
+    传入 seen（SeenIndex）时，已抓取过的 URL 在任何网络请求之前就被跳过；
+    传入 raw（RawStore）时，原始 HTML 压缩存档，供离线重抽取；
+    workers > 0（默认取 EXTRACT_WORKERS）时，抽取 + 规范化交给进程池，与网络 I/O 流水并行。
+    """
+    admitted, out = set(), set()
+    try:
+        for rec in _iter_processed(recs, seen, raw, workers, admitted):
+            metrics.inc("docs", source_id=rec.get("source_id"), status=doc_status(rec))
+            out.add(rec.get("url_hash"))
+            yield rec
+    finally:
+        routes().flush()  # 本轮各域名的策略统计落盘
+        if seen is not None:
+            # 产出的记录由 writer 提交后 mark_many 移出 inflight；中途异常或提前结束而没有产出的记录
+            # 在这里移出，常驻进程里 inflight 不会无限增长
+            seen.release(admitted - out)
+
+def _iter_processed(recs, seen, raw, workers, admitted=None):
+    workers = EXTRACT_WORKERS if workers is None else workers
+    if seen is not None:
+        recs = seen.filter_new(recs, admitted)
+    failed = []  # 不需要抽取、直接原样产出的记录（抓取失败或提前放弃）
+
+    def fetched():
+        for rec, html, err in fetch_many(recs, fetch=fetch_article):
+            if err is None:
+                try:
+                    if raw is not None:
+                        raw.put(rec["url_hash"], html)
+                    yield rec, html
+                    continue
+                except Exception:
+                    pass
+            if isinstance(err, Skipped):
+                # 没下载完整正文：记下原因和声明长度，便于按来源统计省下的带宽与 CPU
+                rec["skip_reason"], rec["skip_bytes"] = err.reason, err.declared
+                rec["paywall"] = rec.get("paywall", False) or err.reason == "paywall"
+            else:
+                rec["http_status"] = "error"
+            failed.append(rec)
+
+    if workers > 0:
+        for rec in _iter_pooled(fetched(), workers):
+            yield rec
+            while failed: yield failed.pop()
+    else:
+        for rec, html in fetched():
+            try:
+                yield process_html(rec, html)
+            except Exception:
+                rec["http_status"] = "error"
+                yield rec
+            while failed: yield failed.pop()
+    while failed: yield failed.pop()
+
+def run_adapter(adapter, seen=None, raw=None, workers=None, writer=None) -> int:
+    """
+    抓取一个 adapter 并流式写入 bronze 段。传入共享的 writer（cron 一轮所有 feed 共用）时，
+    seen 的登记由 writer 的 on_commit 负责；adapter.commit()（保存 ETag 等）推迟到这些记录真正落盘之后。
+    """
+    own = writer is None
+    if own:
+        writer = SegmentWriter(getattr(adapter, "source_id", "docs"),
+                               on_commit=seen.mark_many if seen is not None else None)  # 落盘之后再登记，崩溃时宁可重抓也不丢
+    n = 0
+    for rec in iter_processed(adapter.iter_items(), seen=seen, raw=raw, workers=workers):
+        writer.write(rec); n += 1
+    writer.after_commit(adapter.commit)
+    if own:
+        writer.close()
+    return n
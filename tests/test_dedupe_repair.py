@@ -0,0 +1,31 @@
+import os, sys, json
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import dedupe_repair as dr
+
+ROWS = [
+    {"url": "https://a.com/1", "url_hash": "h1", "title": "t1", "published_at": "2025-09-05T10:00:00+00:00",
+     "source_id": "s1", "paywall": False, "text": "short", "extract_method": "readability"},
+    {"url": "https://a.com/1", "url_hash": "h1", "title": "t1", "published_at": "2025-09-05T10:00:00+00:00",
+     "source_id": "s1", "paywall": False, "text": "a longer body", "extract_method": "trafilatura"},
+    {"url": "https://b.com/2", "url_hash": "h2", "title": "t2", "published_at": "2025-09-05T09:00:00+00:00",
+     "source_id": "s2", "text": "", "http_status": "error"},
+    {"url": "https://c.com/3", "url_hash": "h3", "title": "t3", "published_at": None,
+     "source_id": "s1", "paywall": True, "text": "paywalled", "extract_method": None},
+]
+
+@pytest.fixture
+def day(tmp_path, monkeypatch):
+    monkeypatch.setattr(dr, "URL_CANON", False)
+    d = tmp_path / "2025-09-05"; d.mkdir()
+    (d / "docs.jsonl").write_text("".join(json.dumps(r) + "\n" for r in ROWS))
+    return d
+
+def test_arrow_path_matches_pandas_path(day):
+    t = dr.read_table(day)
+    arrow = dr.materialize(t, dr.dedupe_df(dr.clean_df(dr.key_frame(t))))
+    legacy = dr.dedupe_df(dr.clean_df(dr.load_df(day)))
+    assert arrow["paywall"].dtype == "float64"
+    pd.testing.assert_frame_equal(arrow, legacy)
@@ -0,0 +1,132 @@
+import types
+import pytest
+import src.core.hosts as hosts
+import src.core.fetcher as fetcher
+from src.core import state
+from src.core.hosts import HostHealth, HostOpen, PermanentError
+
+class _Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+    def time(self):
+        return self.t
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    c = _Clock()
+    monkeypatch.setattr(hosts, "time", types.SimpleNamespace(time=c.time))
+    monkeypatch.setattr(hosts, "BREAKER_FAILURES", 3)
+    monkeypatch.setattr(hosts, "BREAKER_COOLDOWN_S", 100.0)
+    monkeypatch.setattr(hosts, "BREAKER_MAX_COOLDOWN_S", 1000.0)
+    monkeypatch.setattr(hosts, "NEG_CACHE_TTL_S", 50.0)
+    return c
+
+def test_opens_after_consecutive_failures(clock):
+    hh = HostHealth()
+    for _ in range(2):
+        hh.failure("a.com")
+    hh.allow("a.com")  # 还没到阈值
+    hh.failure("a.com")
+    with pytest.raises(HostOpen):
+        hh.allow("a.com")
+    assert hh.open_for("a.com") == 100.0
+
+def test_success_resets_failure_count(clock):
+    hh = HostHealth()
+    hh.failure("a.com"); hh.failure("a.com")
+    hh.success("a.com")
+    hh.failure("a.com"); hh.failure("a.com")
+    hh.allow("a.com")
+
+def test_half_open_allows_one_probe(clock):
+    hh = HostHealth()
+    for _ in range(3):
+        hh.failure("a.com")
+    clock.t += 101
+    hh.allow("a.com")  # 探测请求
+    with pytest.raises(HostOpen, match="probe"):
+        hh.allow("a.com")
+    hh.success("a.com")
+    hh.allow("a.com"); hh.allow("a.com")  # closed：不再限制
+
+def test_failed_probe_doubles_cooldown_up_to_cap(clock):
+    hh = HostHealth()
+    for _ in range(3):
+        hh.failure("a.com")
+    for want in (200.0, 400.0, 800.0, 1000.0, 1000.0):
+        clock.t += hh.open_for("a.com") + 1
+        hh.allow("a.com")
+        hh.failure("a.com")
+        assert hh.open_for("a.com") == want
+
+def test_retry_after_opens_immediately_and_is_capped(clock):
+    hh = HostHealth()
+    hh.failure("a.com", retry_after=30)
+    assert hh.open_for("a.com") == 30
+    hh.failure("b.com", retry_after=10 ** 6)
+    assert hh.open_for("b.com") == 1000.0
+
+def test_state_persists_across_instances(clock):
+    for _ in range(3):
+        HostHealth().failure("a.com")
+    with pytest.raises(HostOpen):
+        HostHealth().allow("a.com")
+    HostHealth().add_negative("https://a.com/x", "404")
+    assert HostHealth().is_negative("https://a.com/x")
+
+def test_negative_cache_expires(clock):
+    hh = HostHealth()
+    hh.add_negative("https://a.com/x", "404")
+    assert hh.is_negative("https://a.com/x") and not hh.is_negative("https://a.com/y")
+    clock.t += 51
+    assert not hh.is_negative("https://a.com/x")
+
+# ---- fetcher.get 与熔断 / 负缓存的配合（替换 session，不走网络） ----
+class _Resp:
+    def __init__(self, status, headers=None):
+        self.status_code, self.headers, self.url = status, headers or {}, None
+    def close(self): pass
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise fetcher.requests.HTTPError(str(self.status_code))
+    def __enter__(self): return self
+    def __exit__(self, *a): pass
+
+@pytest.fixture
+def session(monkeypatch, clock):
+    hh = HostHealth()
+    monkeypatch.setattr(fetcher, "_health", hh)
+    monkeypatch.setattr(fetcher.limiter, "interval", 0.0)
+    calls, replies = [], {}
+    def get(url, **kw):
+        calls.append(url)
+        return replies[url]
+    monkeypatch.setattr(fetcher._session, "get", get)
+    return types.SimpleNamespace(hh=hh, calls=calls, replies=replies)
+
+def test_403_is_not_retried_nor_negatively_cached(session):
+    url = "https://a.com/news/blocked"
+    session.replies[url] = _Resp(403)
+    with pytest.raises(fetcher.Forbidden):
+        fetcher.get(url)
+    assert session.calls == [url]
+    assert session.hh._row("a.com")[0] == 1  # 只计一次失败
+    assert not session.hh.is_negative(url)
+
+def test_404_is_negatively_cached_and_skipped_before_request(session):
+    url = "https://a.com/news/gone"
+    session.replies[url] = _Resp(404)
+    with pytest.raises(PermanentError):
+        fetcher.fetch_article(url)
+    assert session.hh.is_negative(url)
+    with pytest.raises(fetcher.Skipped, match="negative_cache"):
+        fetcher.fetch_article(url)
+    assert session.calls == [url]
+
+def test_open_breaker_rejects_without_request(session):
+    for _ in range(3):
+        session.hh.failure("a.com")
+    with pytest.raises(HostOpen):
+        fetcher.get("https://a.com/news/x")
+    assert session.calls == []
@@ -0,0 +1,26 @@
+import os
+import src.pipeline as pipeline
+from src.core import state
+
+def _crashy_batch(batch):
+    # 模拟毒文档：在抽取子进程里直接退出，打坏整个进程池
+    for rec, html in batch:
+        if html == b"crash":
+            os._exit(1)
+    return [rec for rec, _ in batch], {"counters": [], "timers": [], "slow": []}, {}
+
+def test_pooled_survives_worker_crash(monkeypatch, tmp_path):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(pipeline, "_process_batch", _crashy_batch)
+    monkeypatch.setattr(pipeline, "EXTRACT_BATCH", 1)
+    monkeypatch.setattr(pipeline, "_pools", {})
+    items = [({"url_hash": f"h{i}"}, b"crash" if i == 1 else b"<html/>") for i in range(8)]
+    try:
+        out = list(pipeline._iter_pooled(iter(items), workers=1))
+    finally:
+        for p in pipeline._pools.values():
+            p.shutdown()
+    by_hash = {r["url_hash"]: r for r in out}
+    assert sorted(by_hash) == sorted(f"h{i}" for i in range(8))
+    assert by_hash["h1"]["http_status"] == "error"
+    assert all("http_status" not in r for h, r in by_hash.items() if h != "h1")
@@ -0,0 +1,30 @@
+import src.adapters.rss_generic as rss
+from src.core import state
+from src.core.feed_state import FeedValidators
+from src.core.seen_index import SeenIndex
+
+FEED = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>
+<item><guid>a</guid><link>https://example.com/news/a</link><pubDate>Tue, 01 Sep 2026 12:00:00 GMT</pubDate></item>
+<item><guid>b</guid><link>https://example.com/news/b</link><pubDate>Tue, 01 Sep 2026 11:00:00 GMT</pubDate></item>
+<item><guid>c</guid><link>https://example.com/news/c</link><pubDate>Tue, 01 Sep 2026 10:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+class _Resp:
+    status_code, content, headers = 200, FEED, {"ETag": '"v1"'}
+
+def test_error_entry_is_parsed_again_next_poll(monkeypatch, tmp_path):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(rss, "get", lambda url, headers=None: _Resp())
+    validators, seen = FeedValidators(), SeenIndex()
+
+    first = rss.RSSAdapter("https://example.com/feed", "ex", "Example", validators=validators, seen=seen)
+    recs = list(first.iter_items())
+    assert [r["url"].rsplit("/", 1)[1] for r in recs] == ["a", "b", "c"]
+    status = {"a": {"text": "x"}, "b": {"http_status": "error"}, "c": {"text": "y"}}
+    seen.mark_many([{**r, **status[r["url"].rsplit("/", 1)[1]]} for r in recs])
+    first.commit()
+
+    second = rss.RSSAdapter("https://example.com/feed", "ex", "Example", validators=validators, seen=seen)
+    again = [r["url"].rsplit("/", 1)[1] for r in second.iter_items()]
+    assert again == ["a", "b"]  # b 还没有终局，要再经过一次；c 之后才停
+    assert second.stopped_early
@@ -0,0 +1,51 @@
+import pytest
+import src.core.seen_index as si
+from src.core import state
+from src.core.seen_index import SeenIndex
+
+@pytest.fixture
+def seen(monkeypatch, tmp_path):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(si, "SEEN_RETRY_ERROR_S", 100.0)
+    monkeypatch.setattr(si, "SEEN_RETRY_EMPTY_S", 1000.0)
+    monkeypatch.setattr(si, "SEEN_MAX_ATTEMPTS", 3)
+    return SeenIndex()
+
+def _rec(h, **kw):
+    return {"url_hash": h, **kw}
+
+def test_ok_and_skipped_are_never_refetched(seen):
+    seen.mark_many([_rec("a", text="x"), _rec("b", skip_reason="paywall")], now=1)
+    assert not seen.should_fetch("a", now=10 ** 9)
+    assert not seen.should_fetch("b", now=10 ** 9)
+    assert seen.settled("a") and seen.settled("b")
+
+@pytest.mark.parametrize("rec,ttl", [(_rec("e", http_status="error"), 100), (_rec("e"), 1000)])
+def test_error_and_empty_retry_after_ttl(seen, rec, ttl):
+    seen.mark_many([rec], now=5000)
+    assert not seen.should_fetch("e", now=5000 + ttl - 1)
+    assert seen.should_fetch("e", now=5000 + ttl)
+    assert not seen.settled("e")
+
+def test_retries_stop_after_max_attempts(seen):
+    for t in range(3):
+        seen.mark_many([_rec("e", http_status="error")], now=(t + 1) * 1000)
+    assert not seen.should_fetch("e", now=10 ** 9)
+    assert seen.settled("e")
+
+def test_inflight_blocks_duplicates_until_commit(seen):
+    admitted = set()
+    assert [r["url_hash"] for r in seen.filter_new([_rec("a"), _rec("a"), _rec("b")], admitted)] == ["a", "b"]
+    assert admitted == {"a", "b"}
+    # 同一轮里另一个 feed 再给出 a：还没登记，但已在途，不重复抓
+    assert list(seen.filter_new([_rec("a")])) == []
+    seen.mark_many([_rec("a", http_status="error")], now=1)
+    assert "a" not in seen._inflight
+    seen.release({"b"})
+    assert [r["url_hash"] for r in seen.filter_new([_rec("b")])] == ["b"]
+
+def test_other_spelling_of_fetched_article_is_skipped(seen):
+    seen.mark_many([_rec("a", canonical_url_hash="c", text="x")], now=5000)
+    assert [r["url_hash"] for r in seen.filter_new([_rec("b", canonical_url_hash="c"), _rec("d", canonical_url_hash="e")])] == ["d"]
+    # 同一轮里两种写法都还在 inflight：只放行第一条
+    assert [r["url_hash"] for r in seen.filter_new([_rec("f", canonical_url_hash="g"), _rec("h", canonical_url_hash="g")])] == ["f"]
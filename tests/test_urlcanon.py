@@ -0,0 +1,103 @@
+import hashlib
+import pytest
+import src.core.urlcanon as uc
+from src.core import state
+from src.core.urlcanon import canonicalize, plausible_target, rel_canonical, UrlAliases
+
+ARTICLE = "https://www.cnbc.com/2025/09/05/fed-cuts-rates.html"
+
+@pytest.mark.parametrize("url,expected", [
+    # 跟踪参数；其余参数排序
+    ("https://example.com/a?utm_source=rss&utm_medium=x&b=2&a=1", "https://example.com/a?a=1&b=2"),
+    ("https://example.com/a?fbclid=abc&gclid=d&id=7", "https://example.com/a?id=7"),
+    ("https://example.com/a?outputType=amp&amp=1", "https://example.com/a"),
+    ("https://news.yahoo.com/fed-123.html?.tsrc=rss&guccounter=1&ncid=x", "https://news.yahoo.com/fed-123.html"),
+    # 按域名整个去掉 query
+    ("https://www.cnbc.com/2025/09/05/fed.html?__source=iosappshare&id=1", "https://cnbc.com/2025/09/05/fed.html"),
+    ("https://finance.yahoo.com/news/fed-123.html?page=2", "https://finance.yahoo.com/news/fed-123.html"),
+    # AMP 路径
+    ("https://example.com/news/story/amp", "https://example.com/news/story"),
+    ("https://example.com/news/story/amp/", "https://example.com/news/story"),
+    ("https://example.com/amp/news/story", "https://example.com/news/story"),
+    ("https://example.com/news/story.amp.html", "https://example.com/news/story.html"),
+    # host：www./amp./m. 前缀、大小写、默认端口
+    ("https://amp.example.com/x", "https://example.com/x"),
+    ("https://m.example.com/x", "https://example.com/x"),
+    ("https://WWW.Example.COM./x", "https://example.com/x"),
+    ("http://example.com:80/x", "https://example.com/x"),
+    ("https://example.com:443/x", "https://example.com/x"),
+    ("https://example.com:8443/x", "https://example.com:8443/x"),
+    ("https://m.com/x", "https://m.com/x"),  # 只有两段的 host 不去前缀
+    # 末尾斜杠、片段
+    ("https://example.com/a/b/#comments", "https://example.com/a/b"),
+    ("https://example.com", "https://example.com/"),
+    # 解析不了的原样返回
+    ("", ""),
+    ("not a url", "not a url"),
+    ("http://[::1/x", "http://[::1/x"),
+])
+def test_canonicalize(url, expected):
+    assert canonicalize(url) == expected
+
+def test_canonicalize_is_idempotent():
+    c = canonicalize("http://amp.example.com/news/story/amp/?utm_source=x&b=2&a=1#top")
+    assert canonicalize(c) == c
+
+@pytest.mark.parametrize("target,ok", [
+    ("https://www.cnbc.com/2025/09/05/fed-cuts-rates-again.html", True),
+    ("https://cnbc.com/fed-cuts-rates-by-quarter-point", True),   # 单段但够长的 slug
+    ("https://www.cnbc.com/", False),                             # 首页
+    ("https://cnbc.com", False),
+    ("https://cnbc.com/markets", False),                          # 短的栏目页
+    ("https://cnbc.com/2025/09/05", False),                       # 自己的上级路径
+    ("https://cnbc.com/subscribe/offer-2025", False),             # 订阅落地页
+    ("https://cnbc.com/account/login?next=x", False),
+    ("https://consent.cnbc.com/v2/collect-consent-now", False),   # 同意页的 host
+    ("https://reuters.com/markets/us/fed-cuts-rates-2025-09-05", False),  # 别的站点
+    ("http://[::1", False),
+])
+def test_plausible_target(target, ok):
+    assert plausible_target(ARTICLE, target) is ok
+
+@pytest.mark.parametrize("html,expected", [
+    (b'<head><link rel="canonical" href="https://www.cnbc.com/2025/09/05/fed-cuts-rates-again.html"></head>',
+     "https://www.cnbc.com/2025/09/05/fed-cuts-rates-again.html"),
+    (b"<head><link href='/2025/09/05/fed-cuts-rates-again.html?a=1&amp;b=2' rel=canonical></head>",
+     "https://www.cnbc.com/2025/09/05/fed-cuts-rates-again.html?a=1&b=2"),
+    (b'<head><link rel="canonical" href="/"></head>', None),
+    (b'<head><link rel="canonical" href="https://cnbc.com/markets"></head>', None),
+    (b"<head><title>x</title></head>", None),
+])
+def test_rel_canonical(html, expected):
+    assert rel_canonical(html, ARTICLE) == expected
+
+@pytest.fixture
+def aliases(monkeypatch, tmp_path):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(uc, "URL_ALIAS_MAX_SOURCES", 2)
+    monkeypatch.setattr(uc, "_aliases", None)
+    return UrlAliases()
+
+def test_alias_resolves_and_collapses_chains(aliases):
+    final = "https://example.com/news/final-story"
+    assert aliases.add("https://example.com/news/mid-story", final, "redirect")
+    assert aliases.add("https://feeds.example.com/r/123", "https://example.com/news/mid-story", "redirect")
+    assert aliases.resolve("https://feeds.example.com/r/123?utm_source=rss") == final
+    assert not aliases.add(final + "?utm_source=x", final, "redirect")  # 规范化后相同
+
+def test_alias_target_shared_by_many_sources_is_dropped(aliases):
+    landing = "https://example.com/news/expired-article-landing"
+    a = [f"https://example.com/news/old-story-{i}" for i in range(4)]
+    assert [aliases.add(u, landing, "redirect") for u in a] == [True, True, False, False]
+    # 已有的别名一并作废：resolve 与 snapshot 都不再用它们
+    assert all(aliases.resolve(u) == canonicalize(u) for u in a)
+    assert aliases.snapshot() == {}
+
+def test_url_fields(aliases, monkeypatch):
+    a = uc.url_fields("https://www.cnbc.com/2025/09/05/fed.html?__source=rss")
+    b = uc.url_fields("http://cnbc.com/2025/09/05/fed.html")
+    assert a["url_hash"] == hashlib.md5(b"https://www.cnbc.com/2025/09/05/fed.html?__source=rss").hexdigest()
+    assert a["url_hash"] != b["url_hash"]
+    assert a["canonical_url_hash"] == b["canonical_url_hash"] == uc.canonical_url_hash(ARTICLE.replace("fed-cuts-rates", "fed"))
+    monkeypatch.setattr(uc, "URL_CANON", False)
+    assert uc.url_fields("http://cnbc.com/x") == {"url_hash": hashlib.md5(b"http://cnbc.com/x").hexdigest()}